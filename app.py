@@ -1,6 +1,7 @@
 # app.py
 import os
 import logging
+import click
 from flask import Flask
 from flask_login import LoginManager
 from dotenv import load_dotenv
@@ -50,6 +51,22 @@ def create_app():
     # Registrar blueprints de servicios
     register_services_blueprints(app)
     
+    # Configurar la caché de predicciones
+    configure_prediction_cache(app)
+    
+    # Medición de tiempos por etapa de las predicciones
+    configure_stage_timing(app)
+    
+    # Precalcular la tabla de predicciones con el modelo cargado
+    warm_prediction_table(app)
+    
+    # Columnas de características materializadas en EnergyData
+    check_feature_columns(app)
+    
+    # Trabajos de ingesta y de reentrenamiento interrumpidos
+    recover_ingestion_jobs(app)
+    recover_training_jobs(app)
+    
     return app
 
 def configure_app(app):
@@ -58,8 +75,40 @@ def configure_app(app):
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///energia_app.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['UPLOAD_FOLDER'] = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'energia_app', 'data')
+    # Archivos subidos pendientes de ingesta (fuera de UPLOAD_FOLDER para no mezclarlos con los datos)
+    app.config['INGESTION_SPOOL_FOLDER'] = os.environ.get('INGESTION_SPOOL_FOLDER',
+                                                          os.path.join(app.config['UPLOAD_FOLDER'], 'incoming'))
     app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB
-    app.config['ALLOWED_EXTENSIONS'] = {'csv'}
+    app.config['ALLOWED_EXTENSIONS'] = {'csv', 'zip'}
+    app.config['PREDICTION_API_CHUNK_SIZE'] = int(os.environ.get('PREDICTION_API_CHUNK_SIZE', 1000))
+    app.config['IMPORT_CHUNK_SIZE'] = int(os.environ.get('IMPORT_CHUNK_SIZE', 5000))
+    
+    # Ingesta de CSV por bloques (/data-management/upload/stream), sin el límite anterior
+    app.config['STREAM_UPLOAD_MAX_BYTES'] = int(os.environ.get('STREAM_UPLOAD_MAX_BYTES', 2 * 1024 * 1024 * 1024))  # 2 GB, 0 sin límite
+    app.config['STREAM_CHUNK_ROWS'] = int(os.environ.get('STREAM_CHUNK_ROWS', 50000))
+    app.config['STREAM_SYNC_MAX_BYTES'] = int(os.environ.get('STREAM_SYNC_MAX_BYTES', 8 * 1024 * 1024))  # 8 MB con sync=true
+    app.config['INGESTION_WORKERS'] = int(os.environ.get('INGESTION_WORKERS', 1))
+    app.config['INGESTION_PARSE_WORKERS'] = int(os.environ.get('INGESTION_PARSE_WORKERS', 0))  # 0: uno por núcleo
+    
+    # Selección de modelo con validación cruzada al reentrenar (opcional)
+    app.config['MODEL_SELECTION_ENABLED'] = os.environ.get('MODEL_SELECTION_ENABLED', 'False').lower() == 'true'
+    app.config['MODEL_SELECTION_CV_FOLDS'] = int(os.environ.get('MODEL_SELECTION_CV_FOLDS', 5))
+    app.config['MODEL_SELECTION_METRIC'] = os.environ.get('MODEL_SELECTION_METRIC', 'r2')
+    app.config['MODEL_SELECTION_TIME_BUDGET'] = float(os.environ.get('MODEL_SELECTION_TIME_BUDGET', 60))
+    app.config['MODEL_SELECTION_N_JOBS'] = int(os.environ.get('MODEL_SELECTION_N_JOBS', -1))
+    
+    # Modelos por edificio (con el modelo global como respaldo)
+    app.config['BUILDING_MODELS_ENABLED'] = os.environ.get('BUILDING_MODELS_ENABLED', 'False').lower() == 'true'
+    app.config['BUILDING_MODELS_MIN_SAMPLES'] = int(os.environ.get('BUILDING_MODELS_MIN_SAMPLES', 30))
+    app.config['BUILDING_MODELS_N_JOBS'] = int(os.environ.get('BUILDING_MODELS_N_JOBS', -1))
+    
+    # Caché de predicciones repetidas (LRU con caducidad en segundos)
+    app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
+    app.config['PREDICTION_CACHE_TTL'] = float(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+    
+    # Tiempos por etapa de las predicciones (histogramas y cabecera Server-Timing)
+    app.config['STAGE_TIMING_ENABLED'] = os.environ.get('STAGE_TIMING_ENABLED', 'True').lower() == 'true'
+    app.config['SERVER_TIMING_ENABLED'] = os.environ.get('SERVER_TIMING_ENABLED', 'False').lower() == 'true'
     
     # Configuración de Email - MOVER AQUÍ
     app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
@@ -71,6 +120,7 @@ def configure_app(app):
     
     # Crear directorios necesarios
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(app.config['INGESTION_SPOOL_FOLDER'], exist_ok=True)
 
 def initialize_extensions(app):
     """Inicializar extensiones Flask"""
@@ -136,6 +186,127 @@ def register_blueprints(app):
         except Exception as e:
             return f"Error: {str(e)}"
 
+def configure_prediction_cache(app):
+    """Ajusta el tamaño y la caducidad de la caché de predicciones"""
+    from energia_app.models.cache import prediction_cache
+    
+    prediction_cache.configure(maxsize=app.config['PREDICTION_CACHE_SIZE'],
+                               ttl=app.config['PREDICTION_CACHE_TTL'])
+
+def configure_stage_timing(app):
+    """Activa los histogramas por etapa y, opcionalmente, la cabecera Server-Timing"""
+    from energia_app.utils import timing
+    
+    timing.init_app(app)
+
+def warm_prediction_table(app):
+    """Carga el modelo y programa la tabla de predicciones de los edificios activos"""
+    from energia_app.models.user import Building
+    from energia_app.models.lookup import refresh_buildings
+    
+    if app.config.get('TESTING'):
+        return
+    
+    try:
+        with app.app_context():
+            refresh_buildings(Building.query.filter_by(active=True).all())
+    except Exception as e:
+        # La base de datos puede no existir todavía (antes de init-db)
+        logging.getLogger(__name__).warning(f"No se pudo precalcular la tabla de predicciones: {str(e)}")
+
+def check_database_schema(app):
+    """
+    Detiene el arranque si la base de datos no tiene las tablas o columnas de los modelos
+    
+    Cualquier consulta de un modelo lee todas sus columnas, así que con el
+    esquema antiguo fallarían todas las peticiones. Los cambios los aplica
+    ``flask upgrade-db`` una sola vez, fuera de los workers.
+    
+    Raises:
+        RuntimeError: Si falta alguna tabla o columna
+    """
+    from energia_app.models.schema import pending_schema_changes
+    
+    with app.app_context():
+        pending = pending_schema_changes()
+    if pending:
+        raise RuntimeError(
+            f"La base de datos no está al día (faltan: {', '.join(pending)}): "
+            "ejecute 'flask --app app upgrade-db' antes de arrancar la aplicación"
+        )
+
+def check_feature_columns(app):
+    """
+    Avisa si las características materializadas o el índice de huellas de EnergyData no están al día
+    
+    No modifica la base de datos: el recálculo y el índice de huellas los aplica
+    ``flask backfill-features`` una sola vez, no cada worker al arrancar.
+    """
+    from energia_app.models.energy_data import EnergyData
+    from energia_app.models.schema import pending_schema_changes
+    
+    if app.config.get('TESTING'):
+        return
+    
+    try:
+        with app.app_context():
+            if pending_schema_changes():
+                # check_database_schema detiene el arranque con el detalle
+                return
+            if not EnergyData.has_materialized_features():
+                logging.getLogger(__name__).warning(
+                    "Hay registros con características desactualizadas: "
+                    "ejecute 'flask --app app backfill-features'"
+                )
+            elif not EnergyData.has_fingerprint_index():
+                logging.getLogger(__name__).warning(
+                    "Falta el índice único de huellas (las subidas repetidas no se detectan en la base de datos): "
+                    "ejecute 'flask --app app backfill-features'"
+                )
+    except Exception as e:
+        # La base de datos puede no existir todavía (antes de init-db)
+        logging.getLogger(__name__).warning(f"No se pudieron comprobar las columnas de características: {str(e)}")
+
+def recover_ingestion_jobs(app):
+    """
+    Marca como fallidos los trabajos de ingesta de procesos que ya no existen
+    
+    La tabla la crea ``flask upgrade-db``, no cada worker al arrancar.
+    """
+    if app.config.get('TESTING'):
+        return
+    
+    try:
+        with app.app_context():
+            interrupted = get_service('ingestion').recover_interrupted()
+            if interrupted:
+                logging.getLogger(__name__).warning(f"{interrupted} trabajos de ingesta interrumpidos marcados como fallidos")
+    except Exception as e:
+        # La base de datos puede no existir todavía (antes de init-db)
+        logging.getLogger(__name__).warning(f"No se pudieron recuperar los trabajos de ingesta: {str(e)}")
+
+def recover_training_jobs(app):
+    """
+    Marca como fallidos los reentrenamientos de procesos que ya no existen y
+    lanza el reentrenamiento pendiente que estuviera esperando a alguno
+    
+    La tabla la crea ``flask upgrade-db``, no cada worker al arrancar.
+    """
+    if app.config.get('TESTING'):
+        return
+    
+    try:
+        with app.app_context():
+            training = get_service('training')
+            interrupted = training.recover_interrupted()
+            if interrupted:
+                logging.getLogger(__name__).warning(f"{interrupted} reentrenamientos interrumpidos marcados como fallidos")
+            # Un reentrenamiento pendiente de un trabajo interrumpido no debe quedarse esperando
+            training.start_waiting()
+    except Exception as e:
+        # La base de datos puede no existir todavía (antes de init-db)
+        logging.getLogger(__name__).warning(f"No se pudieron recuperar los trabajos de reentrenamiento: {str(e)}")
+
 def register_commands(app):
     """Registrar comandos CLI"""
     @app.cli.command('init-db')
@@ -154,10 +325,125 @@ def register_commands(app):
                 db.session.add(admin)
                 db.session.commit()
                 print("Usuario administrador creado con éxito.")
+    
+    @app.cli.command('upgrade-db')
+    def upgrade_db():
+        """Crear las tablas y columnas nuevas en una base de datos existente (sin recalcular datos)"""
+        from energia_app.models.schema import upgrade_schema
+        
+        with app.app_context():
+            applied = upgrade_schema()
+            if applied:
+                print(f"Esquema actualizado: {', '.join(applied)}.")
+            else:
+                print("El esquema ya está al día.")
+    
+    @app.cli.command('rebuild-snapshot')
+    def rebuild_snapshot():
+        """Reconstruir la instantánea columnar de datos de entrenamiento"""
+        from energia_app.models.energy_data import EnergyData
+        
+        with app.app_context():
+            rows = EnergyData.rebuild_snapshot()
+            print(f"Instantánea de entrenamiento reconstruida con {rows} registros.")
+    
+    @app.cli.command('backfill-features')
+    def backfill_features():
+        """Recalcular las características materializadas y crear el índice de huellas"""
+        from energia_app.models.energy_data import EnergyData
+        from energia_app.models.schema import pending_schema_changes
+        
+        with app.app_context():
+            # Las consultas del modelo leen todas las columnas: el esquema debe estar al día
+            if pending_schema_changes():
+                raise click.ClickException("La base de datos no está al día: ejecute antes 'flask --app app upgrade-db'")
+            updated = EnergyData.backfill_features()
+            print(f"Características recalculadas para {updated} registros.")
+            
+            # Huellas repetidas resueltas antes del índice único, que no se
+            # puede crear mientras haya huellas duplicadas
+            cleared = EnergyData.dedupe_fingerprints()
+            if cleared:
+                print(f"Huellas repetidas anuladas en {cleared} registros.")
+            if EnergyData.ensure_fingerprint_index():
+                print("Índice único de huellas creado.")
+    
+    @app.cli.command('load-data')
+    @click.argument('patterns', nargs=-1, required=True)
+    @click.option('--workers', type=int, default=None,
+                  help='Procesos de lectura con varios archivos (por defecto, uno por núcleo).')
+    @click.option('--chunk-rows', type=int, default=None,
+                  help='Filas por bloque al cargar un único CSV (por defecto STREAM_CHUNK_ROWS).')
+    def load_data(patterns, workers, chunk_rows):
+        """Cargar CSV o ZIP en los datos energéticos (rutas o patrones como energia_app/data/*.csv)"""
+        import glob
+        import time
+        import shutil
+        import tempfile
+        from energia_app.models.energy_data import EnergyData
+        from energia_app.utils.ingestion import expand_archives, ingest_csv, ingest_files
+        from energia_app.services.training_service import NewRowsStatistics
+        
+        paths = []
+        for pattern in patterns:
+            matches = sorted(glob.glob(pattern)) or ([pattern] if os.path.isfile(pattern) else [])
+            if not matches:
+                raise click.ClickException(f"No hay archivos que coincidan con {pattern}")
+            paths.extend(path for path in matches if path not in paths)
+        
+        def report_entry(entry):
+            name = entry.get('file', f"bloque {entry['chunk']}")
+            print(f"  {name}: {entry['imported']} importados, {entry['duplicate']} duplicados, "
+                  f"{entry['rejected']} rechazados")
+            for error in entry['errors']:
+                print(f"    {error}")
+        
+        with app.app_context():
+            db.create_all()
+            extract_dir = tempfile.mkdtemp(prefix='load-data-')
+            new_rows = NewRowsStatistics()
+            started = time.perf_counter()
+            try:
+                # El nombre del archivo (sin directorio) identifica sus filas, como en las subidas
+                files = expand_archives([(os.path.basename(path), path) for path in paths], extract_dir,
+                                        remove_archives=False)
+                if not files:
+                    raise click.ClickException("Los archivos ZIP no contienen archivos CSV")
+                print(f"Cargando {len(files)} archivo(s)...")
+                # Sin RETURNING (inserción directa con el driver); la instantánea se reconstruye al final
+                if len(files) == 1:
+                    try:
+                        report = ingest_csv(files[0][1], chunk_rows=chunk_rows or app.config.get('STREAM_CHUNK_ROWS', 50000),
+                                            on_chunk=report_entry, update_snapshot=False, on_commit=new_rows,
+                                            source_name=files[0][0])
+                    except ValueError as e:
+                        raise click.ClickException(str(e))
+                else:
+                    report = ingest_files(files, workers=workers or app.config.get('INGESTION_PARSE_WORKERS') or None,
+                                          on_file=report_entry, update_snapshot=False, on_commit=new_rows)
+            finally:
+                shutil.rmtree(extract_dir, ignore_errors=True)
+            elapsed = time.perf_counter() - started
+            
+            print(f"{report['rows_imported']} registros importados de {report['rows_total']} "
+                  f"({report['rows_duplicate']} duplicados, {report['rows_rejected']} rechazados) "
+                  f"en {elapsed:.1f} s: {report['rows_total'] / max(elapsed, 1e-9):,.0f} filas/s")
+            
+            started = time.perf_counter()
+            if EnergyData.analyze():
+                print(f"Estadísticas de índices actualizadas en {time.perf_counter() - started:.1f} s.")
+            if report['rows_imported']:
+                started = time.perf_counter()
+                rows = EnergyData.rebuild_snapshot()
+                print(f"Instantánea de entrenamiento reconstruida con {rows} registros "
+                      f"en {time.perf_counter() - started:.1f} s.")
+            if not get_service('training').fold_new_rows(new_rows):
+                print("Hay un reentrenamiento en curso: se reentrenará con todos los datos al terminar.")
 
 # ✅ LÍNEA CLAVE AGREGADA: Crear la instancia global de la aplicación
 # Esta línea es FUNDAMENTAL para que wsgi.py pueda importar 'app'
 app = create_app()
 
 if __name__ == '__main__':
+    check_database_schema(app)
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1 @@
+"""Microbenchmarks de inferencia y acceso a datos (ver benchmarks/run.py)"""
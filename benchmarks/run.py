@@ -0,0 +1,164 @@
+"""
+Ejecuta la suite de microbenchmarks y la compara con la línea base
+
+Uso:
+    python benchmarks/run.py                      # ejecutar y comparar
+    python benchmarks/run.py --quick              # tamaños reducidos
+    python benchmarks/run.py --only predict,import
+    python benchmarks/run.py --save-baseline      # fijar la línea base
+    python benchmarks/run.py --allow-missing-baseline
+
+Los resultados se guardan en ``benchmarks/results/<fecha>.json``. Cada caso
+se compara por mediana con ``benchmarks/baseline.json`` y el proceso termina
+con código 1 cuando alguno es más lento que la línea base por encima de la
+tolerancia (25% por defecto). Si no hay línea base termina con código 2,
+salvo con ``--allow-missing-baseline``, para que la comprobación no pase en
+silencio sin comparar nada.
+"""
+
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from benchmarks.suite import CASES, BenchmarkContext  # noqa: E402
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+DEFAULT_TOLERANCE = 0.25
+
+
+def git_revision():
+    """Commit actual del repositorio (None si no está disponible)"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(names, quick=False):
+    """
+    Ejecuta los casos indicados
+
+    Args:
+        names (list): Nombres de CASES a ejecutar
+        quick (bool): Usar tamaños reducidos
+
+    Returns:
+        dict: Resultado por caso
+    """
+    ctx = BenchmarkContext(quick=quick)
+    results = {}
+    for name in names:
+        print(f'[{name}]')
+        for measurement in CASES[name](ctx):
+            result = measurement.to_dict()
+            results[measurement.name] = result
+            throughput = f", {result['rows_per_second']:,.0f} filas/s" if result.get('rows_per_second') else ''
+            print(f"  {measurement.name:<40} {result['median'] * 1000:>11.3f} ms{throughput}")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compara las medianas con la línea base
+
+    Args:
+        results (dict): Resultados actuales por caso
+        baseline (dict): Resultados de la línea base por caso
+        tolerance (float): Aumento relativo permitido (0.25 = 25%)
+
+    Returns:
+        list: Tuplas (caso, mediana base, mediana actual, ratio) de las regresiones
+    """
+    regressions = []
+    print(f"\nComparación con la línea base (tolerancia {tolerance:.0%}):")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f'  {name:<40} (sin línea base)')
+            continue
+        ratio = result['median'] / base['median'] if base['median'] > 0 else float('inf')
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  <-- REGRESIÓN'
+            regressions.append((name, base['median'], result['median'], ratio))
+        elif ratio < 1 - tolerance:
+            flag = '  (mejora)'
+        print(f"  {name:<40} {base['median'] * 1000:>11.3f} -> {result['median'] * 1000:>11.3f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Microbenchmarks de inferencia y acceso a datos')
+    parser.add_argument('--quick', action='store_true', help='usar tamaños reducidos')
+    parser.add_argument('--only', help=f"casos separados por comas ({', '.join(CASES)})")
+    parser.add_argument('--output', help='archivo JSON de resultados')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='archivo JSON de la línea base')
+    parser.add_argument('--save-baseline', action='store_true', help='guardar los resultados como línea base')
+    parser.add_argument('--allow-missing-baseline', action='store_true',
+                        help='terminar con código 0 si no hay línea base con la que comparar')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='aumento relativo permitido de la mediana (por defecto 0.25)')
+    args = parser.parse_args(argv)
+
+    names = list(CASES)
+    if args.only:
+        names = [name.strip() for name in args.only.split(',') if name.strip()]
+        unknown = [name for name in names if name not in CASES]
+        if unknown:
+            parser.error(f"casos desconocidos: {', '.join(unknown)}")
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'quick': args.quick,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': run_suite(names, quick=args.quick),
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nResultados guardados en {output}')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Línea base guardada en {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'No hay línea base en {args.baseline}; ejecute con --save-baseline para crearla.')
+        if args.allow_missing_baseline:
+            return 0
+        print('FALLO: sin línea base no se puede comprobar si hay regresiones '
+              '(use --allow-missing-baseline para omitir la comparación).')
+        return 2
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('quick') != args.quick:
+        print('Aviso: la línea base se generó con otro modo (--quick); solo se comparan los casos comunes.')
+
+    regressions = compare(report['results'], baseline.get('results', {}), args.tolerance)
+    if regressions:
+        print(f'\nFALLO: {len(regressions)} caso(s) más lentos que la línea base:')
+        for name, base, current, ratio in regressions:
+            print(f'  {name}: {base * 1000:.3f} ms -> {current * 1000:.3f} ms (x{ratio:.2f})')
+        return 1
+    print('\nSin regresiones respecto a la línea base.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Casos de la suite de microbenchmarks
+
+Cada caso es una función que recibe el contexto de la suite y devuelve una
+lista de mediciones (``Measurement``). Los casos usan datos sintéticos con
+semilla fija y una base de datos SQLite temporal, de modo que los resultados
+solo dependen del código y de la máquina.
+
+Los artefactos del modelo (``energy_model.pkl``, ``scaler.pkl`` y el paquete
+versionado) se leen pero nunca se sobrescriben, y la instantánea de
+entrenamiento se redirige a un directorio temporal.
+"""
+
+import os
+import sys
+import time
+import logging
+import statistics
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Tamaños por defecto y en modo rápido (--quick)
+PREDICT_SIZES = [1, 100, 10_000, 1_000_000]
+PREDICT_SIZES_QUICK = [1, 100, 10_000]
+TABLE_SIZES = [1_000, 10_000, 50_000]
+TABLE_SIZES_QUICK = [1_000, 5_000]
+
+# Áreas de los edificios sintéticos (para la asignación de building_id)
+BUILDING_AREAS = [800, 1200, 1800, 2500, 3500, 4200, 5000, 6000]
+
+
+class Measurement:
+    """
+    Tiempos de varias repeticiones de un caso
+
+    Attributes:
+        name (str): Nombre único del caso (p.ej. 'predict[rows=10000]')
+        times (list): Segundos de cada repetición
+        rows (int): Filas procesadas por repetición (None si no aplica)
+    """
+
+    def __init__(self, name, times, rows=None):
+        self.name = name
+        self.times = times
+        self.rows = rows
+
+    def to_dict(self):
+        median = statistics.median(self.times)
+        result = {
+            'repeats': len(self.times),
+            'min': min(self.times),
+            'median': median,
+            'mean': statistics.fmean(self.times),
+            'stdev': statistics.stdev(self.times) if len(self.times) > 1 else 0.0,
+        }
+        if self.rows is not None:
+            result['rows'] = self.rows
+            result['rows_per_second'] = self.rows / median if median > 0 else None
+        return result
+
+
+def measure(name, func, rows=None, setup=None, repeats=5, min_time=0.2, max_repeats=1000, warmup=1):
+    """
+    Mide una función repitiéndola hasta cubrir ``repeats`` y ``min_time``
+
+    Args:
+        name (str): Nombre del caso
+        func (callable): Función a medir (sin argumentos)
+        rows (int, optional): Filas procesadas por llamada
+        setup (callable, optional): Preparación previa a cada repetición,
+            fuera del tiempo medido
+        repeats (int): Repeticiones mínimas
+        min_time (float): Segundos mínimos acumulados
+        max_repeats (int): Tope de repeticiones
+        warmup (int): Llamadas previas no medidas
+
+    Returns:
+        Measurement: Tiempos de cada repetición
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        func()
+
+    times = []
+    while len(times) < max_repeats and (len(times) < repeats or sum(times) < min_time):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return Measurement(name, times, rows)
+
+
+def synthetic_frame(rows, seed=42):
+    """
+    Genera registros sintéticos con las columnas de EnergyData
+
+    Args:
+        rows (int): Número de filas
+        seed (int): Semilla del generador
+
+    Returns:
+        DataFrame: area_edificio, ocupacion, dia_semana, hora_dia y consumo_energetico
+    """
+    rng = np.random.default_rng(seed)
+    area = rng.choice(BUILDING_AREAS, size=rows) * rng.uniform(0.98, 1.02, size=rows)
+    ocupacion = rng.integers(0, 300, size=rows)
+    dia_semana = rng.integers(0, 7, size=rows)
+    hora_dia = rng.integers(0, 24, size=rows)
+    consumo = 0.01 * area + 0.15 * ocupacion + rng.normal(0, 2, size=rows)
+    return pd.DataFrame({
+        'area_edificio': area,
+        'ocupacion': ocupacion,
+        'dia_semana': dia_semana,
+        'hora_dia': hora_dia,
+        'consumo_energetico': np.maximum(consumo, 0.1),
+    })
+
+
+class BenchmarkContext:
+    """
+    Aplicación Flask sobre una base de datos SQLite temporal
+
+    Attributes:
+        app (Flask): Aplicación configurada para la suite
+        client (FlaskClient): Cliente con sesión de administrador
+        quick (bool): Usar tamaños reducidos
+    """
+
+    def __init__(self, quick=False):
+        self.quick = quick
+        self.workdir = tempfile.mkdtemp(prefix='energia-bench-')
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(self.workdir, 'bench.db')}"
+        if ROOT_DIR not in sys.path:
+            sys.path.insert(0, ROOT_DIR)
+
+        # Los avisos de arranque (tablas aún sin crear) no aportan nada aquí
+        logging.disable(logging.WARNING)
+
+        from app import app
+        from energia_app.models.user import db, User, Building
+        from energia_app.models.snapshot import training_snapshot
+
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        training_snapshot.directory = os.path.join(self.workdir, 'snapshot')
+
+        with app.app_context():
+            db.create_all()
+            admin = User(username='bench', email='bench@example.com', role='admin')
+            admin.set_password('bench')
+            db.session.add(admin)
+            for i, area in enumerate(BUILDING_AREAS):
+                db.session.add(Building(name=f'Edificio {i + 1}', area=area, active=True))
+            db.session.commit()
+
+        self.app = app
+        self.client = app.test_client()
+        self.client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+    @property
+    def predict_sizes(self):
+        return PREDICT_SIZES_QUICK if self.quick else PREDICT_SIZES
+
+    @property
+    def table_sizes(self):
+        return TABLE_SIZES_QUICK if self.quick else TABLE_SIZES
+
+    def reset_table(self):
+        """Vacía EnergyData y la instantánea de entrenamiento"""
+        from energia_app.models.user import db
+        from energia_app.models.energy_data import EnergyData
+        from energia_app.models.snapshot import training_snapshot
+        from energia_app.models.fingerprint import fingerprint_filter
+
+        EnergyData.query.delete()
+        db.session.commit()
+        training_snapshot.clear()
+        fingerprint_filter.clear()
+
+    def fill_table(self, rows):
+        """Deja EnergyData con exactamente ``rows`` registros sintéticos"""
+        from energia_app.models.energy_data import EnergyData
+
+        self.reset_table()
+        EnergyData.import_from_df(synthetic_frame(rows))
+
+
+def bench_preprocess(ctx):
+    """preprocess_data en modo predicción con el escalador desplegado"""
+    from energia_app.models.preprocess import preprocess_data
+
+    results = []
+    for rows in ctx.predict_sizes:
+        df = synthetic_frame(rows).drop(columns='consumo_energetico')
+        results.append(measure(f'preprocess_data[rows={rows}]', lambda: preprocess_data(df, training=False),
+                               rows=rows, repeats=3 if rows >= 1_000_000 else 5))
+    return results
+
+
+def bench_predict(ctx):
+    """Energy_Model.predict sobre características ya preprocesadas"""
+    from energia_app.models.model import Energy_Model
+    from energia_app.models.preprocess import preprocess_data
+
+    model = Energy_Model()
+    if not model.trained:
+        print('  (omitido: no hay un modelo entrenado)')
+        return []
+
+    results = []
+    for rows in ctx.predict_sizes:
+        X, _ = preprocess_data(synthetic_frame(rows).drop(columns='consumo_energetico'), training=False)
+        results.append(measure(f'predict[rows={rows}]', lambda: model.predict(X),
+                               rows=rows, repeats=3 if rows >= 1_000_000 else 5))
+    return results
+
+
+def bench_model_load(ctx):
+    """Carga desde disco del modelo, el escalador y el paquete versionado (sin registro)"""
+    from energia_app.models.model import load_model_file
+    from energia_app.models.preprocess import load_scaler
+    from energia_app.models.bundle import load_bundle
+    from energia_app.models.registry import MODEL_PATH, SCALER_PATH, BUNDLE_PATH
+
+    results = []
+    for name, loader, path in [('load_model', load_model_file, MODEL_PATH),
+                               ('load_scaler', load_scaler, SCALER_PATH),
+                               ('load_bundle', load_bundle, BUNDLE_PATH)]:
+        if not os.path.exists(path):
+            print(f'  (omitido {name}: no existe {path})')
+            continue
+        results.append(measure(name, lambda: loader(path), repeats=10))
+    return results
+
+
+def bench_import(ctx):
+    """EnergyData.import_from_df sobre una tabla vacía"""
+    from energia_app.models.energy_data import EnergyData
+
+    results = []
+    with ctx.app.app_context():
+        for rows in ctx.table_sizes:
+            df = synthetic_frame(rows)
+            results.append(measure(f'import_from_df[rows={rows}]', lambda: EnergyData.import_from_df(df),
+                                   rows=rows, setup=ctx.reset_table, repeats=3, min_time=0, warmup=0))
+    return results
+
+
+def bench_export(ctx):
+    """EnergyData.export_to_df desde la instantánea y desde la base de datos"""
+    from energia_app.models.energy_data import EnergyData
+    from energia_app.models.snapshot import training_snapshot
+
+    def drop_snapshot():
+        meta_path = training_snapshot.meta_path
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+    results = []
+    with ctx.app.app_context():
+        for rows in ctx.table_sizes:
+            ctx.fill_table(rows)
+            EnergyData.rebuild_snapshot()
+            results.append(measure(f'export_to_df[snapshot,rows={rows}]',
+                                   lambda: EnergyData.export_to_df(include_features=True),
+                                   rows=rows, repeats=5))
+            results.append(measure(f'export_to_df[database,rows={rows}]',
+                                   lambda: EnergyData.export_to_df(include_features=True),
+                                   rows=rows, setup=drop_snapshot, repeats=3, min_time=0))
+        ctx.reset_table()
+    return results
+
+
+def bench_export_route(ctx):
+    """Ruta de exportación CSV (/data-management/export), cuerpo completo"""
+    results = []
+    for rows in ctx.table_sizes:
+        with ctx.app.app_context():
+            ctx.fill_table(rows)
+
+        def export():
+            response = ctx.client.get('/data-management/export')
+            if response.status_code != 200:
+                raise RuntimeError(f'La exportación respondió {response.status_code}')
+            return response.get_data()
+
+        results.append(measure(f'export_route[rows={rows}]', export, rows=rows, repeats=3, min_time=0))
+    with ctx.app.app_context():
+        ctx.reset_table()
+    return results
+
+
+# Casos en orden de ejecución
+CASES = {
+    'preprocess': bench_preprocess,
+    'predict': bench_predict,
+    'model_load': bench_model_load,
+    'import': bench_import,
+    'export': bench_export,
+    'export_route': bench_export_route,
+}
@@ -0,0 +1,397 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from itertools import islice
+import numpy as np
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from flask_login import login_required, current_user
+from sqlalchemy import insert
+from energia_app.models.model import Energy_Model
+from energia_app.models.building_models import predict_for_buildings
+from energia_app.models.cache import prediction_cache
+from energia_app.models.energy_data import EnergyData
+from energia_app.models.user import Building, Prediction, db
+from energia_app.utils.timing import stage, stage_timings
+
+logger = logging.getLogger(__name__)
+prediction_api_bp = Blueprint('prediction_api', __name__, url_prefix='/api/predictions')
+
+DEFAULT_CHUNK_SIZE = 1000
+NDJSON_MIMETYPE = 'application/x-ndjson'
+MAX_HORIZON_HOURS = 168
+
+
+def _request_flag(name, payload=None):
+    """Lee un indicador booleano del query string o del cuerpo JSON"""
+    if isinstance(payload, dict) and name in payload:
+        return bool(payload[name])
+    return request.args.get(name, 'false').lower() in ('1', 'true', 'yes')
+
+
+def _iter_request_rows():
+    """
+    Itera las filas de la petición sin cargar todo el cuerpo si es NDJSON
+
+    Acepta un cuerpo NDJSON (una fila JSON por línea), una lista JSON o un
+    objeto JSON con la clave ``rows``.
+    """
+    if request.mimetype == NDJSON_MIMETYPE:
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield {'_error': 'Línea JSON inválida'}
+        return
+
+    payload = request.get_json(silent=True)
+    rows = payload.get('rows', []) if isinstance(payload, dict) else payload
+    yield from rows or []
+
+
+def _integer_field(row, name):
+    """
+    Lee un campo entero de una fila sin truncar decimales
+
+    Raises:
+        KeyError: Si falta el campo
+        ValueError: Si no es un número entero (como ``not_integer`` al importar)
+    """
+    value = float(row[name])
+    if not np.isfinite(value) or value != np.floor(value):
+        raise ValueError(f'{name} debe ser un número entero')
+    return int(value)
+
+
+def _parse_row(row, building_areas):
+    """
+    Valida una fila de entrada
+
+    Args:
+        row (dict): Fila con building_id o area_edificio, ocupacion, dia_semana y hora_dia
+        building_areas (dict): Área por ID de edificio
+
+    Returns:
+        tuple: (building_id, area, ocupacion, dia_semana, hora_dia)
+
+    Raises:
+        ValueError: Si la fila no es válida (ocupacion, dia_semana, hora_dia y
+                    building_id con decimales incluidos)
+    """
+    if not isinstance(row, dict):
+        raise ValueError('La fila debe ser un objeto JSON')
+    if '_error' in row:
+        raise ValueError(row['_error'])
+
+    building_id = row.get('building_id')
+    if building_id is not None:
+        building_id = _integer_field(row, 'building_id')
+        if building_id not in building_areas:
+            raise ValueError(f'Edificio no encontrado: {building_id}')
+        area = building_areas[building_id]
+    elif row.get('area_edificio') is not None:
+        area = float(row['area_edificio'])
+    else:
+        raise ValueError('Se requiere building_id o area_edificio')
+
+    try:
+        ocupacion = _integer_field(row, 'ocupacion')
+        dia_semana = _integer_field(row, 'dia_semana')
+        hora_dia = _integer_field(row, 'hora_dia')
+    except KeyError as e:
+        raise ValueError(f'Campo requerido: {e.args[0]}')
+
+    if not np.isfinite(area) or area <= 0:
+        raise ValueError('area_edificio debe ser mayor que 0')
+    if ocupacion < 0:
+        raise ValueError('ocupacion debe ser mayor o igual a 0')
+    if not 0 <= dia_semana <= 6:
+        raise ValueError('dia_semana debe estar entre 0 y 6')
+    if not 0 <= hora_dia <= 23:
+        raise ValueError('hora_dia debe estar entre 0 y 23')
+
+    return building_id, area, ocupacion, dia_semana, hora_dia
+
+
+def score_chunk(model, chunk, offset, building_areas):
+    """
+    Valida y evalúa un bloque de filas con una sola llamada por modelo
+
+    La validación y el paso a arrays se miden como la etapa 'preprocess' y la
+    evaluación como 'predict'.
+
+    Args:
+        model (Energy_Model): Modelo entrenado
+        chunk (list): Filas de entrada
+        offset (int): Índice de la primera fila del bloque
+        building_areas (dict): Área por ID de edificio
+
+    Returns:
+        list: Un resultado por fila (predicción o error), en orden
+    """
+    results = [None] * len(chunk)
+    valid = []
+    with stage('preprocess'):
+        for i, row in enumerate(chunk):
+            try:
+                valid.append((i, _parse_row(row, building_areas)))
+            except (TypeError, ValueError) as e:
+                results[i] = {'index': offset + i, 'error': str(e)}
+        columns = list(zip(*(parsed for _, parsed in valid)))
+
+    if valid:
+        with stage('predict'):
+            values = predict_for_buildings(model, columns[0],
+                                           np.asarray(columns[1], dtype=float),
+                                           np.asarray(columns[2], dtype=float),
+                                           np.asarray(columns[3]),
+                                           np.asarray(columns[4]))
+        for (i, (building_id, area, ocupacion, dia_semana, hora_dia)), value in zip(valid, values.tolist()):
+            results[i] = {
+                'index': offset + i,
+                'building_id': building_id,
+                'area_edificio': area,
+                'ocupacion': ocupacion,
+                'dia_semana': dia_semana,
+                'hora_dia': hora_dia,
+                'consumo_predicho': round(value, 2)
+            }
+    return results
+
+
+@prediction_api_bp.route('/bulk', methods=['POST'])
+@login_required
+def bulk_predict():
+    """
+    Predicciones masivas con respuesta NDJSON en streaming
+
+    Las filas se evalúan en bloques de ``chunk_size`` y cada resultado se
+    emite como una línea JSON, de modo que la memoria no depende del número
+    de filas. Con ``persist=true`` las filas con ``building_id`` se guardan
+    en Prediction (un executemany y un commit por bloque).
+    """
+    with stage('model_load'):
+        model = Energy_Model()
+    if not model.trained:
+        return jsonify({'error': 'El modelo no está entrenado'}), 503
+
+    payload = request.get_json(silent=True) if request.mimetype != NDJSON_MIMETYPE else None
+    persist = _request_flag('persist', payload)
+    chunk_size = request.args.get('chunk_size', current_app.config.get('PREDICTION_API_CHUNK_SIZE', DEFAULT_CHUNK_SIZE), type=int)
+    chunk_size = max(1, chunk_size)
+
+    with stage('building_query'):
+        building_areas = {b.id: b.area for b in Building.query.with_entities(Building.id, Building.area)}
+
+    def generate():
+        rows = _iter_request_rows()
+        offset = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+
+            results = score_chunk(model, chunk, offset, building_areas)
+            offset += len(chunk)
+
+            if persist:
+                now = datetime.now()
+                records = [{
+                    'building_id': r['building_id'],
+                    'timestamp': now,
+                    'ocupacion': r['ocupacion'],
+                    'dia_semana': r['dia_semana'],
+                    'hora_dia': r['hora_dia'],
+                    'consumo_predicho': r['consumo_predicho']
+                } for r in results if 'error' not in r and r['building_id'] is not None]
+                if records:
+                    try:
+                        with stage('db_commit'):
+                            db.session.execute(insert(Prediction), records)
+                            db.session.commit()
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.error(f"Error al guardar predicciones masivas: {str(e)}")
+                        yield json.dumps({'error': 'Error al guardar predicciones del bloque',
+                                          'start': offset - len(chunk), 'end': offset - 1}) + '\n'
+
+            yield ''.join(json.dumps(r) + '\n' for r in results)
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def default_occupancy_profile(building_id):
+    """
+    Perfil de ocupación 7x24 a partir del histórico de EnergyData
+
+    Se usa la media del edificio por día y hora; los huecos se completan con
+    la media de todos los edificios y, si no hay datos, con la media global
+    (o 0 si la tabla está vacía).
+
+    Args:
+        building_id (int): ID del edificio
+
+    Returns:
+        ndarray: Ocupación esperada con forma (7, 24)
+    """
+    profile = EnergyData.get_avg_occupancy_profile(building_id)
+    if np.isnan(profile).any():
+        overall = EnergyData.get_avg_occupancy_profile()
+        profile = np.where(np.isnan(profile), overall, profile)
+    if np.isnan(profile).any():
+        known = profile[~np.isnan(profile)]
+        profile = np.where(np.isnan(profile), known.mean() if known.size else 0.0, profile)
+    return profile
+
+
+def _parse_schedule(value, hours):
+    """
+    Convierte el horario de ocupación recibido en un array de ``hours`` valores
+
+    Acepta un número (ocupación constante), una lista de 24 valores (patrón
+    diario que se repite) o una lista con un valor por hora del horizonte.
+    """
+    schedule = np.asarray(value, dtype=float)
+    if schedule.ndim == 0:
+        schedule = np.full(hours, float(schedule))
+    elif schedule.ndim == 1 and len(schedule) == 24 and hours != 24:
+        schedule = np.resize(schedule, hours)
+    elif schedule.ndim != 1 or len(schedule) != hours:
+        raise ValueError(f'ocupacion debe ser un número, un patrón diario de 24 valores o un valor por hora ({hours})')
+    if not np.isfinite(schedule).all() or (schedule < 0).any():
+        raise ValueError('ocupacion debe ser mayor o igual a 0')
+    return schedule
+
+
+@prediction_api_bp.route('/horizon/<int:building_id>', methods=['GET', 'POST'])
+@login_required
+def horizon(building_id):
+    """
+    Predicción del consumo de un edificio para las próximas horas
+
+    Parámetros (query string o cuerpo JSON):
+        hours (int): Longitud del horizonte (por defecto 24, máximo 168)
+        start (str): Fecha y hora ISO de la primera hora (por defecto la
+                     próxima hora en punto)
+        ocupacion: Número, patrón diario de 24 valores o un valor por hora;
+                   si se omite se usa el perfil histórico del edificio
+        persist (bool): Guardar las predicciones en Prediction
+
+    Todo el horizonte se evalúa con una única llamada vectorizada al modelo.
+    """
+    with stage('building_query'):
+        building = db.session.get(Building, building_id)
+    if building is None:
+        return jsonify({'error': f'Edificio no encontrado: {building_id}'}), 404
+
+    with stage('model_load'):
+        model = Energy_Model()
+    if not model.trained:
+        return jsonify({'error': 'El modelo no está entrenado'}), 503
+
+    payload = request.get_json(silent=True) if request.method == 'POST' else None
+    params = payload if isinstance(payload, dict) else request.args
+    try:
+        with stage('preprocess'):
+            hours = int(params.get('hours', 24))
+            if not 1 <= hours <= MAX_HORIZON_HOURS:
+                raise ValueError(f'hours debe estar entre 1 y {MAX_HORIZON_HOURS}')
+
+            if params.get('start'):
+                start = datetime.fromisoformat(str(params['start'])).replace(minute=0, second=0, microsecond=0)
+            else:
+                start = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+
+            slots = [start + timedelta(hours=i) for i in range(hours)]
+            dias = np.fromiter((slot.weekday() for slot in slots), dtype=np.intp, count=hours)
+            horas = np.fromiter((slot.hour for slot in slots), dtype=np.intp, count=hours)
+
+            occupancy_value = params.get('ocupacion')
+            if isinstance(occupancy_value, str):
+                occupancy_value = [float(v) for v in occupancy_value.split(',')] if ',' in occupancy_value else float(occupancy_value)
+            if occupancy_value is not None:
+                ocupacion = _parse_schedule(occupancy_value, hours)
+        if occupancy_value is None:
+            occupancy_source = 'perfil'
+            with stage('occupancy_profile'):
+                ocupacion = default_occupancy_profile(building.id)[dias, horas]
+        else:
+            occupancy_source = 'horario'
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    with stage('predict'):
+        values = predict_for_buildings(model, np.full(hours, building.id), building.area, ocupacion, dias, horas)
+        values = np.round(values, 2)
+
+    points = [{
+        'timestamp': slot.isoformat(timespec='minutes'),
+        'dia_semana': int(dia),
+        'hora_dia': int(hora),
+        'ocupacion': round(float(occ), 2),
+        'consumo_predicho': float(value)
+    } for slot, dia, hora, occ, value in zip(slots, dias, horas, ocupacion, values)]
+
+    persisted = 0
+    if _request_flag('persist', payload):
+        now = datetime.now()
+        try:
+            with stage('db_commit'):
+                db.session.execute(insert(Prediction), [{
+                    'building_id': building.id,
+                    'timestamp': now,
+                    'ocupacion': int(round(point['ocupacion'])),
+                    'dia_semana': point['dia_semana'],
+                    'hora_dia': point['hora_dia'],
+                    'consumo_predicho': point['consumo_predicho']
+                } for point in points])
+                db.session.commit()
+            persisted = len(points)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error al guardar el horizonte de predicciones: {str(e)}")
+            return jsonify({'error': 'Error al guardar las predicciones'}), 500
+
+    return jsonify({
+        'building_id': building.id,
+        'building_name': building.name,
+        'area': building.area,
+        'start': start.isoformat(timespec='minutes'),
+        'hours': hours,
+        'occupancy_source': occupancy_source,
+        'total_consumption': round(float(values.sum()), 2),
+        'persisted': persisted,
+        'predictions': points
+    })
+
+
+@prediction_api_bp.route('/cache', methods=['GET'])
+@login_required
+def cache_stats():
+    """Contadores de la caché de predicciones (aciertos, fallos, expulsiones)"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    return jsonify(prediction_cache.stats())
+
+
+@prediction_api_bp.route('/metrics', methods=['GET'])
+@login_required
+def stage_metrics():
+    """
+    Histogramas de duración por etapa de las rutas de predicción
+
+    Con ``format=prometheus`` se devuelve el formato de texto de Prometheus;
+    con ``reset=true`` se descartan las observaciones tras leerlas.
+    """
+    if current_user.role != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+
+    if request.args.get('format') == 'prometheus':
+        body = Response(stage_timings.prometheus(), mimetype='text/plain; version=0.0.4')
+    else:
+        body = jsonify({'enabled': stage_timings.enabled, 'stages': stage_timings.snapshot()})
+    if _request_flag('reset'):
+        stage_timings.reset()
+    return body
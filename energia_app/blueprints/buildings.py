@@ -3,6 +3,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from energia_app.forms import BuildingForm
 from energia_app.models.user import Building, Prediction, db
+from energia_app.models.lookup import refresh_buildings, prediction_table
 
 buildings_bp = Blueprint('buildings', __name__, url_prefix='/buildings')
 
@@ -31,6 +32,7 @@ def manage(building_id=None):
             building.description = form.description.data
             building.active = form.active.data
             db.session.commit()
+            refresh_buildings([building])
             flash(f'Edificio "{building.name}" actualizado correctamente.')
         else:
             new_building = Building(
@@ -42,6 +44,7 @@ def manage(building_id=None):
             )
             db.session.add(new_building)
             db.session.commit()
+            refresh_buildings([new_building])
             flash(f'Edificio "{new_building.name}" registrado correctamente.')
         return redirect(url_for('buildings.manage'))
     
@@ -64,5 +67,6 @@ def delete(building_id):
     
     db.session.delete(building)
     db.session.commit()
+    prediction_table.discard(building_id)
     flash(f'Edificio "{name}" eliminado correctamente.')
     return redirect(url_for('buildings.manage'))
\ No newline at end of file
@@ -1,19 +1,28 @@
 # energia_app/blueprints/data_management.py
-from flask import Blueprint, render_template, flash, redirect, url_for, request, send_from_directory, Response, current_app
+from flask import Blueprint, render_template, flash, redirect, url_for, request, send_from_directory, Response, current_app, jsonify
 from flask_login import login_required, current_user
 import os
 import io
+import zipfile
 import csv
 import pandas as pd
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 from energia_app.forms import EnergyDataForm
 from energia_app.models.energy_data import EnergyData
-from energia_app.models.model import Energy_Model
-from energia_app.models.preprocess import preprocess_data
+from energia_app.models.snapshot import training_snapshot
+from energia_app.models.fingerprint import fingerprint_filter
 from energia_app.models.user import db, Building
+from energia_app.services import get_service
+from energia_app.services.training_service import NewRowsStatistics
+from energia_app.models.ingestion import IngestionJob
+from energia_app.utils.ingestion import REQUIRED_COLUMNS, archive_members, spool_request_body, save_upload, ingest_csv
 
 data_bp = Blueprint('data', __name__, url_prefix='/data-management')
 
+# Trabajos de ingesta mostrados en la página de seguimiento
+INGESTION_JOBS_SHOWN = 20
+
 @data_bp.route('/', methods=['GET', 'POST'])
 @login_required
 def manage():
@@ -65,8 +74,15 @@ def manage():
             if manual_form.building_id.data and manual_form.building_id.data > 0:
                 new_data.building_id = manual_form.building_id.data
             
+            new_data.materialize_features()
             db.session.add(new_data)
             db.session.commit()
+            rows = training_snapshot.frame_from_records([new_data])
+            training_snapshot.append(rows)
+            # Incluir el registro en los estadísticos del modelo para el próximo reentrenamiento incremental
+            new_rows = NewRowsStatistics()
+            new_rows(rows)
+            get_service('training').fold_new_rows(new_rows, user_id=current_user.id)
             flash('Registro guardado correctamente.')
             return redirect(url_for('data.manage'))
         except Exception as e:
@@ -84,50 +100,125 @@ def manage():
 @data_bp.route('/upload', methods=['POST'])
 @login_required
 def upload():
+    """Guardar los CSV o ZIP subidos y encolar su ingesta en segundo plano"""
+    wants_json = request.accept_mimetypes.best == 'application/json'
+    
     if current_user.role != 'admin':
+        if wants_json:
+            return jsonify({'error': 'No tienes permisos para acceder a esta funcionalidad.'}), 403
         flash('No tienes permisos para acceder a esta funcionalidad.')
         return redirect(url_for('dashboard.index'))
     
-    if 'file' not in request.files:
+    uploads = [file for file in request.files.getlist('file') if file.filename]
+    if not uploads:
         flash('No se ha seleccionado ningún archivo')
         return redirect(url_for('data.manage'))
     
-    file = request.files['file']
-    if file.filename == '':
-        flash('No se ha seleccionado ningún archivo')
+    if not all(allowed_file(file.filename) for file in uploads):
+        flash('Tipo de archivo no permitido. Por favor, sube archivos CSV o ZIP.')
         return redirect(url_for('data.manage'))
     
-    if file and allowed_file(file.filename):
-        try:
-            data = pd.read_csv(file)
-            required_cols = ['area_edificio', 'ocupacion', 'dia_semana', 'hora_dia', 'consumo_energetico']
-            missing_cols = [col for col in required_cols if col not in data.columns]
-            
-            if missing_cols:
-                flash(f'El archivo CSV no tiene las columnas requeridas: {", ".join(missing_cols)}')
-                return redirect(url_for('data.manage'))
-            
-            count = EnergyData.import_from_df(data)
-            flash(f'Se han importado {count} registros correctamente a la base de datos.')
-            
-            if 'retrain' in request.form and request.form['retrain'] == 'yes':
-                try:
-                    all_data = EnergyData.export_to_df()
-                    X, y = preprocess_data(all_data, training=True)
-                    model = EnergyModel()
-                    metrics = model.train(X, y)
-                    flash(f'Modelo reentrenado con éxito. R² = {metrics["r2"]:.4f}')
-                except Exception as e:
-                    flash(f'Error al reentrenar el modelo: {str(e)}')
+    saved = []
+    try:
+        for file in uploads:
+            name = secure_filename(file.filename) or 'datos.csv'
+            if name.lower().endswith('.zip'):
+                # Se comprueba que el ZIP contenga algún CSV; se extrae en segundo plano
+                with zipfile.ZipFile(file.stream) as archive:
+                    if not archive_members(archive):
+                        flash(f'El archivo {name} no contiene archivos CSV')
+                        return redirect(url_for('data.manage'))
+                suffix = '.zip'
+            else:
+                # Solo se comprueba la cabecera; el archivo se procesa en segundo plano
+                header = pd.read_csv(file.stream, nrows=0)
+                missing_cols = [col for col in REQUIRED_COLUMNS if col not in header.columns]
+                
+                if missing_cols:
+                    flash(f'El archivo {name} no tiene las columnas requeridas: {", ".join(missing_cols)}')
+                    return redirect(url_for('data.manage'))
+                suffix = '.csv'
             
-            return redirect(url_for('data.manage'))
-        except Exception as e:
-            flash(f'Error al procesar el archivo: {str(e)}')
-    else:
-        flash('Tipo de archivo no permitido. Por favor, sube un archivo CSV.')
+            file.stream.seek(0)
+            saved.append((name, save_upload(file.stream, current_app.config['INGESTION_SPOOL_FOLDER'], suffix=suffix)))
+        
+        retrain = request.form.get('retrain') == 'yes'
+        title = saved[0][0] if len(saved) == 1 else f'{len(saved)} archivos ({", ".join(name for name, _ in saved)})'
+        job = get_service('ingestion').submit(saved, title, user_id=current_user.id, retrain=retrain)
+        saved = []
+        
+        if wants_json:
+            return jsonify({'job': job, 'status_url': url_for('data.ingestion_job', job_id=job['id'])}), 202
+        flash(f'Archivos recibidos. La importación continúa en segundo plano (trabajo {job["id"]}).')
+        return redirect(url_for('data.ingestion'))
+    except zipfile.BadZipFile:
+        flash('El archivo ZIP no es válido.')
+    except Exception as e:
+        flash(f'Error al procesar el archivo: {str(e)}')
+    finally:
+        # Archivos guardados de una subida que no llegó a encolarse
+        for _, path in saved:
+            if os.path.exists(path):
+                os.remove(path)
     
     return redirect(url_for('data.manage'))
 
+@data_bp.route('/upload/stream', methods=['POST'])
+@login_required
+def upload_stream():
+    """
+    Ingesta por bloques de un CSV enviado como cuerpo de la petición
+    
+    El cuerpo (sin multipart, p.ej. ``curl --data-binary @datos.csv``) se
+    vuelca a disco sin pasar por MAX_CONTENT_LENGTH, hasta
+    STREAM_UPLOAD_MAX_BYTES, y se importa en segundo plano como trabajo de
+    ingesta (responde 202 con el trabajo). Con ``sync=true`` y un cuerpo de
+    hasta STREAM_SYNC_MAX_BYTES se importa dentro de la petición en bloques
+    de ``chunk_size`` filas y devuelve el informe JSON por bloque; cuerpos
+    mayores se encolan igualmente para no superar el tiempo máximo del
+    worker. Con ``retrain=true`` se encola un reentrenamiento al terminar.
+    ``filename`` nombra el archivo: las filas sin marca de tiempo se
+    reconocen por archivo y número de fila al volver a subirlo.
+    """
+    if current_user.role != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    chunk_rows = request.args.get('chunk_size', current_app.config.get('STREAM_CHUNK_ROWS', 50000), type=int)
+    max_bytes = current_app.config.get('STREAM_UPLOAD_MAX_BYTES') or None
+    
+    try:
+        path, size = spool_request_body(request.environ, current_app.config['INGESTION_SPOOL_FOLDER'], max_bytes)
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'El archivo supera el tamaño máximo permitido ({max_bytes} bytes).'}), 413
+    
+    retrain = request.args.get('retrain', 'false').lower() in ('1', 'true', 'yes')
+    try:
+        if size == 0:
+            return jsonify({'error': 'El cuerpo de la petición está vacío.'}), 400
+        sync = request.args.get('sync', 'false').lower() in ('1', 'true', 'yes')
+        filename = secure_filename(request.args.get('filename', '')) or 'stream.csv'
+        if not sync or size > current_app.config.get('STREAM_SYNC_MAX_BYTES', 8 * 1024 * 1024):
+            job = get_service('ingestion').submit(path, filename, user_id=current_user.id, retrain=retrain)
+            # El trabajo de ingesta borra el archivo al terminar
+            path = None
+            return jsonify({'job': job, 'status_url': url_for('data.ingestion_job', job_id=job['id'])}), 202
+        new_rows = NewRowsStatistics()
+        report = ingest_csv(path, chunk_rows=chunk_rows, on_commit=new_rows, source_name=filename)
+    except (ValueError, pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+        return jsonify({'error': f'Error al procesar el archivo: {str(e)}'}), 400
+    finally:
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+    
+    report['bytes'] = size
+    if retrain and new_rows.changed:
+        job, created = get_service('training').submit_new_rows(new_rows, user_id=current_user.id)
+        report['retrain_job'] = job['id']
+    elif new_rows.changed:
+        get_service('training').fold_new_rows(new_rows, user_id=current_user.id)
+    
+    return jsonify(report), 200 if not report['chunks_failed'] else 207
+
 @data_bp.route('/export')
 @login_required
 def export():
@@ -167,9 +258,18 @@ def delete_all():
         flash('No tienes permisos para acceder a esta funcionalidad.')
         return redirect(url_for('dashboard.index'))
     
+    training = get_service('training')
+    if training.is_running():
+        # El reentrenamiento en curso publicaría estadísticos de registros ya eliminados
+        flash('Hay un reentrenamiento en curso; espere a que termine para eliminar los registros.')
+        return redirect(url_for('data.manage'))
+    
     try:
         EnergyData.query.delete()
         db.session.commit()
+        training_snapshot.clear()
+        fingerprint_filter.clear()
+        training.reset_statistics(user_id=current_user.id)
         flash('Todos los registros de datos energéticos han sido eliminados.')
     except Exception as e:
         flash(f'Error al eliminar los registros: {str(e)}')
@@ -182,29 +282,85 @@ def allowed_file(filename):
 @data_bp.route('/retrain', methods=['POST'])
 @login_required
 def retrain():
-    """Reentrenar el modelo con todos los datos disponibles"""
+    """Encolar el reentrenamiento del modelo con todos los datos disponibles"""
+    wants_json = request.accept_mimetypes.best == 'application/json' or request.is_json
+    
     if current_user.role != 'admin':
+        if wants_json:
+            return jsonify({'error': 'No tienes permisos para reentrenar el modelo.'}), 403
         flash('No tienes permisos para reentrenar el modelo.')
         return redirect(url_for('data.manage'))
     
-    try:
-        # Obtener todos los datos de energía
-        all_data = EnergyData.export_to_df()
-        
-        if len(all_data) < 10:
-            flash('No hay suficientes datos para reentrenar el modelo (mínimo 10 registros).')
-            return redirect(url_for('data.manage'))
-        
-        # Preprocesar los datos
-        X, y = preprocess_data(all_data, training=True)
-        
-        # Crear y entrenar el modelo
-        model = Energy_Model()
-        metrics = model.train(X, y)
-        
-        flash(f'Modelo reentrenado exitosamente. R² = {metrics["r2"]:.4f}, RMSE = {metrics["rmse"]:.2f}')
-        
-    except Exception as e:
-        flash(f'Error al reentrenar el modelo: {str(e)}')
+    if EnergyData.query.count() < 10:
+        if wants_json:
+            return jsonify({'error': 'No hay suficientes datos para reentrenar el modelo (mínimo 10 registros).'}), 400
+        flash('No hay suficientes datos para reentrenar el modelo (mínimo 10 registros).')
+        return redirect(url_for('data.manage'))
+    
+    select = None
+    if 'select_model' in request.form:
+        select = request.form['select_model'] == 'yes'
+    elif request.is_json and 'select_model' in (request.get_json(silent=True) or {}):
+        select = bool(request.get_json()['select_model'])
+    
+    job, created = get_service('training').submit('full', user_id=current_user.id, select=select)
+    
+    if wants_json:
+        return jsonify({
+            'job': job,
+            'status_url': url_for('data.retrain_status', job_id=job['id'])
+        }), 202 if created else 409
+    
+    if created:
+        flash(f'Reentrenamiento iniciado en segundo plano (trabajo {job["id"]}).')
+    else:
+        flash(f'Ya hay un reentrenamiento en curso (trabajo {job["id"]}).')
+    
+    return redirect(url_for('data.manage'))
+
+@data_bp.route('/retrain/status/<job_id>')
+@login_required
+def retrain_status(job_id):
+    """Estado, progreso y métricas de un trabajo de reentrenamiento"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    training = get_service('training')
+    job = training.get_latest_job() if job_id == 'latest' else training.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    
+    return jsonify(job)
+
+@data_bp.route('/ingestion')
+@login_required
+def ingestion():
+    """Página de seguimiento de los trabajos de ingesta"""
+    if current_user.role != 'admin':
+        flash('No tienes permisos para acceder a esta funcionalidad.')
+        return redirect(url_for('dashboard.index'))
+    
+    jobs = IngestionJob.query.order_by(IngestionJob.id.desc()).limit(INGESTION_JOBS_SHOWN).all()
+    return render_template('data/ingestion.html', jobs=[job.to_dict() for job in jobs])
+
+@data_bp.route('/ingestion/jobs')
+@login_required
+def ingestion_jobs():
+    """Estado de los trabajos de ingesta más recientes (JSON)"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
+    
+    jobs = IngestionJob.query.order_by(IngestionJob.id.desc()).limit(INGESTION_JOBS_SHOWN).all()
+    return jsonify([job.to_dict() for job in jobs])
+
+@data_bp.route('/ingestion/jobs/<int:job_id>')
+@login_required
+def ingestion_job(job_id):
+    """Progreso, filas rechazadas y velocidad de un trabajo de ingesta"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'No autorizado'}), 403
     
-    return redirect(url_for('data.manage'))
\ No newline at end of file
+    job = db.session.get(IngestionJob, job_id)
+    if job is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(job.to_dict())
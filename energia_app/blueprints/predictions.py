@@ -2,11 +2,15 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from flask_login import login_required, current_user
 from datetime import datetime
-import pandas as pd
+from time import perf_counter
+from sqlalchemy import insert
 from energia_app.forms import PredictionForm
 from energia_app.models.user import Building, Prediction, db
 from energia_app.models.model import Energy_Model
-from energia_app.models.preprocess import preprocess_data
+from energia_app.models.lookup import prediction_table
+from energia_app.models.building_models import building_models, scorer_for_building, predict_for_buildings
+from energia_app.models.cache import prediction_cache
+from energia_app.utils.timing import stage, record_stage
 
 predictions_bp = Blueprint('predictions', __name__, url_prefix='/predict')
 
@@ -24,56 +28,63 @@ def predict():
             dia_semana = form.dia_semana.data - 1
             hora_dia = form.hora_dia.data - 1
             
-            selected_buildings = Building.query.filter(Building.id.in_(selected_building_ids)).all()
-            model = Energy_Model()
+            with stage('building_query'):
+                selected_buildings = Building.query.filter(Building.id.in_(selected_building_ids)).all()
+            with stage('model_load'):
+                model = Energy_Model()
             
             if not model.trained:
                 flash('El modelo no está entrenado. Contacta al administrador.')
                 return redirect(url_for('predictions.predict'))
             
+            # Puntuar todos los edificios como una sola matriz
+            with stage('predict'):
+                prediction_values = score_buildings(model, selected_buildings, ocupacion, dia_semana, hora_dia)
+            
+            now = datetime.now()
             predictions = []
-            total_consumption = 0
+            prediction_rows = []
             
-            for building in selected_buildings:
-                input_data = pd.DataFrame({
-                    'area_edificio': [building.area],
-                    'ocupacion': [ocupacion],
-                    'dia_semana': [dia_semana],
-                    'hora_dia': [hora_dia]
+            recommendations_ms = 0.0
+            for building, prediction_value in zip(selected_buildings, prediction_values):
+                prediction_rows.append({
+                    'building_id': building.id,
+                    'timestamp': now,
+                    'ocupacion': ocupacion,
+                    'dia_semana': dia_semana,
+                    'hora_dia': hora_dia,
+                    'consumo_predicho': prediction_value
                 })
                 
-                X, _ = preprocess_data(input_data, training=False)
-                prediction_value = round(float(model.predict(X)[0]), 2)
-                
-                new_prediction = Prediction(
-                    building_id=building.id,
-                    timestamp=datetime.now(),
-                    ocupacion=ocupacion,
-                    dia_semana=dia_semana,
-                    hora_dia=hora_dia,
-                    consumo_predicho=prediction_value
-                )
-                db.session.add(new_prediction)
+                started_at = perf_counter()
+                recommendations = generate_recommendations(building.area, ocupacion, dia_semana, hora_dia, prediction_value)
+                recommendations_ms += (perf_counter() - started_at) * 1000
                 
                 predictions.append({
                     'building_id': building.id,
                     'building_name': building.name,
                     'area': building.area,
                     'consumption': prediction_value,
-                    'recommendations': generate_recommendations(building.area, ocupacion, dia_semana, hora_dia, prediction_value)
+                    'recommendations': recommendations
                 })
-                
-                total_consumption += prediction_value
+            record_stage('recommendations', recommendations_ms)
             
-            db.session.commit()
-            return render_template('predictions/predict.html', 
-                                 form=form,
-                                 buildings=active_buildings,
-                                 predictions=predictions,
-                                 total_consumption=round(total_consumption, 2),
-                                 ocupacion=ocupacion,
-                                 dia_semana=dia_semana,
-                                 hora_dia=hora_dia)
+            total_consumption = sum(p['consumption'] for p in predictions)
+            
+            # Inserción masiva de las predicciones en un único executemany
+            with stage('db_commit'):
+                if prediction_rows:
+                    db.session.execute(insert(Prediction), prediction_rows)
+                db.session.commit()
+            with stage('render'):
+                return render_template('predictions/predict.html', 
+                                     form=form,
+                                     buildings=active_buildings,
+                                     predictions=predictions,
+                                     total_consumption=round(total_consumption, 2),
+                                     ocupacion=ocupacion,
+                                     dia_semana=dia_semana,
+                                     hora_dia=hora_dia)
         
         except Exception as e:
             flash(f'Error al procesar predicción: {str(e)}')
@@ -82,6 +93,62 @@ def predict():
     # Return para GET requests
     return render_template('predictions/predict.html', form=form, buildings=active_buildings)
 
+def score_buildings(model, buildings, ocupacion, dia_semana, hora_dia):
+    """
+    Predice el consumo de varios edificios en una sola llamada vectorizada
+    
+    Args:
+        model (Energy_Model): Modelo entrenado
+        buildings (list): Edificios a evaluar
+        ocupacion (int): Nivel de ocupación
+        dia_semana (int): Día de la semana (0-6)
+        hora_dia (int): Hora del día (0-23)
+        
+    Returns:
+        list: Consumo predicho (kWh, redondeado a 2 decimales) por edificio
+    """
+    if not buildings:
+        return []
+    
+    try:
+        scorer = model.compile_scorer()
+    except ValueError:
+        scorer = None
+    
+    # Primero la caché de predicciones (clave: entrada + versión del modelo)
+    version = model.version
+    values = [None] * len(buildings)
+    scorers = [scorer] * len(buildings)
+    keys = []
+    for i, building in enumerate(buildings):
+        scorers[i] = scorer_for_building(building.id, scorer)
+        building_version = building_models.version(building.id) if scorers[i] is not scorer else None
+        key = (version, building_version, building.id, building.area, ocupacion, dia_semana, hora_dia)
+        keys.append(key)
+        values[i] = prediction_cache.get(key)
+    cached = [value is not None for value in values]
+    
+    # Después la tabla precalculada; solo se evalúan los edificios sin porción
+    if scorer is not None:
+        for i, building in enumerate(buildings):
+            if values[i] is None:
+                values[i] = prediction_table.lookup(scorers[i], building.id, building.area,
+                                                    ocupacion, dia_semana, hora_dia)
+    
+    missing = [i for i, value in enumerate(values) if value is None]
+    if missing:
+        building_ids = [buildings[i].id for i in missing]
+        areas = [buildings[i].area for i in missing]
+        predicted = predict_for_buildings(model, building_ids, areas, ocupacion, dia_semana, hora_dia)
+        for i, value in zip(missing, predicted.tolist()):
+            values[i] = value
+    
+    values = [round(value, 2) for value in values]
+    for key, value, hit in zip(keys, values, cached):
+        if not hit:
+            prediction_cache.put(key, value)
+    return values
+
 def generate_recommendations(area, ocupacion, dia_semana, hora_dia, prediction=None):
     """Función auxiliar para generar recomendaciones"""
     recommendations = []
@@ -2,6 +2,8 @@ from .model import Energy_Model
 from .preprocess import preprocess_data  # Solo importar lo que sabemos que existe
 from .user import User, Building, Prediction
 from .energy_data import EnergyData
+from .ingestion import IngestionJob
+from .training import TrainingJob
 from .support import SupportTicket, TicketMessage, TicketAttachment, ChatMessage
 from .security import SecurityLog, EncryptedUserData
 
@@ -0,0 +1,273 @@
+"""
+Modelos por edificio con respaldo en el modelo global
+
+Los datos de EnergyData se particionan por ``building_id`` y cada partición
+con suficientes registros se ajusta en un proceso distinto (joblib), de modo
+que el tiempo de reentrenamiento crece con ``n_edificios / n_núcleos``. Cada
+edificio se guarda como un paquete versionado propio en ``models/buildings``.
+
+Al predecir, los paquetes se cargan bajo demanda y solo se mantienen en
+memoria los evaluadores compilados de los edificios usados recientemente
+(LRU). Los edificios sin modelo propio usan el modelo global.
+"""
+
+import os
+import glob
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import mean_squared_error, r2_score
+from energia_app.models.registry import BUILDING_MODEL_DIR, _file_signature
+from energia_app.models.bundle import ModelBundle, save_bundle, load_bundle
+from energia_app.models.statistics import SufficientStatistics
+from energia_app.models.cache import prediction_cache
+
+logger = logging.getLogger(__name__)
+
+# Registros mínimos para ajustar un modelo propio
+MIN_BUILDING_SAMPLES = 30
+
+
+def building_bundle_path(building_id):
+    """Ruta del paquete de modelo de un edificio"""
+    return os.path.join(BUILDING_MODEL_DIR, f'building_{int(building_id)}.bundle.npy')
+
+
+def building_models_enabled():
+    """Indica si el modo de modelos por edificio está activado en la aplicación"""
+    from flask import current_app
+
+    try:
+        return bool(current_app.config.get('BUILDING_MODELS_ENABLED', False))
+    except RuntimeError:
+        # Fuera del contexto de aplicación
+        return False
+
+
+def _fit_building(building_id, features, target, test_size, random_state):
+    """
+    Ajusta escalador y regresión lineal de un edificio (se ejecuta en un proceso aparte)
+
+    Returns:
+        tuple: (building_id, ModelBundle, métricas)
+    """
+    scaler = StandardScaler().fit(features)
+    X = pd.DataFrame(scaler.transform(features), columns=features.columns, index=features.index)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, target, test_size=test_size, random_state=random_state
+    )
+    estimator = LinearRegression().fit(X_train, y_train)
+
+    y_pred = np.maximum(estimator.predict(X_test), 0.1)
+    mse = mean_squared_error(y_test, y_pred)
+    metrics = {'mse': float(mse), 'rmse': float(np.sqrt(mse)), 'r2': float(r2_score(y_test, y_pred)),
+               'n_samples': int(len(target))}
+
+    statistics = SufficientStatistics.from_arrays(features.to_numpy(), target.to_numpy())
+    bundle = ModelBundle(estimator, scaler, {
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+        'building_id': int(building_id),
+        'n_samples': int(len(target)),
+        'test_size': test_size,
+        'r2': metrics['r2'],
+        'rmse': metrics['rmse']
+    }, statistics)
+    return int(building_id), bundle, metrics
+
+
+def train_building_models(data, building_ids=None, min_samples=MIN_BUILDING_SAMPLES,
+                          n_jobs=-1, test_size=0.2, random_state=42):
+    """
+    Entrena en paralelo un modelo por edificio
+
+    Args:
+        data (DataFrame): Registros crudos con 'building_id' y 'consumo_energetico'
+        building_ids (iterable, optional): Limitar el reentrenamiento a estos
+            edificios (p.ej. los afectados por una carga); por defecto todos
+        min_samples (int): Registros mínimos para ajustar un modelo propio
+        n_jobs (int): Procesos de joblib (-1 para todos los núcleos)
+        test_size (float): Proporción de datos para prueba
+        random_state (int): Semilla para reproducibilidad
+
+    Returns:
+        dict: 'trained' (métricas por edificio) y 'skipped' (edificios que
+              usarán el modelo global por falta de datos)
+    """
+    from energia_app.models.preprocess import apply_feature_engineering, has_materialized_features, FEATURE_COLUMNS
+
+    data = data[data['building_id'].notna()]
+    if building_ids is not None:
+        data = data[data['building_id'].isin(list(building_ids))]
+
+    # Ingeniería de características una sola vez, antes de particionar
+    # (o ninguna si ya vienen materializadas desde la base de datos)
+    if has_materialized_features(data):
+        features = data[FEATURE_COLUMNS]
+    else:
+        features = apply_feature_engineering(
+            data[['area_edificio', 'ocupacion', 'dia_semana', 'hora_dia']].copy()
+        )[FEATURE_COLUMNS]
+    target = data['consumo_energetico'].astype(float)
+    groups = data['building_id'].astype(int)
+
+    partitions = []
+    skipped = []
+    for building_id, index in groups.groupby(groups).groups.items():
+        if len(index) < min_samples:
+            skipped.append(int(building_id))
+        else:
+            partitions.append((building_id, index))
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_building)(building_id, features.loc[index], target.loc[index], test_size, random_state)
+        for building_id, index in partitions
+    ) if partitions else []
+
+    trained = {}
+    for building_id, bundle, metrics in results:
+        if save_bundle(bundle, building_bundle_path(building_id)):
+            trained[building_id] = metrics
+
+    # Los edificios que se quedan sin datos suficientes vuelven al modelo global
+    stale = set(skipped)
+    if building_ids is None:
+        stale.update(set(list_building_models()) - set(trained))
+    for building_id in stale:
+        path = building_bundle_path(building_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    building_models.clear()
+    prediction_cache.invalidate()
+    logger.info(f"Modelos por edificio entrenados: {len(trained)} (sin datos suficientes: {len(skipped)})")
+    return {'trained': trained, 'skipped': skipped}
+
+
+def list_building_models():
+    """Devuelve los IDs de edificio con modelo propio en disco"""
+    ids = []
+    for path in glob.glob(os.path.join(BUILDING_MODEL_DIR, 'building_*.bundle.npy')):
+        name = os.path.basename(path)[len('building_'):-len('.bundle.npy')]
+        if name.isdigit():
+            ids.append(int(name))
+    return sorted(ids)
+
+
+class BuildingModelCache:
+    """
+    Evaluadores compilados de los modelos por edificio, con carga perezosa.
+
+    Solo se mantienen en memoria los ``max_size`` edificios usados más
+    recientemente; cada acceso comprueba con un ``os.stat`` que el paquete no
+    haya cambiado en disco.
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_scorer(self, building_id):
+        """
+        Devuelve el evaluador compilado del edificio
+
+        Args:
+            building_id (int): ID del edificio
+
+        Returns:
+            LinearScorer: Evaluador o None si el edificio no tiene modelo propio
+        """
+        from energia_app.models.scorer import LinearScorer
+
+        path = building_bundle_path(building_id)
+        signature = _file_signature(path)
+        with self._lock:
+            entry = self._entries.get(building_id)
+            if signature is None:
+                self._entries.pop(building_id, None)
+                return None
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(building_id)
+                return entry[1]
+
+        bundle = load_bundle(path)
+        if bundle is None:
+            return None
+        scorer = LinearScorer.from_estimator(bundle.estimator, bundle.scaler)
+
+        with self._lock:
+            self._entries[building_id] = (signature, scorer)
+            self._entries.move_to_end(building_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return scorer
+
+    def version(self, building_id):
+        """Huella del paquete cargado para el edificio (None si no está en memoria)"""
+        entry = self._entries.get(building_id)
+        return entry[0] if entry is not None else None
+
+    def clear(self):
+        """Descarta todos los evaluadores cargados"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Instancia única por proceso
+building_models = BuildingModelCache()
+
+
+def scorer_for_building(building_id, default=None):
+    """
+    Evaluador a usar para un edificio: el propio si el modo por edificio está
+    activado y existe, o ``default`` (el del modelo global)
+    """
+    if building_id is None or not building_models_enabled():
+        return default
+    return building_models.get_scorer(building_id) or default
+
+
+def predict_for_buildings(model, building_ids, area_edificio, ocupacion, dia_semana, hora_dia):
+    """
+    Predice filas de varios edificios agrupando por modelo
+
+    Las filas de edificios con modelo propio se evalúan con una llamada
+    vectorizada por edificio; el resto con una única llamada al modelo global.
+
+    Args:
+        model (Energy_Model): Modelo global (respaldo)
+        building_ids (array): ID de edificio por fila (None si no aplica)
+        area_edificio, ocupacion, dia_semana, hora_dia (array): Entradas crudas
+
+    Returns:
+        ndarray: Consumo predicho por fila
+    """
+    area, occupancy, day, hour = (np.ravel(values) for values in
+                                  np.broadcast_arrays(area_edificio, ocupacion, dia_semana, hora_dia))
+    values = np.empty(len(area), dtype=np.float64)
+    pending = np.ones(len(area), dtype=bool)
+
+    if building_models_enabled():
+        ids = np.asarray([-1 if bid is None else bid for bid in building_ids], dtype=np.int64)
+        for building_id in np.unique(ids[ids >= 0]):
+            scorer = building_models.get_scorer(int(building_id))
+            if scorer is None:
+                continue
+            rows = ids == building_id
+            values[rows] = scorer(area[rows], occupancy[rows], day[rows], hour[rows])
+            pending &= ~rows
+
+    if pending.any():
+        values[pending] = model.predict_raw(area[pending], occupancy[pending], day[pending], hour[pending])
+    return values
@@ -0,0 +1,209 @@
+"""
+Paquete versionado de artefactos del modelo
+
+Un único archivo ``.npy`` con un registro estructurado que contiene los
+coeficientes, el intercepto, las estadísticas del escalador, el orden de
+las características y los metadatos de entrenamiento. Se carga con
+``mmap_mode='r'`` y ``allow_pickle=False`` (sin deserializar objetos) y se
+escribe de forma atómica: archivo temporal en el mismo directorio + rename.
+"""
+
+import json
+import os
+import tempfile
+import logging
+from datetime import datetime
+import numpy as np
+import sklearn
+from sklearn import linear_model
+from sklearn.preprocessing import StandardScaler
+from energia_app.models.statistics import SufficientStatistics
+
+logger = logging.getLogger(__name__)
+
+# Versión del formato del paquete
+# 2: añade estadísticos suficientes opcionales para actualizaciones incrementales
+BUNDLE_FORMAT_VERSION = 2
+
+
+def atomic_write(path, write):
+    """
+    Escribe un archivo de forma atómica
+
+    El contenido se escribe en un temporal del mismo directorio, se sincroniza
+    a disco y se renombra sobre ``path``; los lectores nunca ven un archivo
+    a medio escribir.
+
+    Args:
+        path (str): Ruta final del archivo
+        write (callable): Función que recibe el objeto archivo abierto en binario
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.splitext(path)[1])
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp crea el archivo con permisos 0600
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ModelBundle:
+    """
+    Estimador lineal y escalador emparejados, con sus metadatos.
+
+    Attributes:
+        estimator: Estimador lineal de sklearn (coef_, intercept_)
+        scaler (StandardScaler): Escalador ajustado sobre las mismas características
+        feature_names (list): Orden de las características
+        metadata (dict): Metadatos de entrenamiento
+        statistics (SufficientStatistics): Estadísticos de los datos de
+            entrenamiento (None si el modelo no admite actualización incremental)
+    """
+
+    def __init__(self, estimator, scaler, metadata=None, statistics=None):
+        self.estimator = estimator
+        self.scaler = scaler
+        self.statistics = statistics
+        self.feature_names = [str(name) for name in scaler.feature_names_in_]
+        self.metadata = dict(metadata or {})
+        self.metadata.setdefault('estimator', type(estimator).__name__)
+        self.metadata.setdefault('params', {
+            key: value for key, value in estimator.get_params().items()
+            if isinstance(value, (bool, int, float, str)) or value is None
+        })
+        self.metadata.setdefault('sklearn_version', sklearn.__version__)
+        self.metadata.setdefault('created_at', datetime.now().isoformat(timespec='seconds'))
+
+    def to_record(self):
+        """Serializa el paquete como un registro estructurado de NumPy"""
+        n_features = len(self.feature_names)
+        metadata_json = json.dumps(self.metadata, default=float).encode('utf-8')
+        name_len = max(len(name) for name in self.feature_names)
+
+        fields = [
+            ('format_version', '<i4'),
+            ('coef', '<f8', (n_features,)),
+            ('intercept', '<f8'),
+            ('scaler_mean', '<f8', (n_features,)),
+            ('scaler_scale', '<f8', (n_features,)),
+            ('scaler_var', '<f8', (n_features,)),
+            ('n_samples_seen', '<i8'),
+            ('feature_names', f'<U{name_len}', (n_features,)),
+            ('metadata', f'S{len(metadata_json)}'),
+        ]
+        if self.statistics is not None:
+            fields += [
+                ('stats_count', '<i8'),
+                ('stats_mean', '<f8', (n_features + 1,)),
+                ('stats_comoment', '<f8', (n_features + 1, n_features + 1)),
+            ]
+
+        record = np.zeros((), dtype=np.dtype(fields))
+        record['format_version'] = BUNDLE_FORMAT_VERSION
+        record['coef'] = np.ravel(self.estimator.coef_)
+        record['intercept'] = float(np.ravel(self.estimator.intercept_)[0])
+        record['scaler_mean'] = self.scaler.mean_
+        record['scaler_scale'] = self.scaler.scale_
+        record['scaler_var'] = self.scaler.var_
+        record['n_samples_seen'] = int(np.max(self.scaler.n_samples_seen_))
+        record['feature_names'] = self.feature_names
+        record['metadata'] = metadata_json
+        if self.statistics is not None:
+            record['stats_count'] = self.statistics.count
+            record['stats_mean'] = self.statistics.mean
+            record['stats_comoment'] = self.statistics.comoment
+        return record
+
+    @classmethod
+    def from_record(cls, record):
+        """
+        Reconstruye el estimador y el escalador desde un registro estructurado
+
+        Args:
+            record (ndarray): Registro leído con ``load_bundle``
+
+        Returns:
+            ModelBundle: Paquete reconstruido
+        """
+        version = int(record['format_version'])
+        if version > BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Versión de paquete no soportada: {version}")
+
+        metadata = json.loads(bytes(record['metadata']).decode('utf-8'))
+        feature_names = np.asarray([str(name) for name in record['feature_names']], dtype=object)
+        n_features = len(feature_names)
+
+        estimator_cls = getattr(linear_model, metadata.get('estimator', 'LinearRegression'))
+        estimator = estimator_cls(**metadata.get('params', {}))
+        estimator.coef_ = np.array(record['coef'], dtype=np.float64)
+        estimator.intercept_ = float(record['intercept'])
+        estimator.n_features_in_ = n_features
+        estimator.feature_names_in_ = feature_names
+
+        scaler = StandardScaler()
+        scaler.mean_ = np.array(record['scaler_mean'], dtype=np.float64)
+        scaler.scale_ = np.array(record['scaler_scale'], dtype=np.float64)
+        scaler.var_ = np.array(record['scaler_var'], dtype=np.float64)
+        scaler.n_samples_seen_ = int(record['n_samples_seen'])
+        scaler.n_features_in_ = n_features
+        scaler.feature_names_in_ = feature_names
+
+        statistics = None
+        if 'stats_count' in record.dtype.names:
+            statistics = SufficientStatistics(n_features, int(record['stats_count']),
+                                              record['stats_mean'], record['stats_comoment'])
+
+        return cls(estimator, scaler, metadata, statistics)
+
+
+def save_bundle(bundle, bundle_path):
+    """
+    Guarda un paquete de modelo de forma atómica
+
+    Args:
+        bundle (ModelBundle): Paquete a guardar
+        bundle_path (str): Ruta del archivo ``.npy``
+
+    Returns:
+        bool: True si se guardó correctamente, False en caso contrario
+    """
+    try:
+        record = bundle.to_record()
+        atomic_write(bundle_path, lambda f: np.save(f, record, allow_pickle=False))
+        logger.info(f"Paquete de modelo guardado en {bundle_path}")
+        return True
+    except Exception as e:
+        logger.error(f"Error al guardar el paquete de modelo: {str(e)}")
+        return False
+
+
+def load_bundle(bundle_path):
+    """
+    Carga un paquete de modelo mediante mmap, sin deserializar objetos
+
+    Args:
+        bundle_path (str): Ruta del archivo ``.npy``
+
+    Returns:
+        ModelBundle: Paquete cargado o None si no existe o es inválido
+    """
+    try:
+        if not os.path.exists(bundle_path):
+            logger.warning(f"Paquete de modelo no encontrado en '{bundle_path}'")
+            return None
+
+        record = np.load(bundle_path, mmap_mode='r', allow_pickle=False)
+        bundle = ModelBundle.from_record(record)
+        logger.info(f"Paquete de modelo cargado desde {bundle_path}")
+        return bundle
+    except Exception as e:
+        logger.error(f"Error al cargar el paquete de modelo: {str(e)}")
+        return None
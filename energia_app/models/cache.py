@@ -0,0 +1,122 @@
+"""
+Caché LRU con caducidad para predicciones repetidas
+
+Las claves incluyen la versión del modelo (hash del artefacto cargado), de
+modo que una predicción nunca se sirve con un modelo distinto del que la
+calculó; además la caché se vacía al guardar un modelo nuevo en el proceso.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Caché acotada (LRU) con tiempo de vida por entrada, segura entre hilos.
+
+    Attributes:
+        hits (int): Consultas servidas desde la caché
+        misses (int): Consultas sin entrada válida
+        evictions (int): Entradas expulsadas por tamaño
+        expirations (int): Entradas descartadas por caducidad
+    """
+
+    def __init__(self, maxsize=4096, ttl=3600):
+        """
+        Args:
+            maxsize (int): Número máximo de entradas (0 desactiva la caché)
+            ttl (float): Segundos de vida de cada entrada (None sin caducidad)
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def configure(self, maxsize=None, ttl=None):
+        """Ajusta tamaño y caducidad, descartando el contenido actual"""
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl if ttl > 0 else None
+            self._entries.clear()
+
+    def get(self, key):
+        """
+        Devuelve el valor guardado para ``key`` o None si no hay entrada válida
+
+        Args:
+            key (tuple): Clave de la predicción
+
+        Returns:
+            object: Valor cacheado o None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Guarda un valor, expulsando las entradas menos usadas si hace falta
+
+        Args:
+            key (tuple): Clave de la predicción
+            value (object): Valor a guardar
+        """
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        """Vacía la caché (p.ej. al publicar un modelo nuevo)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Contadores de uso de la caché
+
+        Returns:
+            dict: size, maxsize, ttl, hits, misses, evictions, expirations y hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Instancia única por proceso
+prediction_cache = PredictionCache()
@@ -1,8 +1,68 @@
+import logging
 from datetime import datetime
+import numpy as np
 import pandas as pd
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index, func
+from flask import current_app
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index, func, select, insert, update, bindparam, inspect, text, or_
 from sqlalchemy.orm import relationship
 from energia_app.models.user import db, Building
+from energia_app.models.snapshot import training_snapshot
+from energia_app.models.fingerprint import FINGERPRINT_LENGTH, row_fingerprints, fingerprint_filter
+from energia_app.models.preprocess import (
+    DERIVED_FEATURE_COLUMNS, FEATURE_VERSION, compute_derived_features, refresh_stale_features
+)
+
+logger = logging.getLogger(__name__)
+
+# Filas por bloque al importar (executemany + commit por bloque)
+DEFAULT_IMPORT_CHUNK_SIZE = 5000
+
+# Diferencia relativa máxima entre area_edificio y el área de un edificio
+BUILDING_AREA_TOLERANCE = 0.05
+
+
+def match_building_areas(areas, building_areas, building_ids, tolerance=BUILDING_AREA_TOLERANCE):
+    """
+    Asigna a cada área el edificio de área más cercana dentro de la tolerancia
+    
+    Las áreas de los edificios se ordenan una vez y toda la columna se
+    resuelve con ``numpy.searchsorted`` (O(filas · log edificios)). El
+    resultado es determinista: a igual distancia gana el edificio de menor
+    área y, entre áreas repetidas, el de menor ID.
+    
+    Args:
+        areas (ndarray): area_edificio de cada fila
+        building_areas (list): Área de cada edificio
+        building_ids (list): ID de cada edificio (mismo orden)
+        tolerance (float): Diferencia relativa máxima respecto a area_edificio
+    
+    Returns:
+        ndarray: ID del edificio asignado por fila (-1 si ninguno)
+    """
+    areas = np.asarray(areas, dtype=np.float64)
+    assigned = np.full(len(areas), -1, dtype=np.int64)
+    if not len(building_areas) or not len(areas):
+        return assigned
+    
+    # Ordenar por (área, ID) y quedarse con el menor ID de cada área
+    catalog = np.asarray(building_areas, dtype=np.float64)
+    ids = np.asarray(building_ids, dtype=np.int64)
+    order = np.lexsort((ids, catalog))
+    catalog, ids = catalog[order], ids[order]
+    catalog, first = np.unique(catalog, return_index=True)
+    ids = ids[first]
+    
+    # Vecinos a izquierda y derecha de cada fila en el catálogo ordenado
+    right = np.clip(np.searchsorted(catalog, areas), 0, len(catalog) - 1)
+    left = np.clip(right - 1, 0, len(catalog) - 1)
+    with np.errstate(invalid='ignore'):
+        nearest = np.where(np.abs(catalog[right] - areas) < np.abs(areas - catalog[left]), right, left)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        within = (areas > 0) & (np.abs(catalog[nearest] - areas) / areas <= tolerance)
+    assigned[within] = ids[nearest[within]]
+    return assigned
+
 
 class EnergyData(db.Model):
     """
@@ -30,16 +90,217 @@ class EnergyData(db.Model):
     # Variable objetivo
     consumo_energetico = Column(Float, nullable=False)
     
+    # Características derivadas, calculadas al insertar (ver preprocess.FEATURE_VERSION)
+    dia_semana_sin = Column(Float, nullable=True)
+    dia_semana_cos = Column(Float, nullable=True)
+    hora_dia_sin = Column(Float, nullable=True)
+    hora_dia_cos = Column(Float, nullable=True)
+    es_dia_laboral = Column(Float, nullable=True)
+    es_hora_laboral = Column(Float, nullable=True)
+    ocupacion_por_area = Column(Float, nullable=True)
+    base_consumo_hora = Column(Float, nullable=True)
+    ocupacion_hora = Column(Float, nullable=True)
+    feature_version = Column(Integer, nullable=True)
+    
+    # Huella de contenido de las filas importadas (ver fingerprint.py); nula en
+    # registros manuales y en duplicados anteriores a la columna
+    fingerprint = Column(String(FINGERPRINT_LENGTH), nullable=True)
+    
     # Índices para mejorar rendimiento de consultas
     __table_args__ = (
         Index('idx_energy_fecha', 'timestamp'),
         Index('idx_energy_building', 'building_id'),
         Index('idx_energy_dia_hora', 'dia_semana', 'hora_dia'),
+        Index('idx_energy_fingerprint', 'fingerprint', unique=True),
     )
     
     def __repr__(self):
         return f'<EnergyData {self.id}: {self.consumo_energetico} kWh @ {self.timestamp}>'
     
+    def materialize_features(self):
+        """Calcula y asigna las características derivadas del registro"""
+        raw = pd.DataFrame([{
+            'area_edificio': self.area_edificio,
+            'ocupacion': self.ocupacion,
+            'dia_semana': self.dia_semana,
+            'hora_dia': self.hora_dia
+        }])
+        for name, value in compute_derived_features(raw).iloc[0].items():
+            setattr(self, name, float(value))
+        self.feature_version = FEATURE_VERSION
+    
+    @classmethod
+    def ensure_feature_columns(cls):
+        """
+        Añade a la tabla existente las columnas de características que falten
+        
+        Returns:
+            list: Nombres de las columnas añadidas
+        """
+        existing = {column['name'] for column in inspect(db.session.connection()).get_columns(cls.__tablename__)}
+        added = []
+        for name in DERIVED_FEATURE_COLUMNS + ['feature_version']:
+            if name in existing:
+                continue
+            column_type = cls.__table__.c[name].type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {cls.__tablename__} ADD COLUMN {name} {column_type}'))
+            added.append(name)
+        if added:
+            db.session.commit()
+            logger.info(f"Columnas de características añadidas a {cls.__tablename__}: {', '.join(added)}")
+        return added
+    
+    @classmethod
+    def has_materialized_features(cls):
+        """
+        Indica si la tabla tiene las columnas de características y todas al día
+        
+        Returns:
+            bool: False si faltan columnas o hay registros por recalcular
+                  (``flask backfill-features``)
+        """
+        existing = {column['name'] for column in inspect(db.session.connection()).get_columns(cls.__tablename__)}
+        if any(name not in existing for name in DERIVED_FEATURE_COLUMNS + ['feature_version']):
+            return False
+        return db.session.query(cls.id).filter(cls._stale_features_filter()).first() is None
+    
+    @classmethod
+    def _stale_features_filter(cls):
+        return or_(cls.feature_version.is_(None), cls.feature_version != FEATURE_VERSION)
+    
+    @classmethod
+    def count_stale_features(cls):
+        """Obtiene el número de registros sin características o de otra versión"""
+        return cls.query.filter(cls._stale_features_filter()).count()
+    
+    @classmethod
+    def backfill_features(cls, chunk_size=5000, progress=None):
+        """
+        Recalcula por bloques las características de los registros desactualizados
+        
+        Cada bloque se calcula de forma vectorizada y se guarda con un único
+        UPDATE ejecutado con executemany y su propio commit.
+        
+        Args:
+            chunk_size (int): Registros por bloque
+            progress (callable, optional): Función que recibe (procesados, total)
+        
+        Returns:
+            int: Número de registros actualizados
+        """
+        total = cls.count_stale_features()
+        table = cls.__table__
+        statement = update(table).where(table.c.id == bindparam('row_id')).values(
+            {name: bindparam(name) for name in DERIVED_FEATURE_COLUMNS + ['feature_version']}
+        )
+        
+        done = 0
+        last_id = 0
+        while True:
+            rows = db.session.execute(
+                select(cls.id, cls.area_edificio, cls.ocupacion, cls.dia_semana, cls.hora_dia)
+                .where(cls._stale_features_filter(), cls.id > last_id)
+                .order_by(cls.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            
+            raw = pd.DataFrame.from_records(rows, columns=['id', 'area_edificio', 'ocupacion', 'dia_semana', 'hora_dia'])
+            features = compute_derived_features(raw)
+            features['feature_version'] = FEATURE_VERSION
+            features['row_id'] = raw['id']
+            db.session.execute(statement, features.to_dict('records'))
+            db.session.commit()
+            
+            done += len(rows)
+            last_id = int(raw['id'].iloc[-1])
+            if progress:
+                progress(done, total)
+        
+        if done:
+            # La instantánea guarda las características: regenerarla al día
+            cls.rebuild_snapshot()
+            logger.info(f"Características recalculadas para {done} registros (versión {FEATURE_VERSION})")
+        return done
+    
+    @classmethod
+    def ensure_fingerprint_column(cls):
+        """
+        Añade a la tabla existente la columna de huellas, sin su índice único
+        
+        El índice se crea con ``ensure_fingerprint_index`` después de resolver
+        las huellas repetidas. Los registros anteriores a la columna no
+        conservan su archivo ni su marca de tiempo de origen y quedan sin huella.
+        
+        Returns:
+            bool: True si se ha añadido la columna
+        """
+        existing = {column['name'] for column in inspect(db.session.connection()).get_columns(cls.__tablename__)}
+        added = 'fingerprint' not in existing
+        if added:
+            column_type = cls.__table__.c.fingerprint.type.compile(dialect=db.engine.dialect)
+            db.session.execute(text(f'ALTER TABLE {cls.__tablename__} ADD COLUMN fingerprint {column_type}'))
+            db.session.commit()
+            logger.info(f"Columna fingerprint añadida a {cls.__tablename__}")
+        return added
+    
+    @classmethod
+    def has_fingerprint_index(cls):
+        """Indica si la tabla tiene el índice único de huellas"""
+        indexes = inspect(db.session.connection()).get_indexes(cls.__tablename__)
+        return any(index['name'] == 'idx_energy_fingerprint' for index in indexes)
+    
+    @classmethod
+    def ensure_fingerprint_index(cls):
+        """
+        Crea el índice único de huellas si falta
+        
+        Debe ejecutarse después de ``dedupe_fingerprints``: con huellas
+        repetidas la creación del índice falla.
+        
+        Returns:
+            bool: True si se ha creado el índice
+        """
+        if cls.has_fingerprint_index():
+            return False
+        db.session.execute(text(f'CREATE UNIQUE INDEX idx_energy_fingerprint ON {cls.__tablename__} (fingerprint)'))
+        db.session.commit()
+        logger.info(f"Índice idx_energy_fingerprint creado en {cls.__tablename__}")
+        return True
+    
+    @classmethod
+    def dedupe_fingerprints(cls):
+        """
+        Deja cada huella repetida solo en el registro más antiguo
+        
+        Los demás registros con la misma huella se conservan sin huella (el
+        índice único admite varias nulas).
+        
+        Returns:
+            int: Número de registros cuya huella se ha anulado
+        """
+        duplicated = db.session.execute(
+            select(cls.fingerprint, func.min(cls.id), func.count())
+            .where(cls.fingerprint.isnot(None))
+            .group_by(cls.fingerprint)
+            .having(func.count() > 1)
+        ).all()
+        if not duplicated:
+            return 0
+        
+        table = cls.__table__
+        statement = update(table).where(
+            table.c.fingerprint == bindparam('fp'), table.c.id != bindparam('keep_id')
+        ).values(fingerprint=None)
+        db.session.execute(statement, [{'fp': fp, 'keep_id': keep_id} for fp, keep_id, _ in duplicated])
+        db.session.commit()
+        
+        cleared = sum(count - 1 for _, _, count in duplicated)
+        fingerprint_filter.clear()
+        logger.info(f"Huellas repetidas anuladas en {cleared} registros")
+        return cleared
+    
     @classmethod
     def get_recent_records(cls, limit=10):
         """Obtiene los registros más recientes"""
@@ -88,46 +349,153 @@ class EnergyData(db.Model):
         ).group_by(cls.hora_dia).order_by(cls.hora_dia).all()
     
     @classmethod
-    def export_to_df(cls):
+    def get_avg_occupancy_profile(cls, building_id=None):
+        """
+        Obtiene la ocupación promedio por día de la semana y hora
+        
+        Args:
+            building_id (int, optional): Limitar a los registros de un edificio
+        
+        Returns:
+            numpy.ndarray: Matriz 7x24 (día, hora) con NaN donde no hay datos
+        """
+        query = db.session.query(
+            cls.dia_semana,
+            cls.hora_dia,
+            func.avg(cls.ocupacion).label('avg_occupancy')
+        )
+        if building_id is not None:
+            query = query.filter(cls.building_id == building_id)
+        
+        profile = np.full((7, 24), np.nan)
+        for dia_semana, hora_dia, avg_occupancy in query.group_by(cls.dia_semana, cls.hora_dia):
+            if 0 <= dia_semana <= 6 and 0 <= hora_dia <= 23:
+                profile[dia_semana, hora_dia] = avg_occupancy
+        return profile
+    
+    @classmethod
+    def iter_training_chunks(cls, chunk_size=50000):
+        """
+        Recorre las columnas de entrenamiento por bloques, sin crear objetos ORM
+        
+        Args:
+            chunk_size (int): Filas por bloque
+        
+        Yields:
+            pandas.DataFrame: Bloque con id y las columnas de entrenamiento, en orden de id
+        """
+        columns = ['id', 'area_edificio', 'ocupacion', 'dia_semana', 'hora_dia',
+                   'consumo_energetico', 'building_id'] + DERIVED_FEATURE_COLUMNS + ['feature_version']
+        statement = select(*(getattr(cls, name) for name in columns)).order_by(cls.id)
+        result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+        for partition in result.partitions():
+            yield pd.DataFrame.from_records(partition, columns=columns)
+    
+    @classmethod
+    def rebuild_snapshot(cls):
+        """
+        Reconstruye la instantánea columnar de entrenamiento desde la base de datos
+        
+        Returns:
+            int: Número de filas escritas
+        """
+        return training_snapshot.rebuild(cls.iter_training_chunks())
+    
+    @classmethod
+    def analyze(cls):
+        """
+        Actualiza las estadísticas de la tabla y sus índices para el planificador
+        
+        Conviene ejecutarlo tras una carga masiva.
+        
+        Returns:
+            bool: False si el dialecto no lo admite
+        """
+        dialect = db.engine.dialect.name
+        if dialect in ('mysql', 'mariadb'):
+            statement = f'ANALYZE TABLE {cls.__tablename__}'
+        elif dialect in ('sqlite', 'postgresql'):
+            statement = f'ANALYZE {cls.__tablename__}'
+        else:
+            return False
+        db.session.execute(text(statement))
+        db.session.commit()
+        return True
+    
+    @classmethod
+    def export_to_df(cls, include_building=False, include_features=False):
         """
         Exporta todos los registros a un DataFrame de pandas
         
+        Lee la instantánea columnar (mapeada en memoria) si está al día; si
+        no, consulta las columnas directamente y regenera la instantánea.
+        
+        Args:
+            include_building (bool): Si es True se conserva la columna building_id
+            include_features (bool): Si es True se incluyen las características
+                derivadas materializadas (preprocess_data no las recalcula)
+        
         Returns:
             pandas.DataFrame: DataFrame con todos los registros
         """
-        # Obtener todos los registros
-        records = cls.query.all()
-        
-        # Convertir a diccionario
-        data = []
-        for record in records:
-            data.append({
-                'area_edificio': record.area_edificio,
-                'ocupacion': record.ocupacion,
-                'dia_semana': record.dia_semana,
-                'hora_dia': record.hora_dia,
-                'consumo_energetico': record.consumo_energetico,
-                'building_id': record.building_id,
-                'timestamp': record.timestamp
-            })
-        
-        # Crear DataFrame
-        df = pd.DataFrame(data)
+        columns = ['area_edificio', 'ocupacion', 'dia_semana', 'hora_dia', 'consumo_energetico']
+        if include_building:
+            columns.append('building_id')
+        if include_features:
+            columns += DERIVED_FEATURE_COLUMNS
         
-        # Seleccionar solo las columnas necesarias para el entrenamiento
-        training_df = df[['area_edificio', 'ocupacion', 'dia_semana', 'hora_dia', 'consumo_energetico']]
+        rows, last_id = db.session.query(func.count(cls.id), func.coalesce(func.max(cls.id), 0)).one()
+        if training_snapshot.is_current(rows, last_id):
+            df = training_snapshot.to_frame(include_building=include_building, include_features=include_features)
+            if df is not None:
+                return df
+        
+        # Instantánea ausente o desincronizada: una sola pasada por la base de datos
+        chunks = list(cls.iter_training_chunks())
+        try:
+            training_snapshot.rebuild(chunks)
+        except Exception as e:
+            logger.error(f"Error al regenerar la instantánea de entrenamiento: {str(e)}")
+        
+        if not chunks:
+            return pd.DataFrame(columns=columns)
         
-        return training_df
+        df = pd.concat(chunks, ignore_index=True)
+        if include_features:
+            df = refresh_stale_features(df.astype({name: np.float64 for name in DERIVED_FEATURE_COLUMNS}))
+        
+        # Seleccionar solo las columnas necesarias para el entrenamiento
+        return df[columns]
     
     @classmethod
-    def import_from_df(cls, df, convert_building_areas=True):
+    def import_from_df(cls, df, convert_building_areas=True, chunk_size=None, update_snapshot=True, on_commit=None,
+                       source_name=None):
         """
         Importa registros desde un DataFrame de pandas
         
+        Las filas se insertan por bloques con un executemany de SQLAlchemy Core
+        (sin crear objetos ORM) y se confirma un commit por bloque.
+        
         Args:
             df (pandas.DataFrame): DataFrame con los registros a importar
             convert_building_areas (bool): Si es True, busca edificios con áreas similares
                                          y asigna el building_id correspondiente
+            chunk_size (int, optional): Filas por bloque (por defecto IMPORT_CHUNK_SIZE)
+            update_snapshot (bool): Añadir las filas a la instantánea de entrenamiento.
+                                    Con False se inserta sin RETURNING directamente con
+                                    el driver (más rápido) y la instantánea queda
+                                    desincronizada hasta reconstruirla
+            on_commit (callable, optional): Se llama tras el commit de cada bloque
+                                            con un DataFrame de las filas insertadas
+                                            (columnas crudas, building_id y
+                                            características derivadas). Sin RETURNING
+                                            recibe las filas enviadas si se insertaron
+                                            todas, o None si el índice único descartó
+                                            alguna (no se sabe cuáles)
+            source_name (str, optional): Archivo de origen; con el índice del DataFrame
+                                         como número de fila identifica las filas sin
+                                         marca de tiempo (ver fingerprint.py). Sin él
+                                         esas filas se guardan sin huella
         
         Returns:
             int: Número de registros importados
@@ -139,45 +507,230 @@ class EnergyData(db.Model):
         if missing_cols:
             raise ValueError(f"Faltan columnas requeridas: {', '.join(missing_cols)}")
         
-        # Buscar edificios para asignar building_id si es necesario
-        building_map = {}
-        if convert_building_areas and 'building_id' not in df.columns:
-            buildings = Building.query.all()
-            for building in buildings:
-                building_map[building.area] = building.id
-        
-        # Crear registros
-        records = []
-        for _, row in df.iterrows():
-            # Asignar building_id si existe un edificio con área similar
-            building_id = None
-            if 'building_id' in row and pd.notna(row['building_id']):
-                building_id = row['building_id']
-            elif convert_building_areas:
-                # Buscar el edificio con área más cercana (dentro de un margen del 5%)
-                area = row['area_edificio']
-                for building_area, bid in building_map.items():
-                    if abs(building_area - area) / area <= 0.05:  # 5% de margen
-                        building_id = bid
-                        break
+        if chunk_size is None:
+            chunk_size = current_app.config.get('IMPORT_CHUNK_SIZE', DEFAULT_IMPORT_CHUNK_SIZE)
+        chunk_size = max(1, int(chunk_size))
+        
+        # Asignar building_id a todas las filas de una vez
+        building_ids = cls._assign_building_ids(df, convert_building_areas)
+        
+        # Marca de tiempo de origen, si el archivo la trae (si no, la de la importación)
+        timestamps = None
+        if 'timestamp' in df.columns:
+            timestamps = pd.to_datetime(df['timestamp'], errors='coerce')
+        
+        # Huellas de contenido (None en las filas que no se pueden identificar).
+        # Las filas repetidas dentro del lote no se descartan: sin marca de
+        # tiempo pueden ser lecturas legítimas y su huella ya las distingue
+        fingerprints = np.asarray(row_fingerprints(df, building_ids, timestamps, source_name), dtype=object)
+        has_fingerprint = np.fromiter((fp is not None for fp in fingerprints), dtype=bool, count=len(fingerprints))
+        bloom = fingerprint_filter.get(cls._iter_fingerprints, cls._count_fingerprints)
+        
+        # Con RETURNING se obtienen las filas insertadas para actualizar la instantánea sin releer
+        # la tabla (tabla de Core: la ruta ORM de inserción masiva reagrupa filas y es más lenta)
+        snapshot_columns = ['id'] + required_cols + ['building_id'] + DERIVED_FEATURE_COLUMNS
+        statement = cls._insert_ignoring_duplicates()
+        returning = update_snapshot and db.engine.dialect.insert_executemany_returning
+        if returning:
+            statement = statement.returning(cls.fingerprint, *(cls.__table__.c[name] for name in snapshot_columns))
+        driver_statement = None
+        
+        total = 0
+        skipped = 0
+        for begin in range(0, len(df), chunk_size):
+            chunk = df.iloc[begin:begin + chunk_size]
+            chunk_fingerprints = fingerprints[begin:begin + chunk_size]
+            
+            # Filtro de Bloom: solo las filas que quizá existen se consultan en la base de datos
+            keep = np.ones(len(chunk), dtype=bool)
+            maybe = has_fingerprint[begin:begin + chunk_size].copy()
+            if maybe.any():
+                maybe[maybe] = bloom.might_contain(chunk_fingerprints[maybe].tolist())
+            if maybe.any():
+                existing = cls._existing_fingerprints(chunk_fingerprints[maybe].tolist())
+                keep &= ~np.fromiter((fp in existing for fp in chunk_fingerprints), dtype=bool, count=len(chunk))
+            skipped += int(len(chunk) - keep.sum())
+            if not keep.any():
+                continue
+            
+            chunk = chunk[keep]
+            chunk_fingerprints = chunk_fingerprints[keep]
+            columns = {name: chunk[name].tolist() for name in required_cols}
+            columns['building_id'] = [bid for bid, kept in zip(building_ids[begin:begin + chunk_size], keep) if kept]
             
-            # Crear nuevo registro
-            record = cls(
-                area_edificio=row['area_edificio'],
-                ocupacion=row['ocupacion'],
-                dia_semana=row['dia_semana'],
-                hora_dia=row['hora_dia'],
-                consumo_energetico=row['consumo_energetico'],
-                building_id=building_id
-            )
+            # Características derivadas del bloque en una sola pasada
+            features = compute_derived_features(chunk)
+            columns.update({name: features[name].tolist() for name in DERIVED_FEATURE_COLUMNS})
             
-            records.append(record)
+            now = datetime.now()
+            if timestamps is not None:
+                chunk_timestamps = timestamps.iloc[begin:begin + chunk_size][keep]
+                columns['timestamp'] = [now if pd.isna(ts) else ts.to_pydatetime() for ts in chunk_timestamps]
+            else:
+                columns['timestamp'] = [now] * len(chunk)
+            columns['fingerprint'] = chunk_fingerprints.tolist()
+            
+            columns['feature_version'] = [FEATURE_VERSION] * len(chunk)
+            
+            try:
+                if returning:
+                    names = list(columns)
+                    rows = [dict(zip(names, values)) for values in zip(*columns.values())]
+                    result = db.session.execute(statement, rows).all()
+                    inserted = [row[0] for row in result]
+                else:
+                    if driver_statement is None:
+                        driver_statement = cls._driver_insert(statement, list(columns))
+                    inserted_count = driver_statement(columns)
+                    inserted = None
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                logger.error(f"Error al importar el bloque de filas {begin}-{begin + chunk_size - 1} "
+                             f"({total} registros ya confirmados)")
+                raise
+            
+            if inserted is not None:
+                # Las filas descartadas por el índice único (p.ej. insertadas por otro proceso) no vuelven
+                total += len(inserted)
+                skipped += len(chunk) - len(inserted)
+                fingerprint_filter.add([fp for fp in inserted if fp is not None])
+                
+                # Añadir las filas confirmadas a la instantánea de entrenamiento
+                snapshot_rows = pd.DataFrame([row[1:] for row in result], columns=snapshot_columns)
+                training_snapshot.append(snapshot_rows)
+                if on_commit is not None:
+                    on_commit(snapshot_rows.drop(columns=['id']))
+            else:
+                # Sin RETURNING la instantánea queda desincronizada y export_to_df la regenera
+                total += inserted_count
+                skipped += len(chunk) - inserted_count
+                fingerprint_filter.add([fp for fp in columns['fingerprint'] if fp is not None])
+                if on_commit is not None:
+                    # Las filas enviadas solo son las insertadas si el índice único no descartó ninguna
+                    on_commit(pd.DataFrame(columns).drop(columns=['timestamp', 'fingerprint', 'feature_version'])
+                              if inserted_count == len(chunk) else None)
         
-        # Guardar en la base de datos
-        db.session.add_all(records)
-        db.session.commit()
+        if skipped:
+            logger.info(f"Importación: {skipped} filas duplicadas omitidas")
+        return total
+    
+    @classmethod
+    def _insert_ignoring_duplicates(cls):
+        """INSERT que descarta en la base de datos las filas con huella repetida"""
+        table = cls.__table__
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+            return sqlite_insert(table).on_conflict_do_nothing()
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+            return postgresql_insert(table).on_conflict_do_nothing()
+        if dialect in ('mysql', 'mariadb'):
+            return insert(table).prefix_with('IGNORE')
+        return insert(table)
+    
+    @classmethod
+    def _driver_insert(cls, statement, names):
+        """
+        Prepara un INSERT ejecutado con executemany directamente en el driver
+        
+        La sentencia se compila una vez y se evita el procesado por fila de
+        los parámetros en SQLAlchemy; solo se aplican los conversores de tipo
+        que necesite el dialecto (p.ej. las fechas como texto en SQLite).
+        
+        Args:
+            statement (Insert): Sentencia sin RETURNING
+            names (list): Columnas que se insertan
+        
+        Returns:
+            callable: Recibe un dict de columnas (listas de valores) y devuelve
+                      el número de filas insertadas
+        """
+        dialect = db.engine.dialect
+        compiled = statement.compile(dialect=dialect, column_keys=names)
+        keys = list(compiled.positiontup) if compiled.positional else names
+        processors = {}
+        for name in keys:
+            processor = cls.__table__.c[name].type.dialect_impl(dialect).bind_processor(dialect)
+            if processor is not None:
+                processors[name] = processor
+        sql = str(compiled)
+        
+        def convert(processor, values):
+            # Los valores repetidos (p.ej. la fecha de importación) se convierten una sola vez
+            cache = {}
+            return [cache[value] if value in cache else cache.setdefault(value, processor(value)) for value in values]
+        
+        def execute(columns):
+            values = [convert(processors[name], columns[name]) if name in processors else columns[name]
+                      for name in keys]
+            if compiled.positional:
+                params = list(zip(*values))
+            else:
+                params = [dict(zip(keys, row)) for row in zip(*values)]
+            result = db.session.connection().exec_driver_sql(sql, params)
+            return result.rowcount if result.rowcount >= 0 else len(params)
+        
+        return execute
+    
+    @classmethod
+    def _existing_fingerprints(cls, fingerprints, batch_size=500):
+        """
+        Devuelve cuáles de las huellas ya están guardadas
+        
+        Args:
+            fingerprints (list): Huellas a comprobar
+            batch_size (int): Huellas por consulta IN
+        
+        Returns:
+            set: Huellas existentes
+        """
+        existing = set()
+        for begin in range(0, len(fingerprints), batch_size):
+            batch = fingerprints[begin:begin + batch_size]
+            existing.update(db.session.execute(select(cls.fingerprint).where(cls.fingerprint.in_(batch))).scalars())
+        return existing
+    
+    @classmethod
+    def _iter_fingerprints(cls, chunk_size=50000):
+        """Recorre por bloques las huellas guardadas (para el filtro de Bloom)"""
+        statement = select(cls.fingerprint).where(cls.fingerprint.is_not(None))
+        result = db.session.execute(statement.execution_options(yield_per=chunk_size))
+        for partition in result.scalars().partitions():
+            yield partition
+    
+    @classmethod
+    def _count_fingerprints(cls):
+        return db.session.query(func.count(cls.fingerprint)).scalar()
+    
+    @classmethod
+    def _assign_building_ids(cls, df, convert_building_areas=True):
+        """
+        Calcula el building_id de cada fila a importar
+        
+        Se respeta la columna building_id si existe; si no, se asigna el
+        edificio de área más cercana a area_edificio siempre que la diferencia
+        no supere BUILDING_AREA_TOLERANCE (ver match_building_areas).
+        
+        Args:
+            df (pandas.DataFrame): Filas a importar
+            convert_building_areas (bool): Buscar edificios por área
+        
+        Returns:
+            list: building_id (int) o None por fila
+        """
+        if 'building_id' in df.columns:
+            building_ids = df['building_id']
+            return [int(value) if pd.notna(value) else None for value in building_ids.tolist()]
+        
+        if not convert_building_areas:
+            return [None] * len(df)
         
-        return len(records)
+        buildings = db.session.execute(select(Building.id, Building.area)).all()
+        assigned = match_building_areas(df['area_edificio'].to_numpy(dtype=np.float64),
+                                        [b.area for b in buildings], [b.id for b in buildings])
+        return [int(bid) if bid >= 0 else None for bid in assigned.tolist()]
     
     @classmethod
     def get_statistics(cls):
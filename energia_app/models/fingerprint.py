@@ -0,0 +1,196 @@
+"""
+Huellas de contenido de los registros de EnergyData
+
+Cada fila importada recibe una huella (BLAKE2b de 128 bits, en hexadecimal)
+calculada sobre el edificio, la marca de tiempo de origen y los valores
+medidos. Sin marca de tiempo, dos lecturas iguales pueden ser legítimas (la
+misma hora de otra semana), así que la huella identifica la fila dentro de
+su archivo (nombre y número de fila); si tampoco se conoce el archivo, la
+fila se guarda sin huella. La columna ``fingerprint`` tiene un índice único,
+de modo que volver a subir el mismo archivo no duplica filas: la base de
+datos descarta los duplicados al insertar.
+
+Un filtro de Bloom en memoria con las huellas ya guardadas permite descartar
+sin consultar la base de datos las filas que seguro son nuevas; solo las
+filas que "quizá" existen se comprueban con una consulta por bloque.
+"""
+
+import threading
+from hashlib import blake2b
+import numpy as np
+import pandas as pd
+
+# Disposición binaria de los valores que entran en la huella (orden fijo)
+FINGERPRINT_DTYPE = np.dtype([
+    ('building_id', '<i8'),
+    ('timestamp', '<i8'),
+    ('area_edificio', '<f8'),
+    ('ocupacion', '<f8'),
+    ('dia_semana', '<i8'),
+    ('hora_dia', '<i8'),
+    ('consumo_energetico', '<f8'),
+])
+
+FINGERPRINT_LENGTH = 32
+
+# Decimales de los valores reales en la huella: el lector rápido de
+# read_csv puede diferir en el último bit al releer el mismo número
+FINGERPRINT_DECIMALS = 6
+
+
+def row_fingerprints(df, building_ids=None, timestamps=None, source_name=None):
+    """
+    Calcula la huella de cada fila
+
+    Args:
+        df (DataFrame): area_edificio, ocupacion, dia_semana, hora_dia y consumo_energetico;
+                        el índice es el número de fila en el archivo de origen
+        building_ids (list, optional): building_id por fila (None si no aplica)
+        timestamps (Series, optional): Marca de tiempo de origen por fila
+        source_name (str, optional): Archivo de origen, para las filas sin marca de tiempo
+
+    Returns:
+        list: Huella hexadecimal de 32 caracteres por fila (None si la fila
+              no tiene marca de tiempo ni archivo de origen)
+    """
+    n = len(df)
+    packed = np.zeros(n, dtype=FINGERPRINT_DTYPE)
+    if building_ids is not None:
+        packed['building_id'] = [-1 if bid is None else bid for bid in building_ids]
+    else:
+        packed['building_id'] = -1
+    if timestamps is not None:
+        values = pd.to_datetime(pd.Series(timestamps, index=df.index), errors='coerce')
+        packed['timestamp'] = np.where(values.isna(), -1, values.to_numpy(dtype='datetime64[ns]').astype(np.int64))
+    else:
+        packed['timestamp'] = -1
+    for name in ('area_edificio', 'ocupacion', 'dia_semana', 'hora_dia', 'consumo_energetico'):
+        packed[name] = df[name].to_numpy()
+    # Redondear e igualar 0.0 y -0.0 para que no den huellas distintas
+    for name in ('area_edificio', 'ocupacion', 'consumo_energetico'):
+        packed[name] = np.round(packed[name], FINGERPRINT_DECIMALS) + 0.0
+
+    rows = packed.view(np.dtype((np.void, FINGERPRINT_DTYPE.itemsize)))
+    untimed = packed['timestamp'] == -1
+    if not untimed.any():
+        return [blake2b(row.tobytes(), digest_size=16).hexdigest() for row in rows]
+
+    # Filas sin marca de tiempo: se añaden el archivo y el número de fila
+    if source_name is None:
+        identities = [None] * n
+    else:
+        source = blake2b(source_name.encode('utf-8'), digest_size=8).digest()
+        identities = [source + number.tobytes() for number in np.asarray(df.index, dtype='<i8')]
+    fingerprints = []
+    for row, missing, identity in zip(rows, untimed.tolist(), identities):
+        if not missing:
+            fingerprints.append(blake2b(row.tobytes(), digest_size=16).hexdigest())
+        elif identity is None:
+            fingerprints.append(None)
+        else:
+            fingerprints.append(blake2b(row.tobytes() + identity, digest_size=16).hexdigest())
+    return fingerprints
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom sobre huellas hexadecimales (sin falsos negativos)
+
+    Las posiciones se derivan de la propia huella (doble hashing), por lo
+    que añadir y consultar un bloque entero son operaciones vectorizadas.
+    """
+
+    def __init__(self, capacity=100_000, error_rate=0.01):
+        self.capacity = max(1, int(capacity))
+        self.error_rate = error_rate
+        self.size = int(np.ceil(-self.capacity * np.log(error_rate) / np.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / self.capacity * np.log(2))))
+        self.bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, fingerprints):
+        digest = np.frombuffer(bytes.fromhex(''.join(fingerprints)), dtype='<u8').reshape(-1, 2)
+        steps = np.arange(self.hashes, dtype=np.uint64)
+        with np.errstate(over='ignore'):
+            combined = digest[:, :1] + steps * (digest[:, 1:] | np.uint64(1))
+        return combined % np.uint64(self.size)
+
+    def add(self, fingerprints):
+        """Añade un bloque de huellas"""
+        if not len(fingerprints):
+            return
+        positions = self._positions(fingerprints).ravel()
+        np.bitwise_or.at(self.bits, (positions >> np.uint64(3)).astype(np.intp),
+                         np.left_shift(1, (positions & np.uint64(7)).astype(np.uint8)).astype(np.uint8))
+        self.count += len(fingerprints)
+
+    def might_contain(self, fingerprints):
+        """
+        Indica qué huellas pueden estar en el filtro
+
+        Args:
+            fingerprints (list): Huellas a consultar
+
+        Returns:
+            ndarray: False si la huella seguro no se ha añadido
+        """
+        if not len(fingerprints):
+            return np.zeros(0, dtype=bool)
+        positions = self._positions(fingerprints)
+        bits = (self.bits[(positions >> np.uint64(3)).astype(np.intp)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=1)
+
+    @property
+    def saturated(self):
+        """True si contiene más elementos de los previstos (más falsos positivos)"""
+        return self.count > self.capacity
+
+
+class FingerprintFilter:
+    """
+    Filtro de Bloom de las huellas guardadas, cargado bajo demanda.
+
+    Es local al proceso: otro proceso puede insertar huellas que este filtro
+    no conoce, por lo que solo sirve para evitar consultas; la garantía de
+    unicidad la da el índice único de la base de datos.
+    """
+
+    def __init__(self, error_rate=0.01):
+        self.error_rate = error_rate
+        self._filter = None
+        self._lock = threading.Lock()
+
+    def get(self, load, count):
+        """
+        Devuelve el filtro, construyéndolo si no existe o está saturado
+
+        Args:
+            load (callable): Devuelve un iterable de bloques de huellas guardadas
+            count (callable): Devuelve el número de huellas guardadas
+
+        Returns:
+            BloomFilter: Filtro con las huellas conocidas
+        """
+        with self._lock:
+            if self._filter is None or self._filter.saturated:
+                stored = count()
+                bloom = BloomFilter(capacity=max(100_000, 2 * stored), error_rate=self.error_rate)
+                for chunk in load():
+                    bloom.add(chunk)
+                self._filter = bloom
+            return self._filter
+
+    def add(self, fingerprints):
+        """Registra huellas recién insertadas (si el filtro ya está cargado)"""
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(fingerprints)
+
+    def clear(self):
+        """Descarta el filtro (p.ej. al eliminar registros)"""
+        with self._lock:
+            self._filter = None
+
+
+# Instancia única por proceso
+fingerprint_filter = FingerprintFilter()
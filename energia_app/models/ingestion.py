@@ -0,0 +1,95 @@
+import json
+from datetime import datetime
+from energia_app.models.user import db
+
+
+class IngestionJob(db.Model):
+    """
+    Trabajo de ingesta de un archivo CSV en segundo plano
+
+    El trabajador actualiza el progreso al confirmar cada bloque, de modo que
+    cualquier proceso web puede consultarlo desde la base de datos.
+    """
+    __tablename__ = 'ingestion_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # queued, running, completed, failed
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    retrain = db.Column(db.Boolean, default=False)
+    worker = db.Column(db.String(100))  # host:pid del proceso que ejecuta el trabajo
+
+    bytes_total = db.Column(db.BigInteger, default=0)
+    bytes_done = db.Column(db.BigInteger, default=0)
+    rows_done = db.Column(db.Integer, default=0)
+    rows_imported = db.Column(db.Integer, default=0)
+    rows_rejected = db.Column(db.Integer, default=0)
+    chunks_done = db.Column(db.Integer, default=0)
+    chunks_failed = db.Column(db.Integer, default=0)
+    rows_per_second = db.Column(db.Float, default=0.0)
+
+    # Errores de ejemplo por bloque (JSON) y error fatal del trabajo
+    _errors = db.Column('errors', db.Text)
+    error = db.Column(db.Text)
+    retrain_job_id = db.Column(db.String(32))
+
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    user = db.relationship('User', backref='ingestion_jobs')
+
+    # Errores de ejemplo guardados como máximo por trabajo
+    MAX_ERRORS = 50
+
+    def __repr__(self):
+        return f'<IngestionJob {self.id} {self.filename} {self.status}>'
+
+    @property
+    def errors(self):
+        return json.loads(self._errors) if self._errors else []
+
+    def add_errors(self, chunk, messages):
+        """Guarda los errores de ejemplo de un bloque (hasta MAX_ERRORS en total)"""
+        errors = self.errors
+        for message in messages:
+            if len(errors) >= self.MAX_ERRORS:
+                break
+            errors.append({'chunk': chunk, 'error': message})
+        self._errors = json.dumps(errors)
+
+    @property
+    def progress(self):
+        """Porcentaje de bytes procesados (100 al terminar)"""
+        if self.status == 'completed':
+            return 100
+        if not self.bytes_total:
+            return 0
+        return min(99, int(100 * (self.bytes_done or 0) / self.bytes_total))
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'progress': self.progress,
+            'user_id': self.user_id,
+            'retrain': self.retrain,
+            'bytes_total': self.bytes_total,
+            'rows_done': self.rows_done,
+            'rows_imported': self.rows_imported,
+            'rows_rejected': self.rows_rejected,
+            'chunks_done': self.chunks_done,
+            'chunks_failed': self.chunks_failed,
+            'rows_per_second': round(self.rows_per_second or 0.0, 1),
+            'errors': self.errors,
+            'error': self.error,
+            'retrain_job_id': self.retrain_job_id,
+            'created_at': self.created_at.isoformat(timespec='seconds') if self.created_at else None,
+            'started_at': self.started_at.isoformat(timespec='seconds') if self.started_at else None,
+            'finished_at': self.finished_at.isoformat(timespec='seconds') if self.finished_at else None
+        }
@@ -0,0 +1,184 @@
+"""
+Tabla precalculada de predicciones por edificio
+
+Para cada edificio activo se guarda la predicción para todos los días (7),
+horas (24) y una rejilla de niveles de ocupación. Las consultas se resuelven
+en O(1) interpolando linealmente entre los dos niveles de ocupación más
+cercanos. Las porciones se reconstruyen en segundo plano cuando cambia el
+área del edificio o el modelo.
+"""
+
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DAYS = np.arange(7)
+HOURS = np.arange(24)
+
+
+class PredictionTable:
+    """
+    Predicciones precalculadas con forma (7, 24, n_niveles) por edificio.
+
+    Cada porción recuerda el área y el evaluador compilado con el que se
+    generó; si alguno de los dos cambia la porción se considera obsoleta,
+    la consulta devuelve None y se programa su reconstrucción.
+    """
+
+    def __init__(self, occupancy_step=10, max_occupancy=1000):
+        """
+        Args:
+            occupancy_step (int): Separación entre niveles de ocupación
+            max_occupancy (int): Ocupación máxima cubierta por la tabla
+        """
+        self.occupancy_step = occupancy_step
+        self.max_occupancy = max_occupancy
+        self.occupancy_levels = np.arange(0, max_occupancy + occupancy_step, occupancy_step, dtype=np.float64)
+        self._slices = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prediction-table')
+
+    def _compute_slice(self, scorer, area):
+        """Evalúa todas las combinaciones día × hora × ocupación para un área"""
+        return scorer(area,
+                      self.occupancy_levels[None, None, :],
+                      DAYS[:, None, None],
+                      HOURS[None, :, None])
+
+    def build(self, scorer, buildings):
+        """
+        Construye (de forma síncrona) las porciones de los edificios indicados
+
+        Args:
+            scorer (LinearScorer): Evaluador compilado del modelo actual
+            buildings (iterable): Pares (building_id, area)
+        """
+        for building_id, area in buildings:
+            values = self._compute_slice(scorer, area)
+            with self._lock:
+                self._slices[building_id] = (area, scorer, values)
+                self._pending.discard(building_id)
+
+    def schedule(self, scorer, buildings):
+        """
+        Programa en segundo plano la reconstrucción de las porciones indicadas
+
+        Args:
+            scorer (LinearScorer): Evaluador compilado del modelo actual
+            buildings (iterable): Pares (building_id, area)
+        """
+        with self._lock:
+            todo = [(bid, area) for bid, area in buildings if bid not in self._pending]
+            self._pending.update(bid for bid, _ in todo)
+        if not todo:
+            return
+
+        def _run():
+            try:
+                self.build(scorer, todo)
+            except Exception as e:
+                logger.error(f"Error al construir la tabla de predicciones: {str(e)}")
+                with self._lock:
+                    self._pending.difference_update(bid for bid, _ in todo)
+
+        self._executor.submit(_run)
+
+    def rebuild_all(self, scorer, buildings=None):
+        """
+        Programa la reconstrucción de todas las porciones con un modelo nuevo
+
+        Args:
+            scorer (LinearScorer): Evaluador compilado del nuevo modelo
+            buildings (iterable, optional): Pares (building_id, area); por
+                defecto se reconstruyen los edificios ya presentes en la tabla
+        """
+        if buildings is None:
+            with self._lock:
+                buildings = [(bid, entry[0]) for bid, entry in self._slices.items()]
+        self.schedule(scorer, buildings)
+
+    def discard(self, building_id):
+        """Elimina la porción de un edificio (p.ej. al eliminarlo o desactivarlo)"""
+        with self._lock:
+            self._slices.pop(building_id, None)
+
+    def lookup(self, scorer, building_id, area, ocupacion, dia_semana, hora_dia):
+        """
+        Consulta una predicción en O(1)
+
+        Args:
+            scorer (LinearScorer): Evaluador compilado del modelo actual
+            building_id (int): ID del edificio
+            area (float): Área actual del edificio
+            ocupacion (float): Nivel de ocupación
+            dia_semana (int): Día de la semana (0-6)
+            hora_dia (int): Hora del día (0-23)
+
+        Returns:
+            float: Consumo predicho o None si la porción falta, está obsoleta
+                   o la ocupación queda fuera de la rejilla
+        """
+        entry = self._slices.get(building_id)
+        if entry is None or entry[0] != area or entry[1] is not scorer:
+            self.schedule(scorer, [(building_id, area)])
+            return None
+        if not 0 <= ocupacion <= self.max_occupancy:
+            return None
+
+        position = ocupacion / self.occupancy_step
+        lower = min(int(position), len(self.occupancy_levels) - 2)
+        fraction = position - lower
+        row = entry[2][dia_semana, hora_dia]
+        return float(row[lower] + (row[lower + 1] - row[lower]) * fraction)
+
+
+# Instancia única por proceso
+prediction_table = PredictionTable()
+
+
+def refresh_buildings(buildings, rebuild_all=False):
+    """
+    Programa la reconstrucción de las porciones con el modelo actual
+
+    Args:
+        buildings (iterable): Objetos Building a (re)calcular; los inactivos
+                              se eliminan de la tabla
+        rebuild_all (bool): Si es True también se reconstruyen las porciones
+                            de edificios ya presentes (nuevo modelo)
+
+    Returns:
+        bool: True si se programó la reconstrucción
+    """
+    from energia_app.models.model import Energy_Model
+    from energia_app.models.building_models import scorer_for_building
+
+    buildings = list(buildings)
+    for building in buildings:
+        if not building.active:
+            prediction_table.discard(building.id)
+
+    model = Energy_Model()
+    if not model.trained:
+        return False
+    try:
+        scorer = model.compile_scorer()
+    except ValueError as e:
+        logger.warning(f"No se pudo compilar el modelo para la tabla de predicciones: {str(e)}")
+        return False
+
+    if rebuild_all:
+        prediction_table.rebuild_all(scorer)
+
+    # Cada edificio se precalcula con su propio modelo si lo tiene
+    by_scorer = {}
+    for building in buildings:
+        if building.active:
+            building_scorer = scorer_for_building(building.id, scorer)
+            by_scorer.setdefault(id(building_scorer), (building_scorer, []))[1].append((building.id, building.area))
+    for building_scorer, active in by_scorer.values():
+        prediction_table.schedule(building_scorer, active)
+    return True
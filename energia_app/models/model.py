@@ -1,15 +1,28 @@
 import numpy as np
 import pandas as pd
 from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
 import os
 import logging
+from datetime import datetime
+from energia_app.models.registry import registry, MODEL_DIR, MODEL_PATH, SCALER_PATH, BUNDLE_PATH
+from energia_app.models.bundle import ModelBundle, atomic_write, save_bundle, load_bundle
+from energia_app.models.statistics import SufficientStatistics
+from energia_app.models.cache import prediction_cache
+from energia_app.utils.timing import stage
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Estimadores que admiten actualización incremental (True si usan alpha L2)
+INCREMENTAL_ESTIMATORS = {'LinearRegression': False, 'Ridge': True}
+
+# Evaluadores compilados por dtype: (estimador, escalador, evaluador)
+_compiled_scorers = {}
+
 # Funciones de utilidad para manejo de modelos
 def save_model_file(model, model_path, model_dir=None):
     """
@@ -30,7 +43,7 @@ def save_model_file(model, model_path, model_dir=None):
         elif not os.path.exists(os.path.dirname(model_path)):
             os.makedirs(os.path.dirname(model_path), exist_ok=True)
             
-        joblib.dump(model, model_path)
+        atomic_write(model_path, lambda f: joblib.dump(model, f))
         logger.info(f"Modelo guardado en {model_path}")
         return True
     except Exception as e:
@@ -69,29 +82,25 @@ class Energy_Model:
         self.model = LinearRegression()
         # IMPORTANTE: Inicializar el atributo 'trained' explícitamente
         self.trained = False
+        # Paquete versionado del que procede el modelo (si existe)
+        self.bundle = None
         
         # Usar ruta absoluta para el modelo
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self.model_dir = os.path.join(base_dir, 'models')
-        self.model_path = os.path.join(self.model_dir, 'energy_model.pkl')
+        self.model_dir = MODEL_DIR
+        self.model_path = MODEL_PATH
+        self.bundle_path = BUNDLE_PATH
         
-        # Cargar modelo si existe
+        # Cargar modelo si existe (compartido por proceso a través del registro)
         self._try_load_model()
     
     def _try_load_model(self):
         """Intenta cargar el modelo existente"""
-        loaded_model = load_model_file(self.model_path)
-        if loaded_model:
-            self.model = loaded_model
-            # IMPORTANTE: Establecer trained=True cuando el modelo se carga correctamente
-            self.trained = True
+        if self.load_model():
             logger.info("Modelo cargado exitosamente y marcado como entrenado")
         else:
             logger.warning("No se pudo cargar un modelo entrenado existente")
-            # Asegurar que trained=False si no se pudo cargar
-            self.trained = False
     
-    def train(self, X, y, test_size=0.2, random_state=42):
+    def train(self, X, y, test_size=0.2, random_state=42, selection=None):
         """
         Entrena el modelo con los datos proporcionados
         
@@ -100,6 +109,10 @@ class Energy_Model:
             y (Series): Variable objetivo (consumo energético)
             test_size (float): Proporción de datos para prueba
             random_state (int): Semilla para reproducibilidad
+            selection (dict, optional): Si se indica, el estimador se elige
+                por validación cruzada sobre la parte de entrenamiento; admite
+                las opciones de ``select_model`` (cv, metric, time_budget,
+                n_jobs, candidates)
         
         Returns:
             dict: Métricas de rendimiento del modelo
@@ -110,7 +123,19 @@ class Energy_Model:
                 X, y, test_size=test_size, random_state=random_state
             )
             
-            # Entrenar modelo
+            # Entrenar un estimador nuevo: el cargado se comparte entre hilos
+            selected = None
+            if selection is not None:
+                from energia_app.models.selection import select_model
+                from energia_app.models.preprocess import load_scaler
+                # La selección reescala dentro de cada pliegue: se le pasan
+                # las características sin el escalador recién ajustado
+                scaler = registry.get(SCALER_PATH, load_scaler)
+                X_select = scaler.inverse_transform(np.asarray(X_train)) if scaler is not None else X_train
+                selected = select_model(X_select, y_train, random_state=random_state, **selection)
+                self.model = selected['estimator']
+            else:
+                self.model = LinearRegression()
             self.model.fit(X_train, y_train)
             # IMPORTANTE: Establecer trained=True después de entrenar exitosamente
             self.trained = True
@@ -121,8 +146,31 @@ class Energy_Model:
             # Calcular métricas
             metrics = self._calculate_metrics(y_test, y_pred)
             
-            # Guardar modelo entrenado
-            self.save_model()
+            metadata = {
+                'trained_at': datetime.now().isoformat(timespec='seconds'),
+                'n_samples': int(len(X)),
+                'test_size': test_size,
+                'r2': float(metrics['r2']),
+                'rmse': float(metrics['rmse'])
+            }
+            if selected is not None:
+                metrics['selection'] = {key: value for key, value in selected.items() if key != 'estimator'}
+                metrics['selection']['winner'] = type(self.model).__name__
+                metadata['selection'] = {
+                    'metric': selected['metric'],
+                    'score': selected['score'],
+                    'n_candidates': len(selected['results']),
+                    'n_skipped': len(selected['skipped'])
+                }
+            
+            # Estadísticos suficientes sobre las características sin escalar,
+            # para poder incorporar datos nuevos sin reentrenar desde cero
+            statistics = None
+            if type(self.model).__name__ in INCREMENTAL_ESTIMATORS:
+                statistics = self._statistics_from_scaled(X, y)
+            
+            # Guardar modelo entrenado junto con su escalador y metadatos
+            self.save_model(metadata, statistics)
             
             logger.info(f"Modelo entrenado. Métricas: MSE={metrics['mse']:.4f}, R²={metrics['r2']:.4f}")
             return metrics
@@ -133,6 +181,124 @@ class Energy_Model:
             self.trained = False
             raise
     
+    def _statistics_from_scaled(self, X, y):
+        """Calcula los estadísticos suficientes deshaciendo el escalado de X"""
+        scaler = self.get_scaler()
+        if scaler is None:
+            return None
+        return SufficientStatistics.from_arrays(scaler.inverse_transform(np.asarray(X)), np.asarray(y))
+    
+    def update(self, data):
+        """
+        Incorpora registros nuevos sin recorrer todo el histórico
+        
+        Combina los estadísticos suficientes guardados en el paquete con los de
+        ``data``, vuelve a resolver las ecuaciones normales (con la misma
+        regularización del modelo actual) y reajusta el escalador con las
+        medias y varianzas acumuladas.
+        
+        Args:
+            data (DataFrame | SufficientStatistics): Registros nuevos con las
+                columnas crudas y 'consumo_energetico', o sus estadísticos ya
+                acumulados sobre FEATURE_COLUMNS (p.ej. durante una ingesta)
+        
+        Returns:
+            dict: Métricas de ajuste sobre todos los registros acumulados
+        
+        Raises:
+            ValueError: Si el modelo actual no tiene estadísticos suficientes
+                        (hay que hacer un reentrenamiento completo)
+        """
+        from energia_app.models.preprocess import apply_feature_engineering, FEATURE_COLUMNS
+        
+        if not self.trained or self.bundle is None or self.bundle.statistics is None:
+            raise ValueError("El modelo actual no admite actualización incremental; reentrene con todos los datos.")
+        
+        estimator_name = type(self.model).__name__
+        if estimator_name not in INCREMENTAL_ESTIMATORS:
+            raise ValueError(f"El estimador {estimator_name} no admite actualización incremental.")
+        uses_alpha = INCREMENTAL_ESTIMATORS[estimator_name]
+        alpha = float(self.model.alpha) if uses_alpha else 0.0
+        
+        feature_names = self.bundle.feature_names
+        if isinstance(data, SufficientStatistics):
+            if list(feature_names) != FEATURE_COLUMNS:
+                raise ValueError("Los estadísticos no siguen el orden de características del modelo actual.")
+            new_statistics = data
+        else:
+            features = apply_feature_engineering(
+                data[['area_edificio', 'ocupacion', 'dia_semana', 'hora_dia']].copy()
+            )[feature_names]
+            new_statistics = SufficientStatistics.from_arrays(features.to_numpy(), data['consumo_energetico'].to_numpy())
+        
+        statistics = self.bundle.statistics.copy().merge(new_statistics)
+        solution = statistics.solve(alpha)
+        
+        estimator = type(self.model)(alpha=alpha) if uses_alpha else type(self.model)()
+        estimator.coef_ = solution['coef']
+        estimator.intercept_ = solution['intercept']
+        estimator.n_features_in_ = len(feature_names)
+        estimator.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        
+        scaler = StandardScaler()
+        scaler.mean_ = solution['mean']
+        scaler.scale_ = solution['scale']
+        scaler.var_ = solution['var']
+        scaler.n_samples_seen_ = statistics.count
+        scaler.n_features_in_ = len(feature_names)
+        scaler.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        
+        metrics = {
+            'mse': solution['mse'],
+            'rmse': solution['rmse'],
+            'r2': solution['r2'],
+            'coefficients': estimator.coef_.tolist(),
+            'intercept': float(estimator.intercept_)
+        }
+        
+        bundle = ModelBundle(estimator, scaler, {
+            'trained_at': datetime.now().isoformat(timespec='seconds'),
+            'n_samples': statistics.count,
+            'update': 'incremental',
+            'n_new_samples': int(new_statistics.count),
+            'r2': float(metrics['r2']),
+            'rmse': float(metrics['rmse'])
+        }, statistics)
+        
+        if not save_bundle(bundle, self.bundle_path):
+            raise IOError("No se pudo guardar el modelo actualizado")
+        registry.put(self.bundle_path, bundle)
+        prediction_cache.invalidate()
+        self.bundle = bundle
+        self.model = estimator
+        
+        logger.info(f"Modelo actualizado con {new_statistics.count} registros nuevos. R²={metrics['r2']:.4f}")
+        return metrics
+    
+    def replace_statistics(self, statistics):
+        """
+        Publica el modelo actual con otros estadísticos suficientes, sin reajustarlo
+        
+        Mantiene los estadísticos al día con los registros guardados (altas
+        sin reentrenar, eliminaciones) para que la próxima actualización
+        incremental parta de todos ellos.
+        
+        Args:
+            statistics (SufficientStatistics): Estadísticos de los registros
+                guardados (None obliga a que el próximo reentrenamiento sea completo)
+        
+        Returns:
+            bool: False si el modelo no procede de un paquete (no tiene estadísticos)
+        """
+        if self.bundle is None:
+            return False
+        bundle = ModelBundle(self.bundle.estimator, self.bundle.scaler, self.bundle.metadata, statistics)
+        if not save_bundle(bundle, self.bundle_path):
+            raise IOError("No se pudieron guardar los estadísticos del modelo")
+        registry.put(self.bundle_path, bundle)
+        self.bundle = bundle
+        return True
+    
     def _calculate_metrics(self, y_true, y_pred):
         """
         Calcula métricas de rendimiento del modelo
@@ -186,14 +352,137 @@ class Energy_Model:
             logger.error(f"Error al realizar predicción: {str(e)}")
             raise
     
-    def save_model(self):
-        """Guarda el modelo entrenado en disco"""
-        return save_model_file(self.model, self.model_path, self.model_dir)
+    def compile_scorer(self, dtype=np.float64):
+        """
+        Devuelve un evaluador NumPy puro equivalente a preprocess_data + predict
+        
+        El escalador se pliega en los coeficientes una sola vez por pareja
+        modelo/escalador; el resultado se reutiliza entre peticiones.
+        
+        Args:
+            dtype: Tipo de coma flotante (np.float64 o np.float32)
+        
+        Returns:
+            LinearScorer: Evaluador sobre (area_edificio, ocupacion, dia_semana, hora_dia)
+        """
+        from energia_app.models.scorer import LinearScorer
+        
+        if not hasattr(self, 'trained') or not self.trained:
+            raise ValueError("El modelo no ha sido entrenado aún.")
+        
+        scaler = self.get_scaler()
+        if scaler is None:
+            raise ValueError(f"Escalador no encontrado en '{SCALER_PATH}'")
+        
+        key = np.dtype(dtype).name
+        cached = _compiled_scorers.get(key)
+        if cached is not None and cached[0] is self.model and cached[1] is scaler:
+            return cached[2]
+        
+        scorer = LinearScorer.from_estimator(self.model, scaler, dtype)
+        _compiled_scorers[key] = (self.model, scaler, scorer)
+        return scorer
+    
+    def predict_raw(self, area_edificio, ocupacion, dia_semana, hora_dia):
+        """
+        Predice a partir de valores crudos (escalares o arrays)
+        
+        Usa el evaluador compilado cuando hay escalador disponible y, si no,
+        el flujo completo de preprocess_data + predict.
+        
+        Args:
+            area_edificio: Área del edificio (m²)
+            ocupacion: Nivel de ocupación
+            dia_semana: Día de la semana (0-6)
+            hora_dia: Hora del día (0-23)
+        
+        Returns:
+            ndarray: Predicciones de consumo energético (siempre >= 0.1)
+        """
+        from energia_app.models.preprocess import preprocess_data
+        
+        try:
+            scorer = self.compile_scorer()
+        except ValueError:
+            scorer = None
+        
+        if scorer is not None:
+            return np.atleast_1d(scorer(area_edificio, ocupacion, dia_semana, hora_dia))
+        
+        area, occupancy, day, hour = np.broadcast_arrays(area_edificio, ocupacion, dia_semana, hora_dia)
+        input_data = pd.DataFrame({
+            'area_edificio': area.ravel(),
+            'ocupacion': occupancy.ravel(),
+            'dia_semana': day.ravel(),
+            'hora_dia': hour.ravel()
+        })
+        with stage('preprocess'):
+            X, _ = preprocess_data(input_data, training=False)
+        return self.predict(X)
+    
+    @property
+    def version(self):
+        """Hash del artefacto del que procede el modelo (None si no se cargó de disco)"""
+        return registry.version(self.bundle_path if self.bundle is not None else self.model_path)
+    
+    def get_scaler(self):
+        """Devuelve el escalador emparejado con el modelo actual (o None)"""
+        from energia_app.models.preprocess import load_scaler
+        
+        if self.bundle is not None and self.bundle.estimator is self.model:
+            return self.bundle.scaler
+        return registry.get(SCALER_PATH, load_scaler)
+    
+    def save_model(self, metadata=None, statistics=None):
+        """
+        Guarda el modelo entrenado en disco como paquete versionado
+        
+        El paquete incluye el escalador ajustado en el último preprocesamiento
+        de entrenamiento, de modo que modelo y escalador se publican juntos.
+        
+        Args:
+            metadata (dict, optional): Metadatos de entrenamiento
+            statistics (SufficientStatistics, optional): Estadísticos suficientes
+                de los datos de entrenamiento
+        
+        Returns:
+            bool: True si se guardó correctamente
+        """
+        scaler = self.get_scaler()
+        if scaler is None:
+            # Sin escalador no se puede formar un paquete consistente
+            saved = save_model_file(self.model, self.model_path, self.model_dir)
+            if saved:
+                registry.put(self.model_path, self.model)
+                prediction_cache.invalidate()
+            return saved
+        
+        bundle = ModelBundle(self.model, scaler, metadata, statistics)
+        saved = save_bundle(bundle, self.bundle_path)
+        if saved:
+            # Publicar el nuevo modelo al resto de peticiones del proceso
+            registry.put(self.bundle_path, bundle)
+            prediction_cache.invalidate()
+            self.bundle = bundle
+        return saved
     
     def load_model(self):
-        """Carga el modelo entrenado desde disco"""
-        loaded_model = load_model_file(self.model_path)
+        """
+        Carga el modelo entrenado desde disco
+        
+        Prioriza el paquete versionado; si no existe, recurre al modelo
+        serializado con joblib.
+        """
+        bundle = registry.get(self.bundle_path, load_bundle)
+        if bundle is not None:
+            self.bundle = bundle
+            self.model = bundle.estimator
+            self.trained = True
+            return True
+        
+        loaded_model = registry.get(self.model_path, load_model_file)
         if loaded_model:
+            self.bundle = None
             self.model = loaded_model
             # IMPORTANTE: Establecer trained=True cuando el modelo se carga correctamente
             self.trained = True
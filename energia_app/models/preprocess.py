@@ -6,6 +6,8 @@ from sklearn.preprocessing import StandardScaler
 import os
 import joblib
 import logging
+from energia_app.models.registry import registry, MODEL_DIR, SCALER_PATH, BUNDLE_PATH
+from energia_app.models.bundle import atomic_write, load_bundle
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -30,7 +32,7 @@ def save_scaler(scaler, scaler_path, model_dir=None):
         else:
             os.makedirs(os.path.dirname(scaler_path), exist_ok=True)
             
-        joblib.dump(scaler, scaler_path)
+        atomic_write(scaler_path, lambda f: joblib.dump(scaler, f))
         logger.info(f"Escalador guardado en {scaler_path}")
         return True
     except Exception as e:
@@ -59,6 +61,21 @@ def load_scaler(scaler_path):
         logger.error(f"Error al cargar el escalador: {str(e)}")
         return None
 
+def get_current_scaler():
+    """
+    Obtiene el escalador emparejado con el modelo en uso
+    
+    Prioriza el paquete versionado del modelo; si no existe, recurre al
+    escalador serializado por separado.
+    
+    Returns:
+        StandardScaler: Escalador o None si no hay ninguno disponible
+    """
+    bundle = registry.get(BUNDLE_PATH, load_bundle)
+    if bundle is not None:
+        return bundle.scaler
+    return registry.get(SCALER_PATH, load_scaler)
+
 # El resto de tu código de preprocesamiento continúa como estaba...
 
 def preprocess_data(data, training=True):
@@ -89,8 +106,12 @@ def preprocess_data(data, training=True):
         if missing_columns:
             raise ValueError(f"Columnas requeridas no encontradas: {', '.join(missing_columns)}")
         
-        # Aplicar feature engineering
-        df = apply_feature_engineering(df)
+        # Aplicar feature engineering, salvo que las características ya vengan
+        # materializadas desde la base de datos
+        if has_materialized_features(df):
+            df = df[FEATURE_COLUMNS]
+        else:
+            df = apply_feature_engineering(df)
         
         # Aplicar normalización
         X_processed = normalize_features(df, training)
@@ -101,42 +122,115 @@ def preprocess_data(data, training=True):
         logger.error(f"Error en preprocesamiento de datos: {str(e)}")
         raise
 
+# Orden de características generado por apply_feature_engineering
+FEATURE_COLUMNS = [
+    'area_edificio', 'ocupacion', 'dia_semana_sin', 'dia_semana_cos',
+    'hora_dia_sin', 'hora_dia_cos', 'es_dia_laboral', 'es_hora_laboral',
+    'ocupacion_por_area', 'base_consumo_hora', 'ocupacion_hora'
+]
+
+# Características derivadas que se materializan en EnergyData al insertar
+DERIVED_FEATURE_COLUMNS = FEATURE_COLUMNS[2:]
+
+# Versión del esquema de características: incrementarla al cambiar
+# apply_feature_engineering para que se recalculen las columnas materializadas
+FEATURE_VERSION = 1
+
+# Tablas precalculadas para las características cíclicas y franjas horarias.
+# Se calculan con la misma expresión que la versión por filas, por lo que los
+# valores son idénticos bit a bit.
+_DIAS = np.arange(7)
+_HORAS = np.arange(24)
+DIA_SEMANA_SIN = np.sin(2 * np.pi * _DIAS / 7)
+DIA_SEMANA_COS = np.cos(2 * np.pi * _DIAS / 7)
+HORA_DIA_SIN = np.sin(2 * np.pi * _HORAS / 24)
+HORA_DIA_COS = np.cos(2 * np.pi * _HORAS / 24)
+ES_DIA_LABORAL = (_DIAS < 5).astype(np.int64)
+ES_HORA_LABORAL = ((_HORAS >= 8) & (_HORAS <= 18)).astype(np.int64)
+
+def _base_consumo(horas):
+    """Consumo base según la franja horaria (nocturno, transición o laboral)"""
+    nocturno = ((horas >= 0) & (horas < 6)) | ((horas >= 22) & (horas <= 23))
+    transicion = ((horas >= 6) & (horas < 8)) | ((horas > 18) & (horas < 22))
+    return np.where(nocturno, 0.3, np.where(transicion, 0.6, 1.0))
+
+BASE_CONSUMO_HORA = _base_consumo(_HORAS)
+
+def _table_index(values, size):
+    """
+    Devuelve los valores como índices de tabla si todos son enteros en [0, size)
+    
+    Args:
+        values (ndarray): Valores de la columna
+        size (int): Tamaño de la tabla
+        
+    Returns:
+        ndarray: Índices enteros o None si algún valor no es indexable
+    """
+    if values.dtype.kind in 'iu':
+        index = values
+    elif values.dtype.kind == 'f':
+        if not np.all(np.isfinite(values)) or not np.all(values == np.floor(values)):
+            return None
+        index = values.astype(np.int64)
+    else:
+        return None
+    if index.size and (index.min() < 0 or index.max() >= size):
+        return None
+    return index
+
 def apply_feature_engineering(df):
     """
     Aplica transformaciones de feature engineering a los datos.
     
+    Las transformaciones están vectorizadas: los días y horas enteros se
+    resuelven con tablas de 7 y 24 entradas; cualquier otro valor se calcula
+    con las mismas expresiones y máscaras de NumPy.
+    
     Args:
         df (DataFrame): Datos a transformar
         
     Returns:
         DataFrame: Datos transformados
     """
+    dias = df['dia_semana'].to_numpy()
+    horas = df['hora_dia'].to_numpy()
+    idx_dia = _table_index(dias, 7)
+    idx_hora = _table_index(horas, 24)
+    
     # 1. Transformar variables cíclicas (día de la semana, hora del día)
     # Día de la semana (0-6) -> seno y coseno para capturar ciclicidad
-    df['dia_semana_sin'] = np.sin(2 * np.pi * df['dia_semana'] / 7)
-    df['dia_semana_cos'] = np.cos(2 * np.pi * df['dia_semana'] / 7)
+    if idx_dia is not None:
+        df['dia_semana_sin'] = DIA_SEMANA_SIN[idx_dia]
+        df['dia_semana_cos'] = DIA_SEMANA_COS[idx_dia]
+    else:
+        df['dia_semana_sin'] = np.sin(2 * np.pi * df['dia_semana'] / 7)
+        df['dia_semana_cos'] = np.cos(2 * np.pi * df['dia_semana'] / 7)
     
     # Hora del día (0-23) -> seno y coseno para capturar ciclicidad
-    df['hora_dia_sin'] = np.sin(2 * np.pi * df['hora_dia'] / 24)
-    df['hora_dia_cos'] = np.cos(2 * np.pi * df['hora_dia'] / 24)
+    if idx_hora is not None:
+        df['hora_dia_sin'] = HORA_DIA_SIN[idx_hora]
+        df['hora_dia_cos'] = HORA_DIA_COS[idx_hora]
+    else:
+        df['hora_dia_sin'] = np.sin(2 * np.pi * df['hora_dia'] / 24)
+        df['hora_dia_cos'] = np.cos(2 * np.pi * df['hora_dia'] / 24)
     
     # 2. Crear características derivadas
     # Indicador de día laboral (0-4: días laborales, 5-6: fin de semana)
-    df['es_dia_laboral'] = df['dia_semana'].apply(lambda x: 1 if x < 5 else 0)
+    df['es_dia_laboral'] = ES_DIA_LABORAL[idx_dia] if idx_dia is not None else (dias < 5).astype(np.int64)
     
     # Indicador de hora laboral (8-18 horas: horario laboral)
-    df['es_hora_laboral'] = df['hora_dia'].apply(lambda x: 1 if 8 <= x <= 18 else 0)
+    if idx_hora is not None:
+        df['es_hora_laboral'] = ES_HORA_LABORAL[idx_hora]
+    else:
+        df['es_hora_laboral'] = ((horas >= 8) & (horas <= 18)).astype(np.int64)
     
     # Interacción entre ocupación y área
     df['ocupacion_por_area'] = df['ocupacion'] / df['area_edificio']
     
     # Nueva característica: Estimación base de consumo según horario
     # Esto ayuda a establecer un "piso" de consumo para horarios nocturnos
-    df['base_consumo_hora'] = df['hora_dia'].apply(lambda x: 
-        0.3 if (0 <= x < 6) or (22 <= x <= 23) else  # Consumo base nocturno
-        0.6 if (6 <= x < 8) or (18 < x < 22) else    # Consumo transición
-        1.0                                           # Consumo horario laboral
-    )
+    df['base_consumo_hora'] = BASE_CONSUMO_HORA[idx_hora] if idx_hora is not None else _base_consumo(horas)
     
     # Nueva característica: Interacción hora-ocupación
     # Para capturar mejor el impacto de la ocupación en diferentes momentos del día
@@ -147,6 +241,42 @@ def apply_feature_engineering(df):
     
     return df
 
+def compute_derived_features(df):
+    """
+    Calcula las características derivadas de unas filas crudas
+    
+    Args:
+        df (DataFrame): Filas con area_edificio, ocupacion, dia_semana y hora_dia
+        
+    Returns:
+        DataFrame: Columnas de DERIVED_FEATURE_COLUMNS (mismo índice que ``df``)
+    """
+    raw = df[['area_edificio', 'ocupacion', 'dia_semana', 'hora_dia']].copy()
+    return apply_feature_engineering(raw)[DERIVED_FEATURE_COLUMNS].astype(np.float64)
+
+def refresh_stale_features(df):
+    """
+    Recalcula las características materializadas que faltan o son de otra versión
+    
+    Args:
+        df (DataFrame): Filas crudas con las columnas derivadas y feature_version
+        
+    Returns:
+        DataFrame: ``df`` con todas las características derivadas al día
+    """
+    stale = (df['feature_version'].to_numpy() != FEATURE_VERSION) | df[DERIVED_FEATURE_COLUMNS].isna().to_numpy().any(axis=1)
+    if stale.any():
+        df = df.copy()
+        df.loc[stale, DERIVED_FEATURE_COLUMNS] = compute_derived_features(df.loc[stale]).to_numpy()
+        df['feature_version'] = FEATURE_VERSION
+    return df
+
+def has_materialized_features(df):
+    """Indica si ``df`` ya trae todas las características derivadas, sin nulos"""
+    if not all(column in df.columns for column in DERIVED_FEATURE_COLUMNS):
+        return False
+    return not df[DERIVED_FEATURE_COLUMNS].isna().to_numpy().any()
+
 def normalize_features(df, training=True):
     """
     Normaliza las características utilizando StandardScaler.
@@ -159,19 +289,20 @@ def normalize_features(df, training=True):
         DataFrame: Datos normalizados
     """
     # Usar ruta absoluta para el escalador
-    model_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
-    scaler_path = os.path.join(model_dir, 'scaler.pkl')
+    model_dir = MODEL_DIR
+    scaler_path = SCALER_PATH
     
     if training:
         # En entrenamiento, ajustar el escalador y guardarlo
         scaler = StandardScaler()
         X_scaled = scaler.fit_transform(df)
         
-        # Guardar el escalador para uso futuro
-        save_scaler(scaler, scaler_path, model_dir)
+        # Guardar el escalador para uso futuro y publicarlo en el registro
+        if save_scaler(scaler, scaler_path, model_dir):
+            registry.put(scaler_path, scaler)
     else:
-        # En predicción, cargar el escalador guardado
-        scaler = load_scaler(scaler_path)
+        # En predicción, usar el escalador compartido del proceso
+        scaler = get_current_scaler()
         
         if scaler is None:
             # Si no existe, crear un escalador básico
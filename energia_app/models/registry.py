@@ -0,0 +1,159 @@
+"""
+Registro de artefactos del modelo (modelo y escalador) compartido por proceso
+
+Cada worker carga los artefactos una sola vez y los comparte entre peticiones
+e hilos. Solo se vuelven a leer del disco cuando cambia la huella del archivo
+(mtime/tamaño) y, además, su contenido (hash SHA-256).
+"""
+
+import hashlib
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rutas absolutas de los artefactos
+MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(MODEL_DIR, 'energy_model.pkl')
+SCALER_PATH = os.path.join(MODEL_DIR, 'scaler.pkl')
+BUNDLE_PATH = os.path.join(MODEL_DIR, 'energy_model.bundle.npy')
+BUILDING_MODEL_DIR = os.path.join(MODEL_DIR, 'buildings')
+
+
+def file_digest(path, block_size=1024 * 1024):
+    """
+    Calcula el hash SHA-256 del contenido de un archivo
+
+    Args:
+        path (str): Ruta del archivo
+        block_size (int): Tamaño de bloque de lectura
+
+    Returns:
+        str: Hash hexadecimal del contenido
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_signature(path):
+    """Huella barata del archivo: (mtime_ns, tamaño) o None si no existe"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class _Entry:
+    """Artefacto cargado junto con la huella y el hash del archivo de origen"""
+
+    __slots__ = ('obj', 'signature', 'digest')
+
+    def __init__(self, obj, signature, digest):
+        self.obj = obj
+        self.signature = signature
+        self.digest = digest
+
+
+class ArtifactRegistry:
+    """
+    Caché de artefactos cargados desde disco, segura entre hilos.
+
+    La comprobación en cada acceso es un único ``os.stat``. Si la huella
+    cambia se recalcula el hash del contenido y solo se deserializa de nuevo
+    cuando el contenido es realmente distinto.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}
+
+    def get(self, path, loader):
+        """
+        Obtiene el artefacto de ``path``, cargándolo con ``loader`` si es necesario
+
+        Args:
+            path (str): Ruta del artefacto
+            loader (callable): Función que recibe la ruta y devuelve el objeto
+                               (o None si no se pudo cargar)
+
+        Returns:
+            object: Artefacto cargado o None si no existe
+        """
+        signature = _file_signature(path)
+        entry = self._entries.get(path)
+        if entry is not None and signature is not None and entry.signature == signature:
+            return entry.obj
+
+        with self._lock:
+            # Otro hilo pudo haber recargado mientras esperábamos el lock
+            signature = _file_signature(path)
+            entry = self._entries.get(path)
+            if signature is None:
+                self._entries.pop(path, None)
+                return None
+            if entry is not None and entry.signature == signature:
+                return entry.obj
+
+            digest = file_digest(path)
+            if entry is not None and entry.digest == digest:
+                # Solo cambió el mtime (p.ej. un touch o una copia idéntica)
+                entry.signature = signature
+                return entry.obj
+
+            obj = loader(path)
+            if obj is None:
+                return None
+            self._entries[path] = _Entry(obj, signature, digest)
+            logger.info(f"Artefacto cargado en el registro: {path} ({digest[:12]})")
+            return obj
+
+    def put(self, path, obj):
+        """
+        Registra un artefacto recién guardado en ``path`` sin volver a leerlo
+
+        Args:
+            path (str): Ruta donde se guardó el artefacto
+            obj (object): Artefacto en memoria
+        """
+        with self._lock:
+            signature = _file_signature(path)
+            if signature is None:
+                self._entries.pop(path, None)
+                return
+            self._entries[path] = _Entry(obj, signature, file_digest(path))
+
+    def version(self, path):
+        """
+        Devuelve el hash del artefacto cargado para ``path`` (o None)
+
+        Args:
+            path (str): Ruta del artefacto
+
+        Returns:
+            str: Hash SHA-256 del contenido cargado
+        """
+        entry = self._entries.get(path)
+        return entry.digest if entry is not None else None
+
+    def invalidate(self, path=None):
+        """
+        Descarta un artefacto (o todos) para forzar su recarga
+
+        Args:
+            path (str, optional): Ruta del artefacto; si es None se limpia todo
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+
+# Instancia única por proceso
+registry = ArtifactRegistry()
+
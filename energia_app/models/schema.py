@@ -0,0 +1,57 @@
+"""
+Cambios de esquema de la base de datos
+
+Las tablas y columnas nuevas se aplican una sola vez con ``flask upgrade-db``
+(fuera de los workers web, p.ej. en la fase de release del despliegue); la
+aplicación solo comprueba al arrancar que el esquema está al día, porque
+cualquier consulta de un modelo lee todas sus columnas y falla si alguna no
+existe.
+"""
+
+import logging
+from sqlalchemy import inspect
+from energia_app.models.user import db
+
+logger = logging.getLogger(__name__)
+
+
+def pending_schema_changes():
+    """
+    Tablas y columnas de los modelos que faltan en la base de datos
+
+    Returns:
+        list: 'tabla' o 'tabla.columna' por cada elemento que falta
+    """
+    inspector = inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    pending = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            pending.append(table.name)
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        pending.extend(f'{table.name}.{column.name}' for column in table.columns if column.name not in existing)
+    return pending
+
+
+def upgrade_schema():
+    """
+    Crea las tablas que faltan y añade las columnas nuevas de EnergyData
+
+    Solo aplica DDL barato (CREATE TABLE y ADD COLUMN de columnas nulas): el
+    recálculo de las características y el índice de huellas se hacen después
+    con ``flask backfill-features``.
+
+    Returns:
+        list: Cambios aplicados, con el formato de ``pending_schema_changes``
+    """
+    from energia_app.models.energy_data import EnergyData
+
+    pending = pending_schema_changes()
+    if not pending:
+        return []
+    db.create_all()
+    EnergyData.ensure_feature_columns()
+    EnergyData.ensure_fingerprint_column()
+    logger.info(f"Esquema actualizado: {', '.join(pending)}")
+    return pending
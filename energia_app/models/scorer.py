@@ -0,0 +1,145 @@
+"""
+Evaluador lineal compilado en NumPy puro
+
+Pliega la media y la escala del StandardScaler en los coeficientes de la
+regresión lineal y precalcula las características cíclicas por día y hora,
+de modo que una predicción sobre valores crudos
+``(area_edificio, ocupacion, dia_semana, hora_dia)`` es una única expresión
+vectorizada, sin DataFrames ni llamadas a sklearn.
+"""
+
+import numpy as np
+from energia_app.models.preprocess import (
+    DIA_SEMANA_SIN, DIA_SEMANA_COS, HORA_DIA_SIN, HORA_DIA_COS,
+    ES_DIA_LABORAL, ES_HORA_LABORAL, BASE_CONSUMO_HORA, FEATURE_COLUMNS
+)
+
+# Consumo mínimo en kWh (mismo piso que Energy_Model.predict)
+MIN_CONSUMPTION = 0.1
+
+
+def _table_index(values, size, name):
+    """
+    Convierte día u hora en índices de las tablas precalculadas
+
+    Args:
+        values: Valores (escalar o array)
+        size (int): Número de valores posibles (7 días o 24 horas)
+        name (str): Nombre del campo para el mensaje de error
+
+    Returns:
+        ndarray: Índices enteros en [0, size)
+
+    Raises:
+        ValueError: Si algún valor no es entero o está fuera de rango
+    """
+    values = np.asarray(values)
+    if values.dtype.kind not in 'iu':
+        try:
+            numeric = values.astype(np.float64)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} debe ser un entero entre 0 y {size - 1}")
+        with np.errstate(invalid='ignore'):
+            if not np.all(numeric == np.floor(numeric)):
+                raise ValueError(f"{name} debe ser un entero entre 0 y {size - 1}")
+        values = numeric
+    if values.size and (values.min() < 0 or values.max() >= size):
+        raise ValueError(f"{name} fuera de rango: debe estar entre 0 y {size - 1}")
+    return values.astype(np.intp, copy=False)
+
+
+class LinearScorer:
+    """
+    Predictor lineal compilado para valores crudos de entrada.
+
+    La predicción se reduce a::
+
+        y = base[dia, hora] + area * w_area + ocupacion * (w_ocupacion[hora] + w_densidad / area)
+
+    con ``base`` una tabla 7x24 que incluye el intercepto y todos los
+    términos que dependen solo del día y la hora.
+    """
+
+    def __init__(self, coef, intercept, mean, scale, feature_names=None, dtype=np.float64):
+        """
+        Args:
+            coef (array): Coeficientes del modelo sobre características escaladas
+            intercept (float): Intercepto del modelo
+            mean (array): Media del escalador (o None si no centra)
+            scale (array): Escala del escalador (o None si no escala)
+            feature_names (list, optional): Orden de las características
+            dtype: Tipo de coma flotante de las tablas (float64 o float32)
+        """
+        feature_names = list(feature_names) if feature_names is not None else FEATURE_COLUMNS
+        if sorted(feature_names) != sorted(FEATURE_COLUMNS):
+            raise ValueError(f"Características no soportadas por el evaluador compilado: {feature_names}")
+
+        coef = np.asarray(coef, dtype=np.float64).ravel()
+        mean = np.zeros_like(coef) if mean is None else np.asarray(mean, dtype=np.float64)
+        scale = np.ones_like(coef) if scale is None else np.asarray(scale, dtype=np.float64)
+
+        # Plegar el escalador: w·(x - μ)/σ + b = (w/σ)·x + (b - Σ wμ/σ)
+        folded = coef / scale
+        intercept = float(intercept) - float(np.dot(folded, mean))
+        w = dict(zip(feature_names, folded))
+
+        day_term = (w['dia_semana_sin'] * DIA_SEMANA_SIN
+                    + w['dia_semana_cos'] * DIA_SEMANA_COS
+                    + w['es_dia_laboral'] * ES_DIA_LABORAL)
+        hour_term = (w['hora_dia_sin'] * HORA_DIA_SIN
+                     + w['hora_dia_cos'] * HORA_DIA_COS
+                     + w['es_hora_laboral'] * ES_HORA_LABORAL
+                     + w['base_consumo_hora'] * BASE_CONSUMO_HORA)
+
+        self.dtype = np.dtype(dtype)
+        self.base = (intercept + day_term[:, None] + hour_term[None, :]).astype(self.dtype)
+        self.occupancy_by_hour = (w['ocupacion'] + w['ocupacion_hora'] * BASE_CONSUMO_HORA).astype(self.dtype)
+        self.w_area = self.dtype.type(w['area_edificio'])
+        self.w_density = self.dtype.type(w['ocupacion_por_area'])
+        self.floor = self.dtype.type(MIN_CONSUMPTION)
+
+    @classmethod
+    def from_estimator(cls, estimator, scaler, dtype=np.float64):
+        """
+        Compila un evaluador a partir de un estimador lineal y su StandardScaler
+
+        Args:
+            estimator: Estimador lineal ajustado (coef_, intercept_)
+            scaler: StandardScaler ajustado sobre las mismas características
+            dtype: Tipo de coma flotante del evaluador
+
+        Returns:
+            LinearScorer: Evaluador compilado
+        """
+        feature_names = getattr(scaler, 'feature_names_in_', None)
+        if feature_names is None:
+            feature_names = getattr(estimator, 'feature_names_in_', None)
+        return cls(estimator.coef_, estimator.intercept_,
+                   getattr(scaler, 'mean_', None), getattr(scaler, 'scale_', None),
+                   feature_names, dtype)
+
+    def __call__(self, area_edificio, ocupacion, dia_semana, hora_dia):
+        """
+        Predice el consumo para valores crudos (escalares o arrays)
+
+        Args:
+            area_edificio: Área del edificio (m²)
+            ocupacion: Nivel de ocupación
+            dia_semana: Día de la semana, entero 0-6
+            hora_dia: Hora del día, entero 0-23
+
+        Returns:
+            ndarray: Consumo predicho (kWh, siempre >= 0.1)
+
+        Raises:
+            ValueError: Si el día o la hora no son enteros o están fuera de rango
+        """
+        area = np.asarray(area_edificio, dtype=self.dtype)
+        occupancy = np.asarray(ocupacion, dtype=self.dtype)
+        day = _table_index(dia_semana, 7, 'dia_semana')
+        hour = _table_index(hora_dia, 24, 'hora_dia')
+        return np.maximum(
+            self.base[day, hour] + area * self.w_area
+            + occupancy * (self.occupancy_by_hour[hour] + self.w_density / area),
+            self.floor
+        )
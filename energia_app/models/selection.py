@@ -0,0 +1,157 @@
+"""
+Selección de modelo con validación cruzada en paralelo
+
+Cada par (candidato, pliegue) es una tarea independiente que se reparte
+entre los núcleos con joblib. Los candidatos se evalúan por tandas del
+tamaño del número de procesos; antes de lanzar cada tanda se comprueba el
+presupuesto de tiempo, de modo que la selección nunca empieza trabajo que
+no vaya a poder terminar a tiempo y siempre hay al menos un candidato
+evaluado por completo.
+
+El escalador forma parte del candidato (un Pipeline escalador + estimador)
+y se ajusta solo con la parte de entrenamiento de cada pliegue, de modo que
+las medias y varianzas del pliegue de validación no influyen en su puntuación.
+"""
+
+import time
+import logging
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import clone
+from sklearn.linear_model import LinearRegression, Ridge, Lasso, ElasticNet
+from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from sklearn.model_selection import KFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+# Consumo mínimo en kWh (mismo piso que Energy_Model.predict)
+MIN_CONSUMPTION = 0.1
+
+# Métricas admitidas: (función, True si mayor es mejor)
+METRICS = {
+    'r2': (r2_score, True),
+    'rmse': (lambda y_true, y_pred: float(np.sqrt(mean_squared_error(y_true, y_pred))), False),
+    'mse': (mean_squared_error, False),
+    'mae': (mean_absolute_error, False),
+}
+
+
+def default_candidates():
+    """
+    Candidatos por defecto: estimadores lineales compatibles con el paquete
+    de modelo y con el evaluador compilado, de menor a mayor coste
+
+    Returns:
+        list: Estimadores sin ajustar
+    """
+    return [
+        LinearRegression(),
+        Ridge(alpha=0.1),
+        Ridge(alpha=1.0),
+        Ridge(alpha=10.0),
+        Ridge(alpha=100.0),
+        Lasso(alpha=0.01, max_iter=10000),
+        Lasso(alpha=0.1, max_iter=10000),
+        ElasticNet(alpha=0.01, l1_ratio=0.5, max_iter=10000),
+        ElasticNet(alpha=0.1, l1_ratio=0.5, max_iter=10000),
+    ]
+
+
+def describe(estimator):
+    """Nombre legible de un candidato, p.ej. 'Ridge(alpha=10.0)'"""
+    params = estimator.get_params()
+    shown = [f"{key}={params[key]}" for key in ('alpha', 'l1_ratio') if key in params]
+    return f"{type(estimator).__name__}({', '.join(shown)})"
+
+
+def _score_fold(estimator, X, y, train_idx, test_idx, metric):
+    """Ajusta escalador y candidato sobre un pliegue y devuelve la métrica en validación"""
+    scorer = METRICS[metric][0]
+    model = Pipeline([('scaler', StandardScaler()), ('model', clone(estimator))])
+    model.fit(X[train_idx], y[train_idx])
+    y_pred = np.maximum(model.predict(X[test_idx]), MIN_CONSUMPTION)
+    return float(scorer(y[test_idx], y_pred))
+
+
+def select_model(X, y, candidates=None, cv=5, metric='r2', time_budget=None,
+                 n_jobs=-1, random_state=42):
+    """
+    Elige el mejor estimador mediante validación cruzada k-fold en paralelo
+
+    Args:
+        X (DataFrame): Características sin escalar (el escalado se ajusta
+                       dentro de cada pliegue)
+        y (Series): Variable objetivo
+        candidates (list, optional): Estimadores a comparar
+                                     (por defecto ``default_candidates()``)
+        cv (int): Número de pliegues
+        metric (str): Métrica de selección ('r2', 'rmse', 'mse' o 'mae')
+        time_budget (float, optional): Segundos máximos de selección
+        n_jobs (int): Procesos de joblib (-1 para todos los núcleos)
+        random_state (int): Semilla para la partición en pliegues
+
+    Returns:
+        dict: 'estimator' (ganador sin ajustar), 'metric', 'score' (media
+              del ganador), 'results' (media y desviación por candidato
+              evaluado), 'skipped' (candidatos no evaluados por falta de
+              tiempo) y 'elapsed' (segundos)
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Métrica no soportada: {metric}. Opciones: {', '.join(METRICS)}")
+
+    candidates = list(candidates) if candidates is not None else default_candidates()
+    if not candidates:
+        raise ValueError("No hay candidatos para la selección de modelo")
+
+    X_values = np.asarray(X, dtype=np.float64)
+    y_values = np.asarray(y, dtype=np.float64)
+    folds = list(KFold(n_splits=min(cv, len(y_values)), shuffle=True,
+                       random_state=random_state).split(X_values))
+
+    greater_is_better = METRICS[metric][1]
+    workers = effective_n_jobs(n_jobs)
+    # Al menos una tanda completa de pliegues por tanda de candidatos
+    batch_size = max(1, workers // len(folds))
+
+    start = time.perf_counter()
+    results = []
+    skipped = []
+    with Parallel(n_jobs=n_jobs) as parallel:
+        for offset in range(0, len(candidates), batch_size):
+            batch = candidates[offset:offset + batch_size]
+            elapsed = time.perf_counter() - start
+            if results and time_budget is not None and elapsed >= time_budget:
+                skipped.extend(describe(estimator) for estimator in batch)
+                continue
+
+            scores = parallel(
+                delayed(_score_fold)(estimator, X_values, y_values, train_idx, test_idx, metric)
+                for estimator in batch
+                for train_idx, test_idx in folds
+            )
+            for i, estimator in enumerate(batch):
+                fold_scores = np.asarray(scores[i * len(folds):(i + 1) * len(folds)])
+                results.append({
+                    'name': describe(estimator),
+                    'estimator': estimator,
+                    'mean': float(fold_scores.mean()),
+                    'std': float(fold_scores.std())
+                })
+
+    best = (max if greater_is_better else min)(results, key=lambda result: result['mean'])
+    elapsed = time.perf_counter() - start
+    if skipped:
+        logger.warning(f"Presupuesto de tiempo agotado: {len(skipped)} candidatos sin evaluar")
+    logger.info(f"Modelo seleccionado: {best['name']} ({metric}={best['mean']:.4f}) en {elapsed:.2f}s")
+
+    return {
+        'estimator': clone(best['estimator']),
+        'metric': metric,
+        'score': best['mean'],
+        'results': [{key: value for key, value in result.items() if key != 'estimator'}
+                    for result in results],
+        'skipped': skipped,
+        'elapsed': elapsed
+    }
@@ -0,0 +1,321 @@
+"""
+Instantánea columnar de los datos de entrenamiento
+
+Cada columna de EnergyData usada para entrenar se guarda como un archivo
+binario plano (``<columna>.bin``) al que solo se añaden filas. El número de
+filas válidas vive en ``meta.json``, que se reescribe de forma atómica
+después de cada escritura: un lector nunca ve filas a medio escribir y una
+escritura interrumpida solo deja bytes sobrantes al final, que se ignoran
+y se sobrescriben en la siguiente escritura.
+
+La lectura usa ``np.memmap``, sin hidratar objetos del ORM. Si la
+instantánea no coincide con la base de datos (p.ej. tras un fallo entre el
+commit y la escritura) ``EnergyData.export_to_df`` vuelve a la consulta
+ORM; ``flask rebuild-snapshot`` la reconstruye desde cero.
+"""
+
+import os
+import json
+import threading
+import logging
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from energia_app.models.bundle import atomic_write
+from energia_app.models.preprocess import DERIVED_FEATURE_COLUMNS, refresh_stale_features
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se sincronizan los hilos del proceso
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'snapshot')
+
+# Versión del formato de la instantánea
+# 2: añade las características derivadas materializadas y su versión
+SNAPSHOT_FORMAT_VERSION = 2
+
+RAW_COLUMNS = ['area_edificio', 'ocupacion', 'dia_semana', 'hora_dia', 'consumo_energetico']
+
+# Columnas y tipos (building_id nulo se guarda como -1, feature_version nula como 0)
+SNAPSHOT_COLUMNS = {
+    'area_edificio': np.dtype('<f8'),
+    'ocupacion': np.dtype('<i8'),
+    'dia_semana': np.dtype('<i8'),
+    'hora_dia': np.dtype('<i8'),
+    'consumo_energetico': np.dtype('<f8'),
+    'building_id': np.dtype('<i8'),
+    **{name: np.dtype('<f8') for name in DERIVED_FEATURE_COLUMNS},
+    'feature_version': np.dtype('<i8'),
+}
+
+NULL_BUILDING = -1
+
+
+class TrainingSnapshot:
+    """
+    Columnas de entrenamiento en archivos binarios de solo añadido.
+
+    Attributes:
+        directory (str): Directorio de la instantánea
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    @property
+    def meta_path(self):
+        return os.path.join(self.directory, 'meta.json')
+
+    def column_path(self, name):
+        """Ruta del archivo binario de una columna"""
+        return os.path.join(self.directory, f'{name}.bin')
+
+    def read_meta(self):
+        """
+        Lee los metadatos de la instantánea
+
+        Returns:
+            dict: rows (filas válidas), last_id (mayor ID incluido) y
+                  format_version; None si no existe o es de otra versión
+        """
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            return None
+        return meta
+
+    def _write_meta(self, rows, last_id):
+        meta = {'format_version': SNAPSHOT_FORMAT_VERSION, 'rows': int(rows), 'last_id': int(last_id)}
+        atomic_write(self.meta_path, lambda f: f.write(json.dumps(meta).encode('utf-8')))
+
+    @contextmanager
+    def _exclusive(self):
+        """Bloqueo entre hilos y, si el sistema lo permite, entre procesos"""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _columns_from_frame(df):
+        """Convierte un DataFrame con las columnas de EnergyData en arrays tipados"""
+        columns = {}
+        for name, dtype in SNAPSHOT_COLUMNS.items():
+            if name in RAW_COLUMNS:
+                values = df[name]
+            else:
+                values = df[name] if name in df.columns else pd.Series(np.nan, index=df.index)
+                values = pd.to_numeric(values, errors='coerce')
+                if name == 'building_id':
+                    values = values.fillna(NULL_BUILDING)
+                elif name == 'feature_version':
+                    values = values.fillna(0)
+            columns[name] = np.ascontiguousarray(values.to_numpy(), dtype=dtype)
+        return columns
+
+    def append(self, df):
+        """
+        Añade filas ya confirmadas en la base de datos
+
+        Las filas con ID menor o igual que el último incluido se ignoran, de
+        modo que una reconstrucción concurrente no produce duplicados.
+
+        Args:
+            df (DataFrame): Filas nuevas con 'id' y las columnas de SNAPSHOT_COLUMNS
+
+        Returns:
+            bool: True si se añadieron; False si la instantánea no existe o
+                  falló la escritura (queda desincronizada hasta reconstruirla)
+        """
+        if df is None or len(df) == 0:
+            return True
+        try:
+            with self._exclusive():
+                meta = self.read_meta()
+                if meta is None:
+                    return False
+                df = df[df['id'] > meta['last_id']].sort_values('id')
+                if len(df) == 0:
+                    return True
+                columns = self._columns_from_frame(df)
+                for name, dtype in SNAPSHOT_COLUMNS.items():
+                    with open(self.column_path(name), 'r+b' if os.path.exists(self.column_path(name)) else 'wb') as f:
+                        # Descartar bytes sobrantes de una escritura interrumpida
+                        f.truncate(meta['rows'] * dtype.itemsize)
+                        f.seek(0, os.SEEK_END)
+                        f.write(columns[name].tobytes())
+                        f.flush()
+                        os.fsync(f.fileno())
+                self._write_meta(meta['rows'] + len(df), int(df['id'].iloc[-1]))
+            return True
+        except Exception as e:
+            logger.error(f"Error al añadir filas a la instantánea de entrenamiento: {str(e)}")
+            return False
+
+    @staticmethod
+    def frame_from_records(records):
+        """
+        Columnas de la instantánea a partir de objetos EnergyData con ID asignado
+
+        Args:
+            records (list): Registros EnergyData (tras flush o commit)
+
+        Returns:
+            DataFrame: Filas listas para ``append``
+        """
+        return pd.DataFrame({
+            'id': [r.id for r in records],
+            'area_edificio': [r.area_edificio for r in records],
+            'ocupacion': [r.ocupacion for r in records],
+            'dia_semana': [r.dia_semana for r in records],
+            'hora_dia': [r.hora_dia for r in records],
+            'consumo_energetico': [r.consumo_energetico for r in records],
+            'building_id': [r.building_id for r in records],
+            **{name: [getattr(r, name) for r in records] for name in DERIVED_FEATURE_COLUMNS},
+            'feature_version': [r.feature_version for r in records],
+        }).astype({name: np.float64 for name in DERIVED_FEATURE_COLUMNS})
+
+    def append_records(self, records):
+        """
+        Añade objetos EnergyData recién guardados (con ID asignado)
+
+        Args:
+            records (list): Registros EnergyData confirmados
+
+        Returns:
+            bool: True si se añadieron
+        """
+        if not records:
+            return True
+        return self.append(self.frame_from_records(records))
+
+    def rebuild(self, chunks):
+        """
+        Reconstruye la instantánea completa
+
+        Args:
+            chunks (iterable): DataFrames con las columnas de SNAPSHOT_COLUMNS
+                               y 'id', en orden
+
+        Returns:
+            int: Número de filas escritas
+        """
+        with self._exclusive():
+            # Invalidar primero: los lectores vuelven a la base de datos
+            if os.path.exists(self.meta_path):
+                os.remove(self.meta_path)
+            files = {name: open(self.column_path(name) + '.tmp', 'wb') for name in SNAPSHOT_COLUMNS}
+            rows = 0
+            last_id = 0
+            try:
+                for chunk in chunks:
+                    if len(chunk) == 0:
+                        continue
+                    columns = self._columns_from_frame(chunk)
+                    for name, f in files.items():
+                        f.write(columns[name].tobytes())
+                    rows += len(chunk)
+                    last_id = max(last_id, int(chunk['id'].max()))
+                for f in files.values():
+                    f.flush()
+                    os.fsync(f.fileno())
+            finally:
+                for f in files.values():
+                    f.close()
+            for name in SNAPSHOT_COLUMNS:
+                os.replace(self.column_path(name) + '.tmp', self.column_path(name))
+            self._write_meta(rows, last_id)
+        logger.info(f"Instantánea de entrenamiento reconstruida: {rows} filas")
+        return rows
+
+    def clear(self):
+        """Deja la instantánea vacía (p.ej. al eliminar todos los registros)"""
+        with self._exclusive():
+            for name in SNAPSHOT_COLUMNS:
+                if os.path.exists(self.column_path(name)):
+                    os.remove(self.column_path(name))
+            self._write_meta(0, 0)
+
+    def columns(self):
+        """
+        Columnas de la instantánea mapeadas en memoria (solo lectura)
+
+        Returns:
+            dict: Array por columna, o None si no hay instantánea válida
+        """
+        meta = self.read_meta()
+        if meta is None:
+            return None
+        rows = meta['rows']
+        columns = {}
+        for name, dtype in SNAPSHOT_COLUMNS.items():
+            if rows == 0:
+                columns[name] = np.empty(0, dtype=dtype)
+                continue
+            path = self.column_path(name)
+            if not os.path.exists(path) or os.path.getsize(path) < rows * dtype.itemsize:
+                logger.warning(f"Instantánea de entrenamiento incompleta: {path}")
+                return None
+            columns[name] = np.memmap(path, dtype=dtype, mode='r', shape=(rows,))
+        return columns
+
+    def is_current(self, rows, last_id):
+        """
+        Comprueba si la instantánea coincide con la base de datos
+
+        Args:
+            rows (int): Número de filas de EnergyData
+            last_id (int): Mayor ID de EnergyData (0 si está vacía)
+
+        Returns:
+            bool: True si la instantánea tiene exactamente esas filas
+        """
+        meta = self.read_meta()
+        return meta is not None and meta['rows'] == rows and meta['last_id'] == last_id
+
+    def to_frame(self, include_building=False, include_features=False):
+        """
+        Construye el DataFrame de entrenamiento desde la instantánea
+
+        Args:
+            include_building (bool): Incluir la columna building_id
+            include_features (bool): Incluir las características derivadas
+                (las filas de otra versión se recalculan en memoria)
+
+        Returns:
+            DataFrame: Datos de entrenamiento o None si la instantánea no es válida
+        """
+        columns = self.columns()
+        if columns is None:
+            return None
+
+        data = {name: columns[name] for name in RAW_COLUMNS}
+        if include_building:
+            building_id = columns['building_id'].astype(np.float64)
+            building_id[building_id == NULL_BUILDING] = np.nan
+            data['building_id'] = building_id
+        if include_features:
+            data.update({name: columns[name] for name in DERIVED_FEATURE_COLUMNS})
+            data['feature_version'] = columns['feature_version']
+        df = pd.DataFrame(data)
+        if include_features:
+            df = refresh_stale_features(df).drop(columns='feature_version')
+        return df
+
+
+# Instancia única por proceso
+training_snapshot = TrainingSnapshot()
@@ -0,0 +1,149 @@
+"""
+Estadísticos suficientes para actualizar el modelo lineal de forma incremental
+
+Se guardan el número de filas, las medias y la matriz de co-momentos
+centrados de ``[X, y]`` (equivalente a XᵀX y Xᵀy, pero numéricamente
+estable). Al incorporar un lote nuevo solo se recorren sus filas y se
+combinan los estadísticos con la fórmula de Chan et al.; después se
+resuelven las ecuaciones normales sobre las características estandarizadas.
+"""
+
+import numpy as np
+
+
+class SufficientStatistics:
+    """
+    Estadísticos suficientes de una regresión lineal con StandardScaler.
+
+    Attributes:
+        count (int): Número de filas acumuladas
+        mean (ndarray): Medias de las características y, en la última
+                        posición, de la variable objetivo
+        comoment (ndarray): Σ (a - μ)(a - μ)ᵀ con a = [x, y]
+    """
+
+    def __init__(self, n_features, count=0, mean=None, comoment=None):
+        size = n_features + 1
+        self.n_features = n_features
+        self.count = int(count)
+        self.mean = np.zeros(size) if mean is None else np.array(mean, dtype=np.float64)
+        self.comoment = np.zeros((size, size)) if comoment is None else np.array(comoment, dtype=np.float64)
+
+    @classmethod
+    def from_arrays(cls, X, y):
+        """
+        Calcula los estadísticos de un conjunto de filas
+
+        Args:
+            X (array): Características sin escalar (n_filas, n_características)
+            y (array): Variable objetivo
+
+        Returns:
+            SufficientStatistics: Estadísticos del lote
+        """
+        X = np.asarray(X, dtype=np.float64)
+        stats = cls(X.shape[1])
+        return stats.update(X, y)
+
+    def copy(self):
+        """Devuelve una copia independiente"""
+        return SufficientStatistics(self.n_features, self.count, self.mean, self.comoment)
+
+    def update(self, X, y):
+        """
+        Incorpora un lote de filas
+
+        Args:
+            X (array): Características sin escalar (n_filas, n_características)
+            y (array): Variable objetivo
+
+        Returns:
+            SufficientStatistics: self, para encadenar llamadas
+        """
+        data = np.column_stack([np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64)])
+        n_batch = data.shape[0]
+        if n_batch == 0:
+            return self
+
+        mean_batch = data.mean(axis=0)
+        centered = data - mean_batch
+        return self.merge(SufficientStatistics(self.n_features, n_batch, mean_batch, centered.T @ centered))
+
+    def merge(self, other):
+        """
+        Combina los estadísticos de otro conjunto de filas (mismas características)
+
+        Args:
+            other (SufficientStatistics): Estadísticos a incorporar
+
+        Returns:
+            SufficientStatistics: self, para encadenar llamadas
+        """
+        if other.n_features != self.n_features:
+            raise ValueError("Los estadísticos tienen un número distinto de características")
+        if other.count == 0:
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (self.count * other.count / total)
+        self.mean = self.mean + delta * (other.count / total)
+        self.count = total
+        return self
+
+    @property
+    def feature_mean(self):
+        """Media de las características (como StandardScaler.mean_)"""
+        return self.mean[:-1]
+
+    @property
+    def feature_var(self):
+        """Varianza poblacional de las características (como StandardScaler.var_)"""
+        return np.diag(self.comoment)[:-1] / self.count
+
+    @property
+    def feature_scale(self):
+        """Desviación típica con ceros sustituidos por 1 (como StandardScaler.scale_)"""
+        scale = np.sqrt(self.feature_var)
+        scale[scale < 10 * np.finfo(scale.dtype).eps] = 1.0
+        return scale
+
+    def solve(self, alpha=0.0):
+        """
+        Resuelve la regresión sobre características estandarizadas
+
+        Args:
+            alpha (float): Regularización L2 (0 para mínimos cuadrados ordinarios)
+
+        Returns:
+            dict: coef, intercept, mean, scale, var y métricas de ajuste
+                  (mse, rmse, r2) sobre las filas acumuladas
+        """
+        if self.count < 2:
+            raise ValueError("No hay suficientes filas para resolver el modelo")
+
+        scale = self.feature_scale
+        sxx = self.comoment[:-1, :-1] / np.outer(scale, scale)
+        sxy = self.comoment[:-1, -1] / scale
+        syy = self.comoment[-1, -1]
+
+        if alpha > 0:
+            coef = np.linalg.solve(sxx + alpha * np.eye(self.n_features), sxy)
+        else:
+            coef = np.linalg.lstsq(sxx, sxy, rcond=None)[0]
+
+        # Las características estandarizadas tienen media 0: el intercepto es la media de y
+        intercept = float(self.mean[-1])
+
+        sse = max(float(syy - 2 * coef @ sxy + coef @ sxx @ coef), 0.0)
+        mse = sse / self.count
+        return {
+            'coef': coef,
+            'intercept': intercept,
+            'mean': self.feature_mean.copy(),
+            'scale': scale,
+            'var': self.feature_var,
+            'mse': mse,
+            'rmse': float(np.sqrt(mse)),
+            'r2': 1 - sse / syy if syy > 0 else 0.0
+        }
@@ -0,0 +1,69 @@
+import json
+from datetime import datetime
+from energia_app.models.user import db
+
+
+class TrainingJob(db.Model):
+    """
+    Trabajo de reentrenamiento (o de recálculo de características) en segundo plano
+
+    El estado se guarda en la base de datos para que cualquier proceso web
+    pueda consultarlo y para que solo haya un trabajo activo entre todos los
+    workers.
+    """
+    __tablename__ = 'training_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 en hexadecimal
+    mode = db.Column(db.String(20), nullable=False)  # full, incremental, backfill
+    select_model = db.Column(db.Boolean, default=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)  # waiting, queued, running, completed, failed
+    stage = db.Column(db.String(100), default='en cola')
+    progress = db.Column(db.Integer, default=0)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    worker = db.Column(db.String(100))  # host:pid del proceso que ejecuta el trabajo
+
+    # Métricas del modelo resultante (JSON) y error del trabajo
+    _metrics = db.Column('metrics', db.Text)
+    error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    user = db.relationship('User', backref='training_jobs')
+
+    ACTIVE_STATUSES = ('queued', 'running')
+
+    # Reentrenamiento completo pendiente de que termine el trabajo activo
+    WAITING_STATUS = 'waiting'
+
+    def __repr__(self):
+        return f'<TrainingJob {self.id} {self.mode} {self.status}>'
+
+    @property
+    def metrics(self):
+        return json.loads(self._metrics) if self._metrics else None
+
+    @metrics.setter
+    def metrics(self, value):
+        self._metrics = json.dumps(value) if value is not None else None
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'mode': self.mode,
+            'select': bool(self.select_model),
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'user_id': self.user_id,
+            'created_at': self.created_at.isoformat(timespec='seconds') if self.created_at else None,
+            'started_at': self.started_at.isoformat(timespec='seconds') if self.started_at else None,
+            'finished_at': self.finished_at.isoformat(timespec='seconds') if self.finished_at else None,
+            'metrics': self.metrics,
+            'error': self.error
+        }
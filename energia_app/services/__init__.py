@@ -16,6 +16,8 @@ def init_services(app):
         from .email_service import EmailService
         from .encryption_service import EncryptionService, JWTService, SecurityAuditService
         from .support_service import SupportService
+        from .training_service import TrainingService
+        from .ingestion_service import IngestionService
         
         # Configurar servicios principales
         email_service = EmailService(app)
@@ -26,7 +28,9 @@ def init_services(app):
             'encryption': encryption_service,
             'jwt': JWTService(),
             'security_audit': SecurityAuditService(),
-            'support': SupportService()
+            'support': SupportService(),
+            'training': TrainingService(app),
+            'ingestion': IngestionService(app)
         }
         
         # Inicializar el servicio de email en el contexto de la aplicación
@@ -76,15 +80,19 @@ def get_service(name):
 def register_services_blueprints(app):
     """Registra blueprints relacionados con servicios si es necesario"""
     from energia_app.api import support_routes  # Importación relativa
+    from energia_app.api import prediction_routes
     
     # Registrar blueprints de servicios
     app.register_blueprint(support_routes.support_bp)
+    app.register_blueprint(prediction_routes.prediction_api_bp)
     logger.info("Blueprints de servicios registrados")
 
 # Exportar clases principales para acceso directo
 from .email_service import EmailService
 from .encryption_service import EncryptionService, JWTService, SecurityAuditService
 from .support_service import SupportService
+from .training_service import TrainingService
+from .ingestion_service import IngestionService
 
 __all__ = [
     'init_services',
@@ -94,5 +102,7 @@ __all__ = [
     'EncryptionService',
     'JWTService',
     'SecurityAuditService',
-    'SupportService'
+    'SupportService',
+    'TrainingService',
+    'IngestionService'
 ]
\ No newline at end of file
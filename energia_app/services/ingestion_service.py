@@ -0,0 +1,176 @@
+import os
+import time
+import socket
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    """Identificador del proceso que ejecuta los trabajos (host:pid)"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class IngestionService:
+    """
+    Servicio para importar archivos CSV en segundo plano
+
+    La petición solo guarda los archivos en disco y registra un IngestionJob;
+    un grupo pequeño de hilos (INGESTION_WORKERS) procesa la cola por
+    bloques y actualiza el progreso en la base de datos tras cada commit.
+    Con varios archivos (o un ZIP) la lectura se reparte entre
+    INGESTION_PARSE_WORKERS procesos.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Inicializar el servicio con la aplicación Flask"""
+        self.app = app
+        self._executor = ThreadPoolExecutor(max_workers=max(1, app.config.get('INGESTION_WORKERS', 1)),
+                                            thread_name_prefix='ingestion')
+
+    def submit(self, files, filename, user_id=None, retrain=False):
+        """
+        Registra y encola la ingesta de archivos ya guardados en disco
+
+        Args:
+            files (str | list): Ruta de un CSV, o pares (nombre, ruta) de
+                                CSV y ZIP (se eliminan al terminar el trabajo)
+            filename (str): Nombre mostrado del trabajo
+            user_id (int, optional): Usuario que sube los archivos
+            retrain (bool): Encolar un reentrenamiento incremental con las
+                            filas importadas al terminar
+
+        Returns:
+            dict: Estado del trabajo creado
+        """
+        from energia_app.models.user import db
+        from energia_app.models.ingestion import IngestionJob
+
+        if isinstance(files, str):
+            files = [(filename, files)]
+        job = IngestionJob(filename=filename[:255], user_id=user_id, retrain=bool(retrain),
+                           bytes_total=sum(os.path.getsize(path) for _, path in files), worker=worker_name())
+        db.session.add(job)
+        db.session.commit()
+
+        self._executor.submit(self._run, job.id, list(files))
+        logger.info(f"Ingesta encolada: trabajo {job.id} ({filename})")
+        return job.to_dict()
+
+    def _run(self, job_id, files):
+        """Procesa los archivos dentro del contexto de la aplicación"""
+        from energia_app.models.user import db
+        from energia_app.models.ingestion import IngestionJob
+        from energia_app.utils.ingestion import expand_archives, ingest_csv, ingest_files
+        from energia_app.services import get_service
+        from energia_app.services.training_service import NewRowsStatistics
+
+        with self.app.app_context():
+            job = db.session.get(IngestionJob, job_id)
+            job.status = 'running'
+            job.started_at = datetime.now()
+            db.session.commit()
+            started = time.perf_counter()
+            # Estadísticos de las filas confirmadas, para el reentrenamiento incremental
+            # o para mantener al día los del modelo publicado
+            new_rows = NewRowsStatistics()
+
+            def record(entry, bytes_done):
+                # Cada bloque o archivo ya está confirmado: publicar el progreso
+                job.bytes_done = bytes_done
+                job.rows_done += entry['rows']
+                job.rows_imported += entry['imported']
+                job.rows_rejected += entry['rejected']
+                job.chunks_done += 1
+                job.chunks_failed += int(entry['failed'])
+                job.add_errors(entry['chunk'], entry['errors'])
+                job.rows_per_second = job.rows_done / max(time.perf_counter() - started, 1e-9)
+                db.session.commit()
+
+            try:
+                # Los ZIP se sustituyen por sus CSV (el progreso pasa a contar bytes sin comprimir)
+                files = expand_archives(files, self.app.config['INGESTION_SPOOL_FOLDER'])
+                job.bytes_total = sum(os.path.getsize(path) for _, path in files)
+                db.session.commit()
+
+                if len(files) == 1:
+                    # Un solo CSV: lectura por bloques, sin cargarlo entero en memoria
+                    with open(files[0][1], 'rb') as f:
+                        ingest_csv(f, chunk_rows=self.app.config.get('STREAM_CHUNK_ROWS', 50000),
+                                   on_chunk=lambda entry: record(entry, f.tell()), on_commit=new_rows,
+                                   source_name=files[0][0])
+                else:
+                    done = [0]
+
+                    def on_file(entry):
+                        done[0] += entry['bytes']
+                        record(entry, done[0])
+
+                    ingest_files(files, workers=self.app.config.get('INGESTION_PARSE_WORKERS') or None,
+                                 on_file=on_file, on_commit=new_rows)
+
+                job.status = 'completed'
+                if job.retrain and new_rows.changed:
+                    retrain_job, _ = get_service('training').submit_new_rows(new_rows, user_id=job.user_id)
+                    job.retrain_job_id = retrain_job['id']
+                elif new_rows.changed:
+                    get_service('training').fold_new_rows(new_rows, user_id=job.user_id)
+                logger.info(f"Ingesta {job_id} completada: {job.rows_imported} registros importados, "
+                            f"{job.rows_rejected} rechazados")
+            except Exception as e:
+                db.session.rollback()
+                job = db.session.get(IngestionJob, job_id)
+                job.status = 'failed'
+                job.error = str(e)
+                logger.error(f"Error en la ingesta {job_id}: {str(e)}")
+            finally:
+                job.finished_at = datetime.now()
+                db.session.commit()
+                db.session.remove()
+                for _, path in files:
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    @staticmethod
+    def recover_interrupted():
+        """
+        Marca como fallidos los trabajos de procesos de este host que ya no existen
+
+        Los trabajos de otros procesos vivos (p.ej. otros workers de gunicorn)
+        no se tocan.
+
+        Returns:
+            int: Trabajos marcados
+        """
+        from energia_app.models.user import db
+        from energia_app.models.ingestion import IngestionJob
+
+        hostname = socket.gethostname()
+        interrupted = []
+        for job in IngestionJob.query.filter(IngestionJob.status.in_(('queued', 'running'))).all():
+            host, _, pid = (job.worker or '').rpartition(':')
+            if host == hostname and pid.isdigit() and not _process_alive(int(pid)):
+                job.status = 'failed'
+                job.error = 'Trabajo interrumpido: el proceso que lo ejecutaba terminó'
+                job.finished_at = datetime.now()
+                interrupted.append(job)
+        db.session.commit()
+        return len(interrupted)
@@ -0,0 +1,513 @@
+import os
+import socket
+import logging
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from energia_app.services.ingestion_service import worker_name, _process_alive
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos (servidor de desarrollo)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Archivos de bloqueo en el directorio de modelos: uno mientras se entrena y
+# publica el modelo y otro, breve, para registrar trabajos sin duplicarlos
+TRAINING_LOCK_NAME = '.training.lock'
+SUBMIT_LOCK_NAME = '.training-submit.lock'
+
+
+def _to_json(value):
+    """Convierte métricas con tipos de NumPy a tipos serializables en JSON"""
+    if isinstance(value, dict):
+        return {key: _to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return value
+
+
+class NewRowsStatistics:
+    """
+    Acumula, bloque a bloque, los estadísticos suficientes de las filas
+    confirmadas en una ingesta y los edificios afectados
+
+    Se pasa como ``on_commit`` a la ingesta y después a ``submit_new_rows``
+    o ``fold_new_rows``, de modo que el reentrenamiento incremental no
+    necesita guardar las filas. Si la base de datos no indica qué filas de
+    un bloque se insertaron (``rows`` es None), los estadísticos dejan de
+    ser exactos y solo sirve un reentrenamiento completo.
+    """
+
+    def __init__(self):
+        from energia_app.models.preprocess import FEATURE_COLUMNS
+        from energia_app.models.statistics import SufficientStatistics
+
+        self.statistics = SufficientStatistics(len(FEATURE_COLUMNS))
+        self.building_ids = set()
+        self.exact = True
+
+    def __call__(self, rows):
+        from energia_app.models.preprocess import FEATURE_COLUMNS
+
+        if rows is None:
+            self.exact = False
+            return
+        if not len(rows):
+            return
+        self.statistics.update(rows[FEATURE_COLUMNS].to_numpy(dtype=np.float64),
+                               rows['consumo_energetico'].to_numpy(dtype=np.float64))
+        self.building_ids.update(int(building_id) for building_id in rows['building_id'].dropna().unique())
+
+    def __len__(self):
+        return self.statistics.count
+
+    @property
+    def changed(self):
+        """True si se confirmó alguna fila (o no se sabe cuántas)"""
+        return len(self) > 0 or not self.exact
+
+
+@contextmanager
+def file_lock(path, blocking=True):
+    """
+    Bloqueo exclusivo entre procesos del mismo host con ``fcntl.flock``
+
+    Args:
+        path (str): Archivo de bloqueo (se crea si no existe)
+        blocking (bool): Esperar a que el bloqueo quede libre
+
+    Yields:
+        bool: True si se tiene el bloqueo (False solo sin ``blocking``)
+    """
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class TrainingService:
+    """
+    Servicio para reentrenar el modelo en segundo plano, un trabajo a la vez
+
+    Los trabajos se guardan en la tabla training_jobs, de modo que su estado
+    es visible desde cualquier worker y solo hay un trabajo activo entre
+    todos ellos. El ajuste y la publicación del modelo se hacen con un
+    bloqueo de archivo en MODEL_DIR para que dos procesos no sobrescriban
+    los artefactos a la vez.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='retrain')
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Inicializar el servicio con la aplicación Flask"""
+        self.app = app
+
+    def submit(self, mode='full', data=None, user_id=None, select=None, building_ids=None, follow_up=False):
+        """
+        Encola un reentrenamiento si no hay otro en curso
+
+        En modo incremental, si el modelo actual no lo admite (p.ej. su
+        estimador no está en INCREMENTAL_ESTIMATORS) se reentrena con todos
+        los datos.
+
+        Args:
+            mode (str): 'full' para reentrenar con todos los datos o
+                        'incremental' para incorporar solo ``data``
+            data (DataFrame | SufficientStatistics, optional): Registros nuevos
+                o sus estadísticos (modo incremental)
+            user_id (int, optional): Usuario que solicita el trabajo
+            select (bool, optional): Elegir el estimador por validación
+                cruzada en el reentrenamiento completo (por defecto
+                MODEL_SELECTION_ENABLED)
+            building_ids (set, optional): Edificios con registros nuevos (por
+                defecto, los de la columna building_id de ``data``)
+            follow_up (bool): Si hay un reentrenamiento en curso, dejar
+                pendiente un reentrenamiento completo a continuación
+
+        Returns:
+            tuple: (job, created) donde job es el estado del trabajo y created
+                   es False si ya había un reentrenamiento en curso (job es
+                   entonces el activo o, con ``follow_up``, el pendiente)
+        """
+        if mode not in ('full', 'incremental'):
+            raise ValueError(f"Modo de reentrenamiento no válido: {mode}")
+        if select is None:
+            select = self.app.config.get('MODEL_SELECTION_ENABLED', False)
+
+        job, created = self._create_job(mode, user_id, select, follow_up=follow_up)
+        if created:
+            if job['mode'] != mode:
+                # Se ha retomado un reentrenamiento completo pendiente, que ya incluye estas filas
+                mode, data, select, building_ids = job['mode'], None, job['select'], None
+            self._executor.submit(self._run, job['id'], mode, data, select, building_ids)
+            logger.info(f"Reentrenamiento {mode} encolado: {job['id']}")
+        return job, created
+
+    def submit_new_rows(self, new_rows, user_id=None):
+        """
+        Encola la incorporación incremental de las filas de una ingesta
+
+        Si ya hay un reentrenamiento en curso, las filas no se pierden: se
+        deja pendiente un reentrenamiento completo que empieza al terminar
+        el activo (y que ya las incluye), y se devuelve ese trabajo.
+
+        Args:
+            new_rows (NewRowsStatistics): Filas confirmadas en la ingesta
+            user_id (int, optional): Usuario que solicita el trabajo
+
+        Returns:
+            tuple: (job, created) como en ``submit``
+        """
+        if not new_rows.exact:
+            return self.submit('full', user_id=user_id, follow_up=True)
+        return self.submit('incremental', data=new_rows.statistics, user_id=user_id,
+                           building_ids=set(new_rows.building_ids), follow_up=True)
+
+    def fold_new_rows(self, new_rows, user_id=None):
+        """
+        Añade a los estadísticos del modelo publicado filas guardadas sin reentrenar
+
+        Se usa con las altas manuales y las ingestas sin reentrenamiento para
+        que la próxima actualización incremental incluya esos registros. Si
+        hay un reentrenamiento en curso (que puede incluirlas o no) se deja
+        pendiente uno completo.
+
+        Args:
+            new_rows (NewRowsStatistics): Filas confirmadas
+            user_id (int, optional): Usuario que guardó las filas
+
+        Returns:
+            bool: True si los estadísticos quedan al día sin reentrenar
+        """
+        if not new_rows.changed:
+            return True
+        if not new_rows.exact:
+            # Sin saber qué filas se insertaron, el próximo reentrenamiento debe ser completo
+            return self._change_statistics(lambda statistics: None, user_id)
+        return self._change_statistics(lambda statistics: statistics.copy().merge(new_rows.statistics), user_id)
+
+    def reset_statistics(self, user_id=None):
+        """
+        Vacía los estadísticos del modelo publicado (al eliminar todos los registros)
+
+        Args:
+            user_id (int, optional): Usuario que eliminó los registros
+
+        Returns:
+            bool: True si los estadísticos quedan al día sin reentrenar
+        """
+        from energia_app.models.statistics import SufficientStatistics
+
+        return self._change_statistics(lambda statistics: SufficientStatistics(statistics.n_features), user_id)
+
+    def _change_statistics(self, change, user_id=None):
+        """Aplica ``change`` a los estadísticos publicados si no se está entrenando"""
+        from energia_app.models.model import Energy_Model
+
+        with file_lock(self._lock_path(TRAINING_LOCK_NAME), blocking=False) as acquired:
+            if acquired:
+                model = Energy_Model()
+                if model.bundle is not None and model.bundle.statistics is not None:
+                    model.replace_statistics(change(model.bundle.statistics))
+                return True
+
+        logger.warning("Reentrenamiento en curso: los estadísticos del modelo se recalcularán "
+                       "con un reentrenamiento completo")
+        self.submit('full', user_id=user_id, follow_up=True)
+        return False
+
+    def submit_backfill(self, user_id=None):
+        """
+        Encola el recálculo de las características materializadas de EnergyData
+
+        Comparte la cola con los reentrenamientos para no entrenar mientras
+        las características se están actualizando.
+
+        Args:
+            user_id (int, optional): Usuario que solicita el trabajo
+
+        Returns:
+            tuple: (job, created) como en ``submit``
+        """
+        job, created = self._create_job('backfill', user_id, False)
+        if created:
+            self._executor.submit(self._run_backfill, job['id'])
+            logger.info(f"Recálculo de características encolado: {job['id']}")
+        return job, created
+
+    @staticmethod
+    def _lock_path(name):
+        from energia_app.models.registry import MODEL_DIR
+        return os.path.join(MODEL_DIR, name)
+
+    def _create_job(self, mode, user_id, select, follow_up=False):
+        """
+        Registra un trabajo nuevo salvo que ya haya uno en curso en algún worker
+
+        Con un trabajo activo y ``follow_up`` se registra (una sola vez) un
+        reentrenamiento completo pendiente. Sin trabajo activo, un
+        reentrenamiento pendiente se retoma en lugar de crear otro.
+        """
+        from energia_app.models.user import db
+        from energia_app.models.training import TrainingJob
+
+        with file_lock(self._lock_path(SUBMIT_LOCK_NAME)):
+            self.recover_interrupted()
+            active = TrainingJob.query.filter(TrainingJob.status.in_(TrainingJob.ACTIVE_STATUSES)) \
+                .order_by(TrainingJob.created_at.desc()).first()
+            waiting = TrainingJob.query.filter_by(status=TrainingJob.WAITING_STATUS) \
+                .order_by(TrainingJob.created_at).first()
+            if active is not None:
+                if not follow_up:
+                    return active.to_dict(), False
+                if waiting is None:
+                    waiting = TrainingJob(id=uuid.uuid4().hex, mode='full', select_model=bool(select),
+                                          user_id=user_id, status=TrainingJob.WAITING_STATUS,
+                                          stage='a la espera del trabajo en curso')
+                    db.session.add(waiting)
+                    db.session.commit()
+                logger.warning(f"Reentrenamiento {active.id} en curso: los registros nuevos se incorporarán "
+                               f"con el reentrenamiento completo {waiting.id} al terminar")
+                return waiting.to_dict(), False
+
+            if waiting is not None and mode != 'backfill':
+                self._queue_waiting(waiting)
+                return waiting.to_dict(), True
+
+            job = TrainingJob(id=uuid.uuid4().hex, mode=mode, select_model=bool(select), user_id=user_id,
+                              worker=worker_name())
+            db.session.add(job)
+            db.session.commit()
+            return job.to_dict(), True
+
+    @staticmethod
+    def _queue_waiting(job):
+        """Pasa a la cola de este proceso un reentrenamiento pendiente (con el bloqueo de registro)"""
+        from energia_app.models.user import db
+
+        job.status = 'queued'
+        job.stage = 'en cola'
+        job.worker = worker_name()
+        db.session.commit()
+
+    def start_waiting(self):
+        """
+        Lanza el reentrenamiento completo pendiente si ya no hay trabajos activos
+
+        Returns:
+            str: ID del trabajo lanzado (None si no hay ninguno pendiente)
+        """
+        from energia_app.models.training import TrainingJob
+
+        with file_lock(self._lock_path(SUBMIT_LOCK_NAME)):
+            if self.is_running():
+                return None
+            waiting = TrainingJob.query.filter_by(status=TrainingJob.WAITING_STATUS) \
+                .order_by(TrainingJob.created_at).first()
+            if waiting is None:
+                return None
+            self._queue_waiting(waiting)
+            job_id, select = waiting.id, bool(waiting.select_model)
+        self._executor.submit(self._run, job_id, 'full', None, select)
+        logger.info(f"Reentrenamiento pendiente {job_id} encolado")
+        return job_id
+
+    def get_job(self, job_id):
+        """Devuelve el estado de un trabajo (o None si no existe)"""
+        from energia_app.models.user import db
+        from energia_app.models.training import TrainingJob
+
+        job = db.session.get(TrainingJob, job_id)
+        return job.to_dict() if job else None
+
+    def get_latest_job(self):
+        """Devuelve el trabajo más reciente (o None)"""
+        from energia_app.models.training import TrainingJob
+
+        job = TrainingJob.query.order_by(TrainingJob.created_at.desc()).first()
+        return job.to_dict() if job else None
+
+    def is_running(self):
+        """Indica si hay un reentrenamiento en curso en algún worker"""
+        from energia_app.models.training import TrainingJob
+
+        return TrainingJob.query.filter(TrainingJob.status.in_(TrainingJob.ACTIVE_STATUSES)).first() is not None
+
+    def _update(self, job_id, **fields):
+        """Actualiza y confirma el estado de un trabajo (dentro del contexto de la aplicación)"""
+        from energia_app.models.user import db
+        from energia_app.models.training import TrainingJob
+
+        job = db.session.get(TrainingJob, job_id)
+        for name, value in fields.items():
+            setattr(job, name, value)
+        db.session.commit()
+
+    @staticmethod
+    def recover_interrupted():
+        """
+        Marca como fallidos los trabajos de procesos de este host que ya no existen
+
+        Returns:
+            int: Trabajos marcados
+        """
+        from energia_app.models.user import db
+        from energia_app.models.training import TrainingJob
+
+        hostname = socket.gethostname()
+        interrupted = []
+        for job in TrainingJob.query.filter(TrainingJob.status.in_(TrainingJob.ACTIVE_STATUSES)).all():
+            host, _, pid = (job.worker or '').rpartition(':')
+            if host == hostname and pid.isdigit() and not _process_alive(int(pid)):
+                job.status = 'failed'
+                job.stage = 'error'
+                job.error = 'Trabajo interrumpido: el proceso que lo ejecutaba terminó'
+                job.finished_at = datetime.now()
+                interrupted.append(job)
+        db.session.commit()
+        return len(interrupted)
+
+    def _start_waiting_safely(self):
+        """start_waiting al terminar un trabajo, sin que un error lo marque como fallido"""
+        try:
+            self.start_waiting()
+        except Exception as e:
+            logger.error(f"No se pudo lanzar el reentrenamiento pendiente: {str(e)}")
+
+    def _selection_options(self):
+        """Opciones de select_model tomadas de la configuración"""
+        config = self.app.config
+        return {
+            'cv': config.get('MODEL_SELECTION_CV_FOLDS', 5),
+            'metric': config.get('MODEL_SELECTION_METRIC', 'r2'),
+            'time_budget': config.get('MODEL_SELECTION_TIME_BUDGET'),
+            'n_jobs': config.get('MODEL_SELECTION_N_JOBS', -1)
+        }
+
+    def _train_building_models(self, mode, data, building_ids=None):
+        """Reentrena los modelos por edificio (solo los afectados si es incremental)"""
+        from energia_app.models.energy_data import EnergyData
+        from energia_app.models.building_models import train_building_models
+
+        if mode != 'incremental':
+            building_ids = None
+        elif building_ids is None and isinstance(data, pd.DataFrame) and 'building_id' in data.columns:
+            building_ids = set(data['building_id'].dropna().astype(int))
+
+        summary = train_building_models(
+            EnergyData.export_to_df(include_building=True, include_features=True),
+            building_ids=building_ids,
+            min_samples=self.app.config.get('BUILDING_MODELS_MIN_SAMPLES', 30),
+            n_jobs=self.app.config.get('BUILDING_MODELS_N_JOBS', -1)
+        )
+        return {
+            'trained': len(summary['trained']),
+            'skipped': summary['skipped'],
+            'r2': {str(building_id): metrics['r2'] for building_id, metrics in summary['trained'].items()}
+        }
+
+    def _run(self, job_id, mode, data, select=False, building_ids=None):
+        """Ejecuta el reentrenamiento dentro del contexto de la aplicación"""
+        from energia_app.models.user import db, Building
+        from energia_app.models.energy_data import EnergyData
+        from energia_app.models.model import Energy_Model
+        from energia_app.models.preprocess import preprocess_data
+        from energia_app.models.lookup import refresh_buildings
+
+        with self.app.app_context():
+            try:
+                # Un solo proceso ajusta y publica el modelo a la vez
+                with file_lock(self._lock_path(TRAINING_LOCK_NAME)):
+                    self._update(job_id, status='running', started_at=datetime.now())
+                    model = Energy_Model()
+                    metrics = None
+
+                    if mode == 'incremental' and data is not None:
+                        self._update(job_id, stage='actualizando con registros nuevos', progress=20)
+                        try:
+                            metrics = model.update(data)
+                        except ValueError as e:
+                            logger.info(f"Reentrenamiento completo en lugar de incremental: {str(e)}")
+
+                    if metrics is None:
+                        self._update(job_id, stage='cargando datos', progress=10)
+                        all_data = EnergyData.export_to_df(include_features=True)
+                        if len(all_data) < 10:
+                            raise ValueError('No hay suficientes datos para reentrenar el modelo (mínimo 10 registros).')
+
+                        # Las características ya vienen materializadas: solo se escalan
+                        self._update(job_id, stage='preprocesando', progress=40)
+                        X, y = preprocess_data(all_data, training=True)
+
+                        if select:
+                            self._update(job_id, stage='seleccionando modelo (validación cruzada)', progress=50)
+                            metrics = model.train(X, y, selection=self._selection_options())
+                        else:
+                            self._update(job_id, stage='entrenando', progress=70)
+                            metrics = model.train(X, y)
+
+                    if self.app.config.get('BUILDING_MODELS_ENABLED', False):
+                        self._update(job_id, stage='entrenando modelos por edificio', progress=80)
+                        metrics['buildings'] = self._train_building_models(mode, data, building_ids)
+
+                    self._update(job_id, stage='publicando modelo', progress=90)
+                    refresh_buildings(Building.query.filter_by(active=True).all(), rebuild_all=True)
+
+                self._update(job_id, status='completed', stage='completado', progress=100,
+                             metrics=_to_json(metrics), finished_at=datetime.now())
+                logger.info(f"Reentrenamiento {job_id} completado. R²={metrics['r2']:.4f}")
+            except Exception as e:
+                logger.error(f"Error en reentrenamiento {job_id}: {str(e)}")
+                db.session.rollback()
+                self._update(job_id, status='failed', stage='error', error=str(e), finished_at=datetime.now())
+            finally:
+                self._start_waiting_safely()
+                db.session.remove()
+
+    def _run_backfill(self, job_id):
+        """Recalcula por bloques las características materializadas"""
+        from energia_app.models.user import db
+        from energia_app.models.energy_data import EnergyData
+
+        with self.app.app_context():
+            def progress(done, total):
+                self._update(job_id, progress=int(100 * done / total) if total else 100)
+
+            try:
+                with file_lock(self._lock_path(TRAINING_LOCK_NAME)):
+                    self._update(job_id, status='running', stage='recalculando características',
+                                 started_at=datetime.now())
+                    updated = EnergyData.backfill_features(progress=progress)
+                self._update(job_id, status='completed', stage='completado', progress=100,
+                             metrics={'updated': updated},
+                             finished_at=datetime.now())
+            except Exception as e:
+                logger.error(f"Error al recalcular características {job_id}: {str(e)}")
+                db.session.rollback()
+                self._update(job_id, status='failed', stage='error', error=str(e), finished_at=datetime.now())
+            finally:
+                self._start_waiting_safely()
+                db.session.remove()
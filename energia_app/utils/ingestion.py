@@ -0,0 +1,396 @@
+"""
+Ingesta de CSV por bloques
+
+El cuerpo de la petición se vuelca a disco en bloques de tamaño fijo y el
+archivo se recorre con ``pandas.read_csv(chunksize=...)``: cada bloque se
+valida e inserta por separado, de modo que la memoria no depende del tamaño
+del archivo y un bloque defectuoso no impide importar los demás.
+
+Varios archivos (o un ZIP con varios CSV) se leen y validan en paralelo en
+un grupo de procesos (arrancados con spawn) y se insertan después en el
+orden de los archivos.
+"""
+
+import os
+import sys
+import shutil
+import logging
+import zipfile
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from werkzeug.wsgi import get_input_stream
+from energia_app.utils.validation import REQUIRED_COLUMNS, REASONS, validate_frame, reason_counts
+
+logger = logging.getLogger(__name__)
+
+# Filas por bloque de read_csv
+DEFAULT_CHUNK_ROWS = 50000
+
+# Bytes leídos del cuerpo de la petición por iteración
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+# Errores de ejemplo guardados por bloque en el informe
+MAX_CHUNK_ERRORS = 5
+
+# Bytes mínimos (en total) para leer varios archivos en paralelo: arrancar
+# los procesos con spawn (importar pandas y la aplicación) cuesta segundos
+PARALLEL_PARSE_MIN_BYTES = 32 * 1024 * 1024
+
+# Columnas leídas de cada archivo y su tipo (las demás se descartan al leer)
+PARSE_DTYPES = {
+    'area_edificio': np.float64,
+    'ocupacion': np.float64,
+    'dia_semana': np.float64,
+    'hora_dia': np.float64,
+    'consumo_energetico': np.float64,
+    'building_id': np.float64,
+    'timestamp': object,
+}
+
+
+def spool_request_body(environ, directory, max_bytes=None):
+    """
+    Vuelca el cuerpo de la petición a un archivo temporal sin cargarlo en memoria
+
+    Args:
+        environ (dict): Entorno WSGI de la petición
+        directory (str): Directorio donde crear el archivo
+        max_bytes (int, optional): Tamaño máximo del cuerpo (None sin límite)
+
+    Returns:
+        tuple: (ruta del archivo, bytes escritos)
+
+    Raises:
+        RequestEntityTooLarge: Si el cuerpo supera ``max_bytes``
+    """
+    os.makedirs(directory, exist_ok=True)
+    stream = get_input_stream(environ, max_content_length=max_bytes)
+    fd, path = tempfile.mkstemp(prefix='upload-', suffix='.csv', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(stream, f, SPOOL_BLOCK_SIZE)
+            size = f.tell()
+    except Exception:
+        os.remove(path)
+        raise
+    return path, size
+
+
+def save_upload(stream, directory, suffix='.csv'):
+    """
+    Copia un archivo subido a un archivo temporal propio
+
+    Args:
+        stream (file): Contenido del archivo (p.ej. ``FileStorage.stream``)
+        directory (str): Directorio donde crear el archivo
+        suffix (str): Extensión del archivo creado
+
+    Returns:
+        str: Ruta del archivo creado
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix='upload-', suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(stream, f, SPOOL_BLOCK_SIZE)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def archive_members(archive):
+    """
+    CSV contenidos en un ZIP, ordenados por nombre
+
+    Args:
+        archive (ZipFile): Archivo ZIP abierto
+
+    Returns:
+        list: ZipInfo de cada CSV (sin directorios ni metadatos de macOS)
+    """
+    return sorted((member for member in archive.infolist()
+                   if not member.is_dir()
+                   and member.filename.lower().endswith('.csv')
+                   and not member.filename.startswith('__MACOSX/')),
+                  key=lambda member: member.filename)
+
+
+def expand_archives(files, directory, remove_archives=True):
+    """
+    Sustituye cada ZIP por los CSV que contiene, extraídos a archivos temporales
+
+    Los CSV se nombran ``archivo.zip/miembro.csv`` en los informes.
+
+    Args:
+        files (list): Pares (nombre original, ruta) en el orden de subida
+        directory (str): Directorio donde extraer los CSV
+        remove_archives (bool): Eliminar los ZIP una vez extraídos
+
+    Returns:
+        list: Pares (nombre, ruta) de los CSV a importar
+    """
+    expanded = []
+    try:
+        for name, path in files:
+            if not name.lower().endswith('.zip'):
+                expanded.append((name, path))
+                continue
+            with zipfile.ZipFile(path) as archive:
+                for member in archive_members(archive):
+                    with archive.open(member) as stream:
+                        expanded.append((f'{name}/{member.filename}', save_upload(stream, directory)))
+            if remove_archives:
+                os.remove(path)
+    except Exception:
+        originals = {path for _, path in files}
+        for _, path in expanded:
+            if path not in originals and os.path.exists(path):
+                os.remove(path)
+        raise
+    return expanded
+
+
+def known_building_ids():
+    """
+    IDs de los edificios existentes, para validar building_id antes de insertar
+
+    Returns:
+        frozenset: IDs de la tabla de edificios
+    """
+    from energia_app.models.user import db, Building
+
+    return frozenset(db.session.execute(db.select(Building.id)).scalars())
+
+
+def validate_chunk(chunk, building_ids=None):
+    """
+    Normaliza un bloque y separa las filas inválidas (ver validation.py)
+
+    Args:
+        chunk (DataFrame): Filas leídas del CSV
+        building_ids (iterable, optional): IDs de los edificios existentes
+
+    Returns:
+        tuple: (filas válidas, número de filas rechazadas, errores de ejemplo,
+                filas rechazadas por motivo)
+    """
+    valid, rejected = validate_frame(chunk, building_ids)
+    errors = [f"Fila {int(row) + 2}: {'; '.join(REASONS[code] for code in reason.split(','))}"
+              for row, reason in rejected['reason'].head(MAX_CHUNK_ERRORS).items()]
+    return valid, len(rejected), errors, reason_counts(rejected)
+
+
+def parse_csv_file(path, building_ids=None):
+    """
+    Lee y valida un CSV completo con tipos explícitos
+
+    Solo se leen las columnas de PARSE_DTYPES. Si alguna columna numérica
+    (incluida building_id) tiene texto, el archivo se vuelve a leer con esas
+    columnas como texto y la validación rechaza las filas afectadas.
+
+    Args:
+        path (str): Ruta del archivo CSV
+        building_ids (iterable, optional): IDs de los edificios existentes
+
+    Returns:
+        tuple: (filas válidas, filas leídas, filas rechazadas, errores de
+                ejemplo, filas rechazadas por motivo)
+
+    Raises:
+        ValueError: Si faltan columnas requeridas en la cabecera
+    """
+    def usecols(name):
+        return name in PARSE_DTYPES
+
+    try:
+        df = pd.read_csv(path, usecols=usecols, dtype=PARSE_DTYPES)
+    except ValueError:
+        text_columns = REQUIRED_COLUMNS + ['building_id']
+        df = pd.read_csv(path, usecols=usecols, dtype={**PARSE_DTYPES, **{col: object for col in text_columns}})
+
+    missing_cols = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"El archivo CSV no tiene las columnas requeridas: {', '.join(missing_cols)}")
+
+    valid, rejected, errors, reasons = validate_chunk(df, building_ids)
+    return valid, len(df), rejected, errors, reasons
+
+
+def _init_parse_worker():
+    """
+    Inicializa un proceso de lectura, que no usa la base de datos
+
+    Con spawn no hereda las conexiones del worker; si al importar el módulo
+    principal se creó la aplicación (p.ej. con ``python app.py``), se
+    descartan sus motores.
+    """
+    app = getattr(sys.modules.get('__mp_main__'), 'app', None)
+    extension = getattr(app, 'extensions', {}).get('sqlalchemy')
+    if extension is not None:
+        with app.app_context():
+            for engine in extension.engines.values():
+                engine.dispose()
+
+
+def _parse_file(path, building_ids=None):
+    """parse_csv_file para el grupo de procesos: devuelve el error en lugar de lanzarlo"""
+    try:
+        return parse_csv_file(path, building_ids), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _new_report():
+    return {'rows_total': 0, 'rows_imported': 0, 'rows_rejected': 0, 'rows_duplicate': 0,
+            'reasons': {}, 'chunks_failed': 0, 'chunks': []}
+
+
+def _new_entry(number, first_row, rows):
+    return {'chunk': number, 'first_row': first_row, 'rows': rows, 'imported': 0, 'rejected': 0,
+            'duplicate': 0, 'reasons': {}, 'failed': False, 'errors': []}
+
+
+def _fail_entry(entry, message):
+    entry['rejected'] = entry['rows']
+    entry['imported'] = 0
+    entry['duplicate'] = 0
+    entry['reasons'] = {}
+    entry['failed'] = True
+    entry['errors'] = [message]
+
+
+def _add_entry(report, entry):
+    report['rows_total'] += entry['rows']
+    report['rows_imported'] += entry['imported']
+    report['rows_rejected'] += entry['rejected']
+    report['rows_duplicate'] += entry['duplicate']
+    report['chunks_failed'] += int(entry['failed'])
+    for code, count in entry['reasons'].items():
+        report['reasons'][code] = report['reasons'].get(code, 0) + count
+    report['chunks'].append(entry)
+
+
+def ingest_csv(source, chunk_rows=DEFAULT_CHUNK_ROWS, on_chunk=None, update_snapshot=True, on_commit=None,
+               source_name=None):
+    """
+    Valida e importa un CSV bloque a bloque
+
+    Args:
+        source (str | file): Ruta o archivo CSV (abierto en modo binario)
+        chunk_rows (int): Filas por bloque
+        on_chunk (callable, optional): Se llama con el informe de cada bloque
+        update_snapshot (bool): Ver ``EnergyData.import_from_df``
+        on_commit (callable, optional): Ver ``EnergyData.import_from_df``
+        source_name (str, optional): Nombre del archivo subido (ver
+                                     ``EnergyData.import_from_df``)
+
+    Returns:
+        dict: rows_total, rows_imported, rows_rejected, rows_duplicate (ya
+              importadas antes), filas rechazadas por motivo ('reasons'),
+              chunks_failed e informe por bloque ('chunks')
+
+    Raises:
+        ValueError: Si faltan columnas requeridas en la cabecera
+    """
+    from energia_app.models.energy_data import EnergyData
+
+    report = _new_report()
+    building_ids = known_building_ids()
+    reader = pd.read_csv(source, chunksize=max(1, int(chunk_rows)))
+    with reader:
+        for number, chunk in enumerate(reader):
+            if number == 0:
+                missing_cols = [col for col in REQUIRED_COLUMNS if col not in chunk.columns]
+                if missing_cols:
+                    raise ValueError(f"El archivo CSV no tiene las columnas requeridas: {', '.join(missing_cols)}")
+
+            entry = _new_entry(number, int(chunk.index[0]) + 2 if len(chunk) else None, len(chunk))
+            try:
+                valid, entry['rejected'], entry['errors'], entry['reasons'] = validate_chunk(chunk, building_ids)
+                if len(valid):
+                    entry['imported'] = EnergyData.import_from_df(valid, chunk_size=len(valid),
+                                                                  update_snapshot=update_snapshot,
+                                                                  on_commit=on_commit,
+                                                                  source_name=source_name)
+                    entry['duplicate'] = len(valid) - entry['imported']
+            except Exception as e:
+                logger.error(f"Error al importar el bloque {number} del CSV: {str(e)}")
+                _fail_entry(entry, f'Bloque no importado: {str(e)}')
+
+            _add_entry(report, entry)
+            if on_chunk is not None:
+                on_chunk(entry)
+    return report
+
+
+def ingest_files(files, workers=None, on_file=None, update_snapshot=True, on_commit=None):
+    """
+    Lee varios CSV en paralelo e importa sus filas en el orden de los archivos
+
+    Cada archivo se lee y valida completo en un proceso del grupo; el
+    proceso principal inserta los resultados en orden (un commit por
+    archivo) mientras los demás se siguen leyendo. Un archivo defectuoso
+    no impide importar los demás.
+
+    Args:
+        files (list): Pares (nombre, ruta) de los CSV; el nombre identifica
+                      las filas sin marca de tiempo al volver a subirlas
+        workers (int, optional): Procesos de lectura (por defecto, uno por
+                                 núcleo; uno solo por debajo de
+                                 PARALLEL_PARSE_MIN_BYTES)
+        on_file (callable, optional): Se llama con el informe de cada archivo
+        update_snapshot (bool): Ver ``EnergyData.import_from_df``
+        on_commit (callable, optional): Ver ``EnergyData.import_from_df``
+
+    Returns:
+        dict: Informe como el de ``ingest_csv`` con una entrada por archivo,
+              que añade 'file' (nombre) y 'bytes' (tamaño)
+    """
+    from energia_app.models.energy_data import EnergyData
+
+    report = _new_report()
+    workers = min(workers or os.cpu_count() or 1, len(files))
+    if sum(os.path.getsize(path) for _, path in files) < PARALLEL_PARSE_MIN_BYTES:
+        workers = 1
+    pool = None
+    if workers > 1:
+        # spawn: el worker web tiene hilos y conexiones abiertas que fork duplicaría
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=_init_parse_worker)
+    try:
+        paths = [path for _, path in files]
+        # Los procesos de lectura no consultan la base de datos: reciben los edificios existentes
+        building_ids = [known_building_ids()] * len(paths)
+        results = pool.map(_parse_file, paths, building_ids) if pool else map(_parse_file, paths, building_ids)
+        for number, ((name, path), (parsed, error)) in enumerate(zip(files, results)):
+            entry = _new_entry(number, 2, 0)
+            entry['file'] = name
+            entry['bytes'] = os.path.getsize(path)
+            if parsed is None:
+                logger.error(f"Error al leer {name}: {error}")
+                _fail_entry(entry, f'{name}: {error}')
+            else:
+                valid, entry['rows'], entry['rejected'], errors, entry['reasons'] = parsed
+                entry['errors'] = [f'{name}: {message}' for message in errors]
+                try:
+                    if len(valid):
+                        entry['imported'] = EnergyData.import_from_df(valid, chunk_size=len(valid),
+                                                                      update_snapshot=update_snapshot,
+                                                                      on_commit=on_commit,
+                                                                      source_name=name)
+                        entry['duplicate'] = len(valid) - entry['imported']
+                except Exception as e:
+                    logger.error(f"Error al importar {name}: {str(e)}")
+                    _fail_entry(entry, f'{name}: archivo no importado: {str(e)}')
+
+            _add_entry(report, entry)
+            if on_file is not None:
+                on_file(entry)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return report
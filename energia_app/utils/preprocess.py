@@ -4,14 +4,20 @@ import joblib
 import os
 import logging
 from datetime import datetime
+from energia_app.models.registry import MODEL_DIR
+from energia_app.models.bundle import atomic_write
 
 logger = logging.getLogger(__name__)
 
+# Ruta absoluta: no depender del directorio de trabajo del proceso
+SCALERS_DIR = os.path.join(MODEL_DIR, 'scalers')
+SCALER_PATH = os.path.join(SCALERS_DIR, 'energy_scaler.pkl')
+
 def preprocess_data(data_df, training=False):
     """Preprocesa datos para el modelo de energía"""
     try:
         # Crear directorio para escaladores si no existe
-        os.makedirs('energia_app/models/scalers', exist_ok=True)
+        os.makedirs(SCALERS_DIR, exist_ok=True)
         
         # Copiar los datos para no modificar el DataFrame original
         processed_df = data_df.copy()
@@ -28,13 +34,13 @@ def preprocess_data(data_df, training=False):
             scaler = StandardScaler()
             scaled_features = scaler.fit_transform(processed_df[['area_edificio', 'ocupacion', 'dia_semana', 'hora_dia']])
             
-            # Guardar el escalador
-            scaler_path = 'energia_app/models/scalers/energy_scaler.pkl'
-            joblib.dump(scaler, scaler_path)
+            # Guardar el escalador de forma atómica
+            scaler_path = SCALER_PATH
+            atomic_write(scaler_path, lambda f: joblib.dump(scaler, f))
             logger.info(f"Escalador guardado en {scaler_path}")
         else:
             # Cargar escalador existente
-            scaler_path = 'energia_app/models/scalers/energy_scaler.pkl'
+            scaler_path = SCALER_PATH
             if not os.path.exists(scaler_path):
                 raise FileNotFoundError(f"Escalador no encontrado en {scaler_path}")
                 
@@ -0,0 +1,232 @@
+"""
+Medición de tiempos por etapa de las peticiones de predicción
+
+Cada etapa (consulta de edificios, carga del modelo, predicción,
+recomendaciones, commit...) se mide con ``stage('nombre')`` y se acumula en
+un histograma por (endpoint, etapa) con cubos fijos en milisegundos. Medir
+una etapa cuesta dos ``perf_counter`` y una búsqueda binaria bajo un lock,
+por lo que puede quedar activado en producción.
+
+Las etapas de la petición en curso se guardan en ``flask.g`` y, si
+``SERVER_TIMING_ENABLED`` está activo, se devuelven en la cabecera
+``Server-Timing`` de la respuesta. En las respuestas en streaming las etapas
+del generador se miden después de enviar las cabeceras: no llevan
+``Server-Timing`` y su tiempo total se registra al cerrar la respuesta.
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+
+# Límites superiores de los cubos (ms); el último cubo es +Inf
+BUCKET_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """
+    Histograma acumulado de duraciones con cubos fijos
+
+    Attributes:
+        counts (list): Observaciones por cubo (el último es +Inf)
+        count (int): Total de observaciones
+        total_ms (float): Suma de las duraciones en milisegundos
+        max_ms (float): Mayor duración observada
+    """
+
+    def __init__(self, bounds=BUCKET_BOUNDS_MS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, duration_ms):
+        """Añade una observación (sin lock: lo gestiona StageTimings)"""
+        self.counts[bisect_left(self.bounds, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        if duration_ms > self.max_ms:
+            self.max_ms = duration_ms
+
+    def quantile(self, q):
+        """
+        Estima un cuantil como el límite superior del cubo que lo contiene
+
+        Args:
+            q (float): Cuantil entre 0 y 1
+
+        Returns:
+            float: Milisegundos (None si no hay observaciones)
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return float(min(bound, self.max_ms))
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.total_ms / self.count, 3) if self.count else None,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': {**{str(bound): count for bound, count in zip(self.bounds, self.counts)},
+                        '+Inf': self.counts[-1]}
+        }
+
+
+class StageTimings:
+    """Histogramas por (endpoint, etapa), seguros entre hilos"""
+
+    def __init__(self):
+        self.enabled = True
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint, stage_name, duration_ms):
+        """
+        Registra la duración de una etapa
+
+        Args:
+            endpoint (str): Endpoint de Flask (p.ej. 'predictions.predict')
+            stage_name (str): Nombre de la etapa
+            duration_ms (float): Duración en milisegundos
+        """
+        key = (endpoint, stage_name)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(duration_ms)
+
+    def snapshot(self):
+        """
+        Copia de los histogramas
+
+        Returns:
+            dict: {endpoint: {etapa: histograma serializado}}
+        """
+        with self._lock:
+            items = [(key, histogram.to_dict()) for key, histogram in self._histograms.items()]
+        result = {}
+        for (endpoint, stage_name), data in sorted(items):
+            result.setdefault(endpoint, {})[stage_name] = data
+        return result
+
+    def prometheus(self):
+        """
+        Histogramas en el formato de exposición de texto de Prometheus
+
+        Returns:
+            str: Métrica ``energia_stage_duration_ms``
+        """
+        lines = ['# HELP energia_stage_duration_ms Duración de cada etapa de las peticiones de predicción',
+                 '# TYPE energia_stage_duration_ms histogram']
+        with self._lock:
+            items = sorted((key, list(h.counts), h.count, h.total_ms) for key, h in self._histograms.items())
+        for (endpoint, stage_name), counts, count, total_ms in items:
+            labels = f'endpoint="{endpoint}",stage="{stage_name}"'
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKET_BOUNDS_MS, counts):
+                cumulative += bucket_count
+                lines.append(f'energia_stage_duration_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'energia_stage_duration_ms_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'energia_stage_duration_ms_sum{{{labels}}} {total_ms:.3f}')
+            lines.append(f'energia_stage_duration_ms_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Descarta todas las observaciones"""
+        with self._lock:
+            self._histograms.clear()
+
+
+# Instancia única por proceso
+stage_timings = StageTimings()
+
+
+def record_stage(stage_name, duration_ms):
+    """
+    Registra una etapa ya medida de la petición en curso
+
+    Args:
+        stage_name (str): Nombre de la etapa
+        duration_ms (float): Duración en milisegundos
+    """
+    if not stage_timings.enabled or not has_request_context():
+        return
+    stage_timings.observe(request.endpoint, stage_name, duration_ms)
+    stages = g.setdefault('stage_timings', {})
+    stages[stage_name] = stages.get(stage_name, 0.0) + duration_ms
+
+
+@contextmanager
+def stage(stage_name):
+    """
+    Mide el bloque como una etapa de la petición en curso
+
+    Args:
+        stage_name (str): Nombre de la etapa (p.ej. 'model_load')
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage_name, (time.perf_counter() - start) * 1000)
+
+
+def server_timing_header(stages):
+    """
+    Valor de la cabecera Server-Timing para las etapas indicadas
+
+    Args:
+        stages (dict): Milisegundos por etapa
+
+    Returns:
+        str: p.ej. 'model_load;dur=1.204, predict;dur=0.311'
+    """
+    return ', '.join(f'{name};dur={duration:.3f}' for name, duration in stages.items())
+
+
+def init_app(app):
+    """
+    Configura la medición de etapas y la cabecera Server-Timing
+
+    Args:
+        app (Flask): Aplicación con STAGE_TIMING_ENABLED y SERVER_TIMING_ENABLED
+    """
+    stage_timings.enabled = app.config.get('STAGE_TIMING_ENABLED', True)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started_at = time.perf_counter()
+
+    @app.after_request
+    def add_stage_timings(response):
+        stages = g.pop('stage_timings', None)
+        if not stages:
+            return response
+        # Solo las peticiones con etapas medidas registran su tiempo total
+        started_at = g.get('request_started_at')
+        if response.is_streamed:
+            if started_at is not None:
+                endpoint = request.endpoint
+                response.call_on_close(
+                    lambda: stage_timings.observe(endpoint, 'total', (time.perf_counter() - started_at) * 1000))
+            return response
+        if started_at is not None:
+            total = (time.perf_counter() - started_at) * 1000
+            stage_timings.observe(request.endpoint, 'total', total)
+            stages = {**stages, 'total': total}
+        if app.config.get('SERVER_TIMING_ENABLED', False):
+            response.headers['Server-Timing'] = server_timing_header(stages)
+        return response
@@ -0,0 +1,188 @@
+"""
+Validación vectorizada de registros de consumo
+
+Todas las comprobaciones (conversión de tipos, valores ausentes o
+infinitos, rangos y límites de área y ocupación, edificio opcional y
+existente) se hacen con operaciones de columna sobre el DataFrame completo,
+sin recorrer filas en Python. Cada regla rechazada se marca con un bit, de
+modo que una fila puede acumular varios motivos y el informe se construye a
+partir de las pocas combinaciones distintas que aparecen.
+"""
+
+import numpy as np
+import pandas as pd
+
+REQUIRED_COLUMNS = ['area_edificio', 'ocupacion', 'dia_semana', 'hora_dia', 'consumo_energetico']
+
+# Columnas que se guardan como enteros
+INTEGER_COLUMNS = ['ocupacion', 'dia_semana', 'hora_dia']
+
+# Límites de plausibilidad
+MAX_AREA = 1_000_000.0  # m²
+MAX_OCCUPANCY = 100_000
+MAX_CONSUMPTION = 1_000_000.0  # kWh por hora
+
+# Motivos de rechazo (en orden de bit)
+REASONS = {
+    'missing': 'Valor ausente',
+    'not_numeric': 'Valor no numérico',
+    'not_finite': 'Valor infinito',
+    'not_integer': 'Ocupación, día u hora con decimales',
+    'dia_semana_range': 'Día de la semana fuera de 0-6',
+    'hora_dia_range': 'Hora del día fuera de 0-23',
+    'area_range': f'Área fuera de (0, {MAX_AREA:,.0f}] m²',
+    'ocupacion_range': f'Ocupación fuera de [0, {MAX_OCCUPANCY:,}]',
+    'consumo_range': f'Consumo fuera de [0, {MAX_CONSUMPTION:,.0f}] kWh',
+    'building_id_invalid': 'Edificio no válido (debe ser un entero positivo)',
+    'building_id_unknown': 'Edificio inexistente',
+}
+
+_BITS = {code: np.uint16(1 << bit) for bit, code in enumerate(REASONS)}
+
+
+def _to_numeric(raw, few_values=False):
+    """
+    Convierte una columna de texto a números (NaN si no es numérico)
+
+    Con ``few_values`` se convierten solo los valores distintos, mucho más
+    rápido para columnas como la hora o el día con pocos valores posibles.
+    """
+    if not few_values:
+        return pd.to_numeric(raw, errors='coerce')
+    codes, uniques = pd.factorize(raw)
+    converted = pd.to_numeric(pd.Series(uniques, dtype=object), errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    return pd.Series(np.where(codes < 0, np.nan, converted[codes]), index=raw.index)
+
+
+def _flags(df, building_ids=None):
+    """
+    Convierte las columnas requeridas y calcula la máscara de motivos por fila
+
+    Args:
+        df (DataFrame): Registros con las columnas requeridas
+        building_ids (iterable, optional): IDs de los edificios existentes
+
+    Returns:
+        tuple: (dict de columnas float64, ndarray uint16 con los motivos)
+    """
+    flags = np.zeros(len(df), dtype=np.uint16)
+    values = {}
+    for name in REQUIRED_COLUMNS:
+        raw = df[name]
+        if pd.api.types.is_bool_dtype(raw) or not pd.api.types.is_numeric_dtype(raw):
+            coerced = _to_numeric(raw, few_values=name in INTEGER_COLUMNS)
+            flags[(coerced.isna() & raw.notna()).to_numpy()] |= _BITS['not_numeric']
+            raw = coerced
+        column = raw.to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(column)
+        flags[missing & ((flags & _BITS['not_numeric']) == 0)] |= _BITS['missing']
+        infinite = np.isinf(column)
+        if infinite.any():
+            # Solo se informa como infinito, no además como fuera de rango
+            flags[infinite] |= _BITS['not_finite']
+            column[infinite] = np.nan
+        values[name] = column
+
+    # Las comparaciones con NaN dan False: solo se marcan valores presentes
+    with np.errstate(invalid='ignore'):
+        for name in INTEGER_COLUMNS:
+            column = values[name]
+            flags[np.isfinite(column) & (column != np.floor(column))] |= _BITS['not_integer']
+
+        dia, hora = values['dia_semana'], values['hora_dia']
+        area, ocupacion, consumo = values['area_edificio'], values['ocupacion'], values['consumo_energetico']
+        flags[(dia < 0) | (dia > 6)] |= _BITS['dia_semana_range']
+        flags[(hora < 0) | (hora > 23)] |= _BITS['hora_dia_range']
+        flags[(area <= 0) | (area > MAX_AREA)] |= _BITS['area_range']
+        flags[(ocupacion < 0) | (ocupacion > MAX_OCCUPANCY)] |= _BITS['ocupacion_range']
+        flags[(consumo < 0) | (consumo > MAX_CONSUMPTION)] |= _BITS['consumo_range']
+
+        # building_id es opcional: vacío se acepta, cualquier otro valor debe
+        # ser un entero positivo
+        if 'building_id' in df.columns:
+            raw = df['building_id']
+            if pd.api.types.is_bool_dtype(raw) or not pd.api.types.is_numeric_dtype(raw):
+                coerced = _to_numeric(raw)
+                invalid = (coerced.isna() & raw.notna()).to_numpy()
+                raw = coerced
+            else:
+                invalid = np.zeros(len(df), dtype=bool)
+            column = raw.to_numpy(dtype=np.float64, na_value=np.nan)
+            present = ~np.isnan(column)
+            invalid |= present & (np.isinf(column) | (column != np.floor(column)) | (column <= 0))
+            flags[invalid] |= _BITS['building_id_invalid']
+            if building_ids is not None:
+                # La clave foránea rechazaría el bloque entero en la inserción
+                known = np.fromiter(building_ids, dtype=np.float64)
+                flags[present & ~invalid & ~np.isin(column, known)] |= _BITS['building_id_unknown']
+            values['building_id'] = column
+    return values, flags
+
+
+def _reason_labels(flags):
+    """Códigos separados por comas de cada máscara (se calcula una vez por combinación)"""
+    unique, inverse = np.unique(flags, return_inverse=True)
+    labels = np.array([','.join(code for code, bit in _BITS.items() if mask & bit) for mask in unique.tolist()],
+                      dtype=object)
+    return labels[inverse]
+
+
+def validate_frame(df, building_ids=None):
+    """
+    Valida un DataFrame completo y separa las filas aceptadas de las rechazadas
+
+    Las filas aceptadas conservan su índice y todas sus columnas, con las
+    requeridas convertidas a float64 (área y consumo) o int64 (ocupación,
+    día y hora) y building_id, si existe, a float64 (NaN si está vacío).
+    Las rechazadas conservan sus valores originales y añaden la columna
+    ``reason`` con los códigos de REASONS separados por comas.
+
+    Args:
+        df (DataFrame): Registros a validar
+        building_ids (iterable, optional): IDs de los edificios existentes;
+            con ellos, un building_id desconocido se rechaza
+
+    Returns:
+        tuple: (DataFrame aceptado, DataFrame rechazado)
+
+    Raises:
+        ValueError: Si faltan columnas requeridas
+    """
+    missing_cols = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Faltan columnas requeridas: {', '.join(missing_cols)}")
+
+    values, flags = _flags(df, building_ids)
+    invalid = flags != 0
+
+    rejected = df[invalid].copy()
+    rejected['reason'] = _reason_labels(flags[invalid])
+
+    valid = ~invalid
+    accepted = df[valid].copy()
+    for name in REQUIRED_COLUMNS:
+        column = values[name][valid]
+        accepted[name] = column.astype(np.int64) if name in INTEGER_COLUMNS else column
+    if 'building_id' in values:
+        accepted['building_id'] = values['building_id'][valid]
+    return accepted, rejected
+
+
+def reason_counts(rejected):
+    """
+    Cuenta las filas rechazadas por motivo (una fila puede tener varios)
+
+    Args:
+        rejected (DataFrame): Filas rechazadas por validate_frame
+
+    Returns:
+        dict: Código de motivo -> número de filas
+    """
+    if not len(rejected):
+        return {}
+    counts = rejected['reason'].value_counts()
+    totals = {}
+    for label, count in counts.items():
+        for code in label.split(','):
+            totals[code] = totals.get(code, 0) + int(count)
+    return {code: totals[code] for code in REASONS if code in totals}
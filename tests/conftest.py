@@ -0,0 +1,59 @@
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT, 'energia_app', 'data')
+sys.path.insert(0, ROOT)
+
+# La aplicación se crea al importar app.py: la base de datos de pruebas se fija antes
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='energia-tests-'), 'test.db')
+
+from app import app as flask_app  # noqa: E402
+
+
+class RecordingExecutor:
+    """Sustituye al ThreadPoolExecutor de un servicio: registra los trabajos sin ejecutarlos"""
+
+    def __init__(self):
+        self.calls = []
+
+    def submit(self, fn, *args):
+        self.calls.append((fn.__name__, args))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """Aplicación con una base de datos vacía y la instantánea en un directorio temporal"""
+    from energia_app.models.user import db, Building
+    from energia_app.models.snapshot import training_snapshot
+    from energia_app.models.fingerprint import fingerprint_filter
+
+    monkeypatch.setattr(training_snapshot, 'directory', str(tmp_path / 'snapshot'))
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False,
+                            INGESTION_SPOOL_FOLDER=str(tmp_path / 'incoming'))
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        for number, area in enumerate([1200, 3500, 5000, 800]):
+            db.session.add(Building(name=f'Edificio {number}', area=area, active=True))
+        db.session.commit()
+        fingerprint_filter.clear()
+        yield flask_app
+        db.session.remove()
+        fingerprint_filter.clear()
+
+
+@pytest.fixture
+def client(app):
+    """Cliente de pruebas con la sesión de un administrador iniciada"""
+    from energia_app.models.user import db, User
+
+    user = User(username='admin', email='admin@example.com', role='admin')
+    user.set_password('secreto')
+    db.session.add(user)
+    db.session.commit()
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'secreto'})
+    return client
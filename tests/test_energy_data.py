@@ -0,0 +1,113 @@
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from conftest import DATA_DIR
+from energia_app.models.energy_data import EnergyData, match_building_areas, BUILDING_AREA_TOLERANCE
+from energia_app.models.fingerprint import fingerprint_filter
+from energia_app.models.user import db
+from energia_app.utils.ingestion import ingest_csv
+
+ENERGY_DATA = os.path.join(DATA_DIR, 'energy_data.csv')
+
+# Todo lo que se guarda por fila salvo el ID y la marca de tiempo de importación
+STORED_COLUMNS = [column.name for column in EnergyData.__table__.columns if column.name not in ('id', 'timestamp')]
+
+
+def nearest_building_loop(area, building_areas, building_ids):
+    """Búsqueda fila a fila: el edificio más cercano dentro de la tolerancia, (distancia, área, ID) menor"""
+    best = None
+    for building_area, building_id in zip(building_areas, building_ids):
+        distance = abs(building_area - area)
+        if area > 0 and distance / area <= BUILDING_AREA_TOLERANCE:
+            candidate = (distance, building_area, building_id)
+            best = candidate if best is None or candidate < best else best
+    return -1 if best is None else best[2]
+
+
+def stored_rows():
+    table = EnergyData.__table__
+    rows = db.session.execute(select(*(table.c[name] for name in STORED_COLUMNS)).order_by(table.c.id)).all()
+    return pd.DataFrame(rows, columns=STORED_COLUMNS)
+
+
+def reset_energy_data():
+    db.session.execute(EnergyData.__table__.delete())
+    db.session.commit()
+    fingerprint_filter.clear()
+
+
+def with_building_areas(df):
+    # Algunas filas caen dentro del 5% de las áreas de los edificios de prueba
+    df = df.copy()
+    df.loc[::7, 'area_edificio'] = 1230.0
+    df.loc[3::11, 'area_edificio'] = 3400.0
+    df.loc[5::13, 'area_edificio'] = 810.0
+    return df
+
+
+def test_chunked_ingest_matches_single_shot_import(app, tmp_path):
+    df = with_building_areas(pd.read_csv(ENERGY_DATA))
+    path = tmp_path / 'energy_data.csv'
+    df.to_csv(path, index=False)
+
+    assert EnergyData.import_from_df(df, chunk_size=len(df), source_name='energy_data.csv') == len(df)
+    single_shot = stored_rows()
+    reset_energy_data()
+    report = ingest_csv(str(path), chunk_rows=97, source_name='energy_data.csv')
+    chunked = stored_rows()
+
+    assert report['rows_imported'] == len(df)
+    assert single_shot['building_id'].notna().sum() > 0
+    pd.testing.assert_frame_equal(chunked, single_shot)
+
+
+def test_insert_without_returning_matches_insert_with_returning(app):
+    df = with_building_areas(pd.read_csv(ENERGY_DATA))
+
+    EnergyData.import_from_df(df, chunk_size=250, source_name='energy_data.csv')
+    with_returning = stored_rows()
+    reset_energy_data()
+    EnergyData.import_from_df(df, chunk_size=250, update_snapshot=False, source_name='energy_data.csv')
+
+    pd.testing.assert_frame_equal(stored_rows(), with_returning)
+
+
+def test_on_commit_receives_every_inserted_row(app):
+    df = with_building_areas(pd.read_csv(ENERGY_DATA))
+    batches = []
+
+    EnergyData.import_from_df(df, chunk_size=300, on_commit=batches.append, source_name='energy_data.csv')
+
+    received = pd.concat(batches, ignore_index=True)
+    stored = stored_rows()
+    assert sum(len(batch) for batch in batches) == len(df)
+    pd.testing.assert_series_equal(received['building_id'].astype('float64'),
+                                   stored['building_id'].astype('float64'), check_names=False)
+    pd.testing.assert_series_equal(received['consumo_energetico'], stored['consumo_energetico'], check_names=False)
+
+
+def test_area_matching_agrees_with_row_by_row_search():
+    rng = np.random.default_rng(7)
+    building_areas = np.round(rng.uniform(100, 20000, 400), 1).tolist()
+    building_areas[10:14] = [2500.0, 2500.0, 2400.0, 2600.0]  # áreas repetidas y empates a igual distancia
+    building_ids = rng.permutation(np.arange(1, len(building_areas) + 1)).tolist()
+    areas = np.concatenate([rng.uniform(50, 22000, 3000), [2500.0, 2450.0, 2550.0, 0.0, -5.0, np.nan, 90.0]])
+
+    assigned = match_building_areas(areas, building_areas, building_ids)
+
+    expected = [nearest_building_loop(area, building_areas, building_ids) for area in areas]
+    assert assigned.tolist() == expected
+    assert (assigned >= 0).sum() > 1000
+
+
+def test_area_matching_does_not_depend_on_building_order():
+    building_areas = [800.0, 1200.0, 1260.0, 1140.0, 5000.0]
+    building_ids = [4, 1, 7, 9, 3]
+    areas = np.array([1200.0, 1230.0, 1170.0, 790.0, 4800.0, 3000.0])
+    order = [3, 0, 4, 2, 1]
+
+    assigned = match_building_areas(areas, building_areas, building_ids)
+    shuffled = match_building_areas(areas, [building_areas[i] for i in order], [building_ids[i] for i in order])
+
+    assert assigned.tolist() == shuffled.tolist() == [1, 1, 9, 4, 3, -1]
@@ -0,0 +1,47 @@
+import os
+import pandas as pd
+from conftest import DATA_DIR
+from energia_app.models.energy_data import EnergyData
+from energia_app.models.fingerprint import row_fingerprints
+from energia_app.utils.ingestion import ingest_csv
+
+ENERGY_DATA = os.path.join(DATA_DIR, 'energy_data.csv')
+
+
+def test_repeated_readings_without_timestamp_are_imported(app):
+    # El archivo tiene lecturas idénticas legítimas (misma hora de otra semana)
+    assert pd.read_csv(ENERGY_DATA).duplicated().sum() > 0
+
+    report = ingest_csv(ENERGY_DATA, chunk_rows=200, source_name='energy_data.csv')
+
+    assert report['rows_total'] == 1107
+    assert report['rows_imported'] == 1107
+    assert EnergyData.get_records_count() == 1107
+
+
+def test_reupload_of_same_file_is_idempotent(app):
+    ingest_csv(ENERGY_DATA, source_name='energy_data.csv')
+
+    report = ingest_csv(ENERGY_DATA, chunk_rows=300, source_name='energy_data.csv')
+
+    assert report['rows_imported'] == 0
+    assert report['rows_duplicate'] == 1107
+    assert EnergyData.get_records_count() == 1107
+
+
+def test_timestamped_rows_are_deduplicated_across_files(app):
+    df = pd.read_csv(ENERGY_DATA).head(50)
+    df['timestamp'] = pd.date_range('2024-01-01', periods=len(df), freq='h').astype(str)
+
+    assert EnergyData.import_from_df(df, source_name='enero.csv') == 50
+    assert EnergyData.import_from_df(df, source_name='copia.csv') == 0
+    assert EnergyData.get_records_count() == 50
+
+
+def test_rows_without_timestamp_or_source_have_no_fingerprint():
+    df = pd.read_csv(ENERGY_DATA).head(3)
+
+    assert row_fingerprints(df) == [None, None, None]
+    first, second = row_fingerprints(df, source_name='a.csv'), row_fingerprints(df, source_name='b.csv')
+    assert len(set(first)) == 3
+    assert not set(first) & set(second)
@@ -0,0 +1,107 @@
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import pytest
+from conftest import DATA_DIR, RecordingExecutor
+from energia_app.models.energy_data import EnergyData
+from energia_app.models.ingestion import IngestionJob
+from energia_app.models.user import db
+from energia_app.services import get_service
+
+ENERGY_DATA = os.path.join(DATA_DIR, 'energy_data.csv')
+
+
+@pytest.fixture
+def ingestion(app, tmp_path, monkeypatch):
+    """Servicio de ingesta sin hilos y con el de reentrenamiento sustituido por un registro"""
+    service = get_service('ingestion')
+    executor = RecordingExecutor()
+    monkeypatch.setattr(service, '_executor', executor)
+    monkeypatch.setitem(app.config, 'STREAM_CHUNK_ROWS', 300)
+
+    training = get_service('training')
+    handed_over = []
+    monkeypatch.setattr(training, 'fold_new_rows',
+                        lambda new_rows, user_id=None: handed_over.append(('fold', len(new_rows))) or True)
+    monkeypatch.setattr(training, 'submit_new_rows',
+                        lambda new_rows, user_id=None: handed_over.append(('retrain', len(new_rows)))
+                        or ({'id': 'b' * 32}, True))
+    return service, executor, handed_over
+
+
+def spooled_copy(tmp_path, source=ENERGY_DATA, name='energy_data.csv'):
+    path = tmp_path / name
+    shutil.copy(source, path)
+    return str(path)
+
+
+def test_ingestion_job_runs_from_queued_to_completed(ingestion, tmp_path):
+    service, executor, handed_over = ingestion
+    path = spooled_copy(tmp_path)
+
+    job = service.submit(path, 'energy_data.csv')
+    assert job['status'] == 'queued'
+    assert executor.calls == [('_run', (job['id'], [('energy_data.csv', path)]))]
+    service._run(*executor.calls[0][1])
+
+    completed = db.session.get(IngestionJob, job['id']).to_dict()
+    assert completed['status'] == 'completed'
+    assert completed['rows_done'] == completed['rows_imported'] == 1107
+    assert completed['rows_rejected'] == 0 and completed['chunks_done'] == 4
+    assert completed['progress'] == 100 and completed['bytes_total'] > 0
+    assert EnergyData.get_records_count() == 1107
+    assert handed_over == [('fold', 1107)]
+    assert not os.path.exists(path)
+
+
+def test_ingestion_job_with_retrain_links_the_training_job(ingestion, tmp_path):
+    service, executor, handed_over = ingestion
+
+    job = service.submit(spooled_copy(tmp_path), 'energy_data.csv', retrain=True)
+    service._run(*executor.calls[0][1])
+
+    completed = db.session.get(IngestionJob, job['id'])
+    assert completed.status == 'completed'
+    assert completed.retrain_job_id == 'b' * 32
+    assert handed_over == [('retrain', 1107)]
+
+
+def test_reingested_file_hands_nothing_over(ingestion, tmp_path):
+    service, executor, handed_over = ingestion
+    for _ in range(2):
+        service.submit(spooled_copy(tmp_path), 'energy_data.csv')
+        service._run(*executor.calls[-1][1])
+
+    assert EnergyData.get_records_count() == 1107
+    assert handed_over == [('fold', 1107)]
+
+
+def test_file_without_required_columns_fails_the_job(ingestion, tmp_path):
+    service, executor, handed_over = ingestion
+    path = tmp_path / 'incompleto.csv'
+    path.write_text('area_edificio,ocupacion\n1200,10\n')
+
+    job = service.submit(str(path), 'incompleto.csv')
+    service._run(*executor.calls[0][1])
+
+    failed = db.session.get(IngestionJob, job['id'])
+    assert failed.status == 'failed'
+    assert 'columnas requeridas' in failed.error
+    assert failed.finished_at is not None
+    assert handed_over == [] and not path.exists()
+
+
+def test_jobs_of_dead_workers_are_marked_failed(ingestion):
+    service, _, _ = ingestion
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+    alive = IngestionJob(filename='vivo.csv', status='running', worker=f'{socket.gethostname()}:{os.getpid()}')
+    dead = IngestionJob(filename='muerto.csv', status='running',
+                        worker=f'{socket.gethostname()}:{finished.stdout.strip()}')
+    db.session.add_all([alive, dead])
+    db.session.commit()
+
+    assert service.recover_interrupted() == 1
+    assert alive.status == 'running'
+    assert dead.status == 'failed' and dead.finished_at is not None
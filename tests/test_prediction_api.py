@@ -0,0 +1,45 @@
+import json
+from energia_app.models.user import Prediction
+from energia_app.utils.timing import stage_timings
+
+
+def test_bulk_rejects_fractional_integer_fields(client):
+    rows = [
+        {'building_id': 1, 'ocupacion': 10, 'dia_semana': 1, 'hora_dia': 9},
+        {'building_id': 1, 'ocupacion': 10.5, 'dia_semana': 1, 'hora_dia': 9},
+        {'building_id': 1, 'ocupacion': 10, 'dia_semana': 1.5, 'hora_dia': 9},
+        {'building_id': 1, 'ocupacion': 10, 'dia_semana': 1, 'hora_dia': 9.25},
+        {'building_id': 1.5, 'ocupacion': 10, 'dia_semana': 1, 'hora_dia': 9},
+        {'building_id': 2, 'ocupacion': 12.0, 'dia_semana': '3', 'hora_dia': 9},
+    ]
+
+    response = client.post('/api/predictions/bulk?persist=true', json={'rows': rows})
+    results = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    assert response.status_code == 200
+    assert [result.get('error') for result in results] == [
+        None,
+        'ocupacion debe ser un número entero',
+        'dia_semana debe ser un número entero',
+        'hora_dia debe ser un número entero',
+        'building_id debe ser un número entero',
+        None,
+    ]
+    assert sorted((p.building_id, p.ocupacion, p.dia_semana) for p in Prediction.query.all()) == [(1, 10, 1), (2, 12, 3)]
+
+
+def test_bulk_stage_timings_cover_the_stream(app, client):
+    app.config['SERVER_TIMING_ENABLED'] = True
+    stage_timings.reset()
+    rows = [{'building_id': 1, 'ocupacion': 10, 'dia_semana': 1, 'hora_dia': hour} for hour in range(24)]
+
+    response = client.post('/api/predictions/bulk?persist=true&chunk_size=10', json={'rows': rows})
+    response.get_data()
+    response.close()
+    stages = stage_timings.snapshot()['prediction_api.bulk_predict']
+
+    assert 'Server-Timing' not in response.headers
+    assert {name: stages[name]['count'] for name in ('preprocess', 'predict', 'db_commit', 'total')} == {
+        'preprocess': 3, 'predict': 3, 'db_commit': 3, 'total': 1}
+    streamed = sum(stages[name]['sum_ms'] for name in ('preprocess', 'predict', 'db_commit'))
+    assert stages['total']['sum_ms'] >= streamed
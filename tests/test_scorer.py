@@ -0,0 +1,79 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+from energia_app.models.model import Energy_Model
+from energia_app.models.preprocess import apply_feature_engineering, preprocess_data
+from energia_app.models.scorer import LinearScorer, MIN_CONSUMPTION
+from conftest import DATA_DIR
+
+
+def raw_grid():
+    """Todas las combinaciones de día y hora para varias áreas y ocupaciones"""
+    dias, horas, areas, ocupaciones = np.meshgrid(np.arange(7), np.arange(24),
+                                                  [150.0, 1200.0, 4778.2], [0, 3, 48], indexing='ij')
+    return pd.DataFrame({'area_edificio': areas.ravel(), 'ocupacion': ocupaciones.ravel(),
+                         'dia_semana': dias.ravel(), 'hora_dia': horas.ravel()})
+
+
+def reference_predictions(estimator, scaler, df):
+    X = pd.DataFrame(scaler.transform(apply_feature_engineering(df)), columns=scaler.feature_names_in_)
+    return np.maximum(estimator.predict(X), MIN_CONSUMPTION)
+
+
+@pytest.fixture(scope='module')
+def fitted():
+    """Regresión y escalador ajustados sobre el conjunto de datos del repositorio"""
+    data = pd.read_csv(os.path.join(DATA_DIR, 'energy_data.csv'))
+    features = apply_feature_engineering(data.drop(columns='consumo_energetico'))
+    scaler = StandardScaler().fit(features)
+    estimator = LinearRegression().fit(pd.DataFrame(scaler.transform(features), columns=features.columns),
+                                       data['consumo_energetico'])
+    return estimator, scaler
+
+
+def test_compiled_scorer_matches_scaler_and_estimator(fitted):
+    estimator, scaler = fitted
+    df = raw_grid()
+
+    scorer = LinearScorer.from_estimator(estimator, scaler)
+    values = scorer(df['area_edificio'].to_numpy(), df['ocupacion'].to_numpy(),
+                    df['dia_semana'].to_numpy(), df['hora_dia'].to_numpy())
+
+    np.testing.assert_allclose(values, reference_predictions(estimator, scaler, df), rtol=1e-9, atol=1e-9)
+
+
+def test_float32_scorer_stays_close(fitted):
+    estimator, scaler = fitted
+    df = raw_grid()
+
+    scorer = LinearScorer.from_estimator(estimator, scaler, np.float32)
+    values = scorer(df['area_edificio'].to_numpy(), df['ocupacion'].to_numpy(),
+                    df['dia_semana'].to_numpy(), df['hora_dia'].to_numpy())
+
+    np.testing.assert_allclose(values, reference_predictions(estimator, scaler, df), rtol=1e-4, atol=1e-3)
+
+
+def test_scorer_rejects_out_of_range_day_and_hour(fitted):
+    scorer = LinearScorer.from_estimator(*fitted)
+
+    with pytest.raises(ValueError):
+        scorer(1200.0, 10, 7, 9)
+    with pytest.raises(ValueError):
+        scorer(1200.0, 10, 1, 9.5)
+
+
+def test_model_scorer_matches_preprocess_and_predict():
+    model = Energy_Model()
+    if not model.trained or model.get_scaler() is None:
+        pytest.skip('No hay un modelo entrenado con escalador en energia_app/models')
+    df = raw_grid()
+
+    X, _ = preprocess_data(df, training=False)
+    expected = model.predict(X)
+    values = model.compile_scorer()(df['area_edificio'].to_numpy(), df['ocupacion'].to_numpy(),
+                                    df['dia_semana'].to_numpy(), df['hora_dia'].to_numpy())
+
+    np.testing.assert_allclose(values, expected, rtol=1e-9, atol=1e-9)
@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
+from sklearn.preprocessing import StandardScaler
+from energia_app.models.preprocess import apply_feature_engineering
+from energia_app.models.statistics import SufficientStatistics
+from conftest import DATA_DIR
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    data = pd.read_csv(os.path.join(DATA_DIR, 'energy_data.csv'))
+    X = apply_feature_engineering(data.drop(columns='consumo_energetico')).to_numpy(dtype=np.float64)
+    return X, data['consumo_energetico'].to_numpy(dtype=np.float64)
+
+
+def assert_same_statistics(actual, expected):
+    assert actual.count == expected.count
+    np.testing.assert_allclose(actual.mean, expected.mean, rtol=1e-12)
+    np.testing.assert_allclose(actual.comoment, expected.comoment, rtol=1e-9, atol=1e-6)
+
+
+def test_merged_halves_match_single_pass(dataset):
+    X, y = dataset
+    split = len(y) // 3
+
+    merged = SufficientStatistics.from_arrays(X[:split], y[:split]).merge(
+        SufficientStatistics.from_arrays(X[split:], y[split:]))
+
+    assert_same_statistics(merged, SufficientStatistics.from_arrays(X, y))
+
+
+def test_chunked_updates_match_single_pass(dataset):
+    X, y = dataset
+    stats = SufficientStatistics(X.shape[1])
+
+    for start in range(0, len(y), 100):
+        stats.update(X[start:start + 100], y[start:start + 100])
+
+    assert_same_statistics(stats, SufficientStatistics.from_arrays(X, y))
+
+
+def test_merge_with_empty_statistics_is_a_no_op(dataset):
+    X, y = dataset
+    stats = SufficientStatistics.from_arrays(X, y)
+    expected = stats.copy()
+
+    stats.merge(SufficientStatistics(X.shape[1])).update(X[:0], y[:0])
+
+    assert_same_statistics(stats, expected)
+
+
+def test_solve_matches_standard_scaler_and_linear_regression(dataset):
+    X, y = dataset
+    scaler = StandardScaler().fit(X)
+    estimator = LinearRegression().fit(scaler.transform(X), y)
+
+    solution = SufficientStatistics.from_arrays(X[:500], y[:500]).merge(
+        SufficientStatistics.from_arrays(X[500:], y[500:])).solve()
+
+    np.testing.assert_allclose(solution['mean'], scaler.mean_, rtol=1e-12)
+    np.testing.assert_allclose(solution['scale'], scaler.scale_, rtol=1e-9)
+    np.testing.assert_allclose(solution['coef'], estimator.coef_, rtol=1e-6, atol=1e-8)
+    assert solution['intercept'] == pytest.approx(estimator.intercept_, rel=1e-9)
+    assert solution['r2'] == pytest.approx(r2_score(y, estimator.predict(scaler.transform(X))), rel=1e-9)
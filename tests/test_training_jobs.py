@@ -0,0 +1,133 @@
+import os
+import socket
+import subprocess
+import sys
+import pandas as pd
+import pytest
+from conftest import DATA_DIR, RecordingExecutor
+from energia_app.models.energy_data import EnergyData
+from energia_app.models.preprocess import compute_derived_features
+from energia_app.models.training import TrainingJob
+from energia_app.models.user import db
+from energia_app.services import get_service
+from energia_app.services.training_service import TrainingService, NewRowsStatistics
+
+
+@pytest.fixture
+def training(app, tmp_path, monkeypatch):
+    service = get_service('training')
+    executor = RecordingExecutor()
+    monkeypatch.setattr(service, '_executor', executor)
+    monkeypatch.setattr(TrainingService, '_lock_path', staticmethod(lambda name: str(tmp_path / name)))
+    return service, executor
+
+
+def new_rows(count=20):
+    rows = energy_data(count)
+    rows = pd.concat([rows, compute_derived_features(rows)], axis=1)
+    rows['building_id'] = 1
+    statistics = NewRowsStatistics()
+    statistics(rows)
+    return statistics
+
+
+def energy_data(count=20):
+    return pd.read_csv(os.path.join(DATA_DIR, 'energy_data.csv')).head(count)
+
+
+def test_new_rows_during_active_job_wait_for_a_full_retrain(training):
+    service, executor = training
+    active, created = service.submit('full')
+    assert created and active['status'] == 'queued'
+
+    waiting, created = service.submit_new_rows(new_rows())
+    assert not created
+    assert waiting['status'] == 'waiting' and waiting['mode'] == 'full'
+    assert len(executor.calls) == 1
+
+    # Varias ingestas durante el mismo trabajo comparten el reentrenamiento pendiente
+    again, _ = service.submit_new_rows(new_rows())
+    assert again['id'] == waiting['id']
+
+    # Mientras el trabajo sigue activo, el pendiente no empieza
+    assert service.start_waiting() is None
+
+    service._update(active['id'], status='completed')
+    assert service.start_waiting() == waiting['id']
+    assert service.get_job(waiting['id'])['status'] == 'queued'
+    assert executor.calls[-1] == ('_run', (waiting['id'], 'full', None, False))
+
+
+def test_waiting_retrain_is_resumed_by_the_next_submit(training):
+    service, executor = training
+    active, _ = service.submit('full')
+    waiting, _ = service.submit_new_rows(new_rows())
+    service._update(active['id'], status='failed')
+
+    job, created = service.submit_new_rows(new_rows())
+
+    assert created and job['id'] == waiting['id']
+    assert executor.calls[-1] == ('_run', (waiting['id'], 'full', None, False, None))
+
+
+def test_failed_run_releases_the_queue(training):
+    service, executor = training
+    job, created = service.submit('full')
+    assert created and job['status'] == 'queued'
+    assert service.submit('full') == (job, False)
+
+    # Sin registros el trabajo falla antes de entrenar ni escribir el modelo
+    service._run(*executor.calls[-1][1])
+
+    failed = service.get_job(job['id'])
+    assert failed['status'] == 'failed' and failed['stage'] == 'error'
+    assert 'mínimo 10 registros' in failed['error']
+    assert failed['started_at'] and failed['finished_at']
+    assert not service.is_running()
+    next_job, created = service.submit('full')
+    assert created and next_job['id'] != job['id']
+
+
+def test_backfill_job_completes_with_updated_rows(training):
+    service, executor = training
+    EnergyData.import_from_df(energy_data(), source_name='energy_data.csv')
+    db.session.execute(EnergyData.__table__.update().values(feature_version=None))
+    db.session.commit()
+
+    job, created = service.submit_backfill()
+    assert created and executor.calls[-1] == ('_run_backfill', (job['id'],))
+    assert service.submit('full') == (job, False)
+    service._run_backfill(job['id'])
+
+    completed = service.get_job(job['id'])
+    assert completed['status'] == 'completed' and completed['progress'] == 100
+    assert completed['metrics'] == {'updated': 20}
+    assert EnergyData.count_stale_features() == 0
+
+
+def test_jobs_of_dead_workers_are_marked_failed(training):
+    service, executor = training
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+    db.session.add(TrainingJob(id='a' * 32, mode='full', status='running',
+                               worker=f'{socket.gethostname()}:{finished.stdout.strip()}'))
+    db.session.commit()
+
+    job, created = service.submit('full')
+
+    assert created and job['id'] != 'a' * 32
+    interrupted = service.get_job('a' * 32)
+    assert interrupted['status'] == 'failed'
+    assert interrupted['error'] == 'Trabajo interrumpido: el proceso que lo ejecutaba terminó'
+
+
+def test_retrain_endpoint_answers_409_while_a_job_is_active(training, client):
+    service, executor = training
+    EnergyData.import_from_df(energy_data(), source_name='energy_data.csv')
+
+    first = client.post('/data-management/retrain', json={})
+    second = client.post('/data-management/retrain', json={})
+
+    assert first.status_code == 202 and first.get_json()['job']['status'] == 'queued'
+    assert second.status_code == 409
+    assert second.get_json()['job']['id'] == first.get_json()['job']['id']
+    assert len(executor.calls) == 1
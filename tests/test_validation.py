@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from energia_app.utils.validation import REASONS, validate_frame, reason_counts
+from energia_app.utils.ingestion import ingest_csv
+
+
+def frame(**overrides):
+    row = {'area_edificio': 1200.0, 'ocupacion': 10, 'dia_semana': 1, 'hora_dia': 9, 'consumo_energetico': 30.0}
+    row.update(overrides)
+    return row
+
+
+def test_each_rule_sets_its_own_reason():
+    df = pd.DataFrame([
+        frame(),
+        frame(area_edificio=None),
+        frame(ocupacion='diez'),
+        frame(consumo_energetico=np.inf),
+        frame(hora_dia=9.5),
+        frame(dia_semana=7),
+        frame(hora_dia=24),
+        frame(area_edificio=0),
+        frame(ocupacion=-1),
+        frame(consumo_energetico=-5),
+        frame(building_id=1.5),
+        frame(building_id=99),
+    ])
+
+    valid, rejected = validate_frame(df, building_ids={1, 2})
+
+    assert list(valid.index) == [0]
+    assert rejected['reason'].tolist() == [
+        'missing', 'not_numeric', 'not_finite', 'not_integer', 'dia_semana_range', 'hora_dia_range',
+        'area_range', 'ocupacion_range', 'consumo_range', 'building_id_invalid', 'building_id_unknown',
+    ]
+
+
+def test_a_row_accumulates_every_failed_rule():
+    df = pd.DataFrame([frame(dia_semana=7.5, hora_dia=-1, consumo_energetico=2e6)])
+
+    _, rejected = validate_frame(df)
+
+    assert rejected['reason'].iloc[0] == 'not_integer,dia_semana_range,hora_dia_range,consumo_range'
+    assert reason_counts(rejected) == {'not_integer': 1, 'dia_semana_range': 1, 'hora_dia_range': 1,
+                                       'consumo_range': 1}
+    assert list(reason_counts(rejected)) == [code for code in REASONS if code in reason_counts(rejected)]
+
+
+def test_accepted_rows_are_converted():
+    df = pd.DataFrame([frame(ocupacion='12', dia_semana=3.0, building_id=None)])
+
+    valid, rejected = validate_frame(df)
+
+    assert rejected.empty
+    assert valid['ocupacion'].dtype == np.int64 and valid['ocupacion'].iloc[0] == 12
+    assert valid['dia_semana'].dtype == np.int64
+    assert np.isnan(valid['building_id'].iloc[0])
+
+
+def test_unknown_building_rows_are_rejected_without_losing_the_chunk(app, tmp_path):
+    path = tmp_path / 'edificios.csv'
+    pd.DataFrame([frame(building_id=1), frame(building_id=99), frame(building_id=None)]).to_csv(path, index=False)
+
+    report = ingest_csv(str(path), source_name='edificios.csv')
+
+    assert report['rows_imported'] == 2
+    assert report['reasons'] == {'building_id_unknown': 1}
+    assert report['chunks_failed'] == 0
@@ -1,4 +1,7 @@
-from app import app
+from app import app, check_database_schema
+
+# No arrancar los workers con un esquema antiguo (ver 'flask --app app upgrade-db')
+check_database_schema(app)
 
 if __name__ == "__main__":
     app.run()
\ No newline at end of file